@@ -0,0 +1,106 @@
+import copy
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from ranking import top_k
+
+class IVFIndex:
+    def __init__(self, n_lists=None, n_probe=8, n_iterations=10, sample_size=50000, block_size=4096, seed=0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iterations = n_iterations
+        self.sample_size = sample_size
+        self.block_size = block_size
+        self.seed = seed
+    
+    def fit(self, item_matrix, normalized=False):
+        # Spherical k-means coarse quantizer: items are assigned to the
+        # centroid with the highest cosine similarity, and a query only scores
+        # the items in its n_probe closest lists.
+        self.item_matrix = sparse.csr_matrix(item_matrix)
+        if not normalized:
+            self.item_matrix = normalize(self.item_matrix)
+        n_items = self.item_matrix.shape[0]
+        n_lists = self.n_lists or max(1, int(np.sqrt(n_items)))
+        n_lists = min(n_lists, n_items)
+        
+        rng = np.random.default_rng(self.seed)
+        sample = self.item_matrix
+        if n_items > self.sample_size:
+            sample = self.item_matrix[rng.choice(n_items, self.sample_size, replace=False)]
+        
+        centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)].toarray().astype(np.float32)
+        for _ in range(self.n_iterations):
+            assignments = self.assign(sample, centroids)
+            membership = sparse.csr_matrix(
+                (np.ones(len(assignments), dtype=np.float32), (assignments, np.arange(len(assignments)))),
+                shape=(n_lists, sample.shape[0])
+            )
+            sums = np.asarray((membership @ sample).todense(), dtype=np.float32)
+            empty = np.asarray(membership.sum(axis=1)).ravel() == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize(sums).astype(np.float32)
+        
+        self.centroids = centroids
+        self.assignments = self.assign(self.item_matrix, centroids)
+        self.build_lists()
+        return self
+    
+    def build_lists(self):
+        self.list_items = np.argsort(self.assignments, kind='stable').astype(np.int32)
+        self.list_offsets = np.searchsorted(self.assignments[self.list_items], np.arange(len(self.centroids) + 1))
+    
+    def added(self, item_matrix, new_rows):
+        # New items join their closest existing list; centroids are not
+        # retrained. The result is a new index, this one is left unchanged.
+        index = copy.copy(self)
+        index.item_matrix = item_matrix
+        index.assignments = np.concatenate([self.assignments, self.assign(new_rows, self.centroids)])
+        index.build_lists()
+        return index
+    
+    def removed(self, item_matrix, keep):
+        index = copy.copy(self)
+        index.item_matrix = item_matrix
+        index.assignments = self.assignments[keep]
+        index.build_lists()
+        return index
+    
+    def assign(self, matrix, centroids):
+        assignments = np.zeros(matrix.shape[0], dtype=np.int32)
+        for start in range(0, matrix.shape[0], self.block_size):
+            end = min(start + self.block_size, matrix.shape[0])
+            assignments[start:end] = np.asarray(matrix[start:end] @ centroids.T).argmax(axis=1)
+        return assignments
+    
+    def candidates(self, query, n_probe=None):
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        lists, _ = top_k(self.centroids @ query, n_probe)
+        return np.concatenate([
+            self.list_items[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists
+        ])
+    
+    def search(self, query, k, n_probe=None, exclude=None, mask=None):
+        query = np.asarray(query, dtype=np.float32).ravel()
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        excluded = np.zeros(self.item_matrix.shape[0], dtype=bool) if mask is None else ~mask
+        if exclude is not None and len(exclude):
+            excluded[np.asarray(exclude, dtype=np.intp)] = True
+        
+        while True:
+            candidates = self.candidates(query, n_probe)
+            candidates = candidates[~excluded[candidates]]
+            if len(candidates) >= k or n_probe >= len(self.centroids):
+                break
+            if mask is not None:
+                # The probed lists cannot fill k eligible slots, so the search
+                # goes exhaustive over the (usually small) eligible set.
+                candidates = np.flatnonzero(~excluded)
+                break
+            # Rated items can take up most of the probed lists; probing twice
+            # as many lists converges on an exhaustive search.
+            n_probe = min(2 * n_probe, len(self.centroids))
+        
+        scores = self.item_matrix[candidates] @ query
+        top, top_scores = top_k(scores, k)
+        return candidates[top], top_scores
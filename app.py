@@ -1,11 +1,27 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 from recommendation_engine import MovieRecommendationEngine
 from auth import AuthManager
-from PIL import Image
-import requests
-from io import BytesIO
+from posters import PosterFetcher
+from ratings_store import RatingsRepository
+from database import init_db
+from collaborative import MatrixFactorization
+from result_cache import RecommendationCache
+from instrumentation import METRICS_PORT, export_metrics, metrics, span
+from catalog import load_catalog
+from shared_state import SharedEngine
+import streaming_build
+from trending import TrendingCounter
+import os
+
+CATALOG_PATH = 'movies_data.csv'
+CATALOG_PARQUET_PATH = 'movies_data.parquet'
+ENGINE_SHARED_DIR = os.getenv('ENGINE_SHARED_DIR')
+ENGINE_STREAMING_BUILD = os.getenv('ENGINE_STREAMING_BUILD', '0') == '1'
+PAGE_SIZE = 20
+TRENDING_HALF_LIFE = float(os.getenv('TRENDING_HALF_LIFE_HOURS', '72')) * 3600
+TRENDING_EVENT_LOG = os.getenv('TRENDING_EVENT_LOG')
+POSTER_PLACEHOLDER = "https://via.placeholder.com/300x450/1a1a1a/ffffff?text=No+Poster"
 
 st.set_page_config(
     page_title="NetflixAI - Movie Recommendations",
@@ -14,16 +30,84 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-@st.cache_data
-def load_data():
-    movies_df = pd.read_csv('movies_data.csv')
-    return movies_df
+@st.cache_resource
+def load_data(path):
+    # cache_resource hands every session the same frame instead of
+    # unpickling a fresh copy per access; callers treat it as read-only.
+    return load_catalog(path)
+
+def catalog_path():
+    # The model artifact is fingerprinted from this same file, so a rebuilt
+    # parquet catalog is never served with a model fitted on the CSV.
+    if os.path.exists(CATALOG_PARQUET_PATH):
+        return CATALOG_PARQUET_PATH
+    return CATALOG_PATH
 
 @st.cache_resource
 def init_recommendation_engine():
-    movies_df = load_data()
-    engine = MovieRecommendationEngine(movies_df)
+    path = catalog_path()
+    movies_df = load_data(path)
+    if ENGINE_STREAMING_BUILD:
+        # Featurizes the CSV chunk by chunk into a memory-mapped artifact
+        # instead of fitting TF-IDF over the whole corpus in memory.
+        engine = streaming_build.build_engine(path, movies_df, n_neighbors=50)
+    else:
+        engine = MovieRecommendationEngine.from_catalog(path, movies_df, n_neighbors=50)
+    attach_cf_model(engine)
+    engine.attach_trending(init_trending_counter())
     return engine
+
+@st.cache_resource
+def init_shared_engine():
+    return SharedEngine(ENGINE_SHARED_DIR)
+
+def get_engine():
+    # With ENGINE_SHARED_DIR set, workers map the published arrays read-only
+    # and pick up a newly published version on their next rerun.
+    if not ENGINE_SHARED_DIR:
+        return init_recommendation_engine()
+    engine = init_shared_engine().get()
+    if engine.cf_model is None:
+        attach_cf_model(engine)
+    if engine.trending is None:
+        engine.attach_trending(init_trending_counter())
+    init_recommendation_cache().bind(engine)
+    return engine
+
+def attach_cf_model(engine):
+    if os.path.exists('cf_model.npz'):
+        engine.attach_cf_model(MatrixFactorization.load('cf_model.npz'))
+@st.cache_resource
+def init_recommendation_cache():
+    if ENGINE_SHARED_DIR:
+        return RecommendationCache(init_shared_engine().get())
+    return RecommendationCache(init_recommendation_engine())
+
+@st.cache_resource
+def init_metrics_server():
+    if metrics.enabled and METRICS_PORT:
+        return metrics.serve(METRICS_PORT)
+    return None
+
+@st.cache_resource
+def init_poster_fetcher():
+    return PosterFetcher()
+
+@st.cache_resource
+def init_ratings_repository():
+    init_db()
+    return RatingsRepository()
+
+@st.cache_resource
+def init_trending_counter():
+    # One counter per server process, seeded from stored ratings (and an
+    # optional event log) and then fed live as sessions view and rate movies.
+    counter = TrendingCounter(half_life=TRENDING_HALF_LIFE)
+    if TRENDING_EVENT_LOG and os.path.exists(TRENDING_EVENT_LOG):
+        counter.load_event_log(TRENDING_EVENT_LOG)
+    counter.load_ratings(init_ratings_repository())
+    return counter
+
 @st.cache_resource
 def init_auth_manager():
     return AuthManager()
@@ -136,12 +220,20 @@ def apply_netflix_style():
     </style>
     """, unsafe_allow_html=True)
 
+def display_poster(poster_path):
+    if poster_path is not None:
+        st.image(poster_path, use_container_width=True)
+    else:
+        st.image(POSTER_PLACEHOLDER, use_container_width=True)
+
 def display_movie_grid(movies_df, cols=5):
     if movies_df.empty:
         st.warning("No movies found.")
         return
     
     movies_list = movies_df.to_dict('records')
+    with span('render_poster_prefetch'):
+        posters = init_poster_fetcher().prefetch([movie['poster_url'] for movie in movies_list])
     
     rows = (len(movies_list) + cols - 1) // cols
     
@@ -152,41 +244,59 @@ def display_movie_grid(movies_df, cols=5):
             if movie_idx < len(movies_list):
                 movie = movies_list[movie_idx]
                 with columns[col_idx]:
-                    try:
-                        response = requests.get(movie['poster_url'], timeout=5)
-                        img = Image.open(BytesIO(response.content))
-                        st.image(img, use_container_width=True)
-                    except:
-                        st.image("https://via.placeholder.com/300x450/1a1a1a/ffffff?text=No+Poster", use_container_width=True)
+                    display_poster(posters.get(movie['poster_url']))
                     
                     st.markdown(f"<div class='movie-title'>{movie['title']}</div>", unsafe_allow_html=True)
-                    st.markdown(f"<div class='movie-info'>{movie['year']} • ⭐ {movie['rating']}</div>", unsafe_allow_html=True)
+                    st.markdown(f"<div class='movie-info'>{movie['year']} • ⭐ {movie['rating']:.1f}</div>", unsafe_allow_html=True)
                     
                     if st.button(f"View Details", key=f"view_{movie['movie_id']}_{row}_{col_idx}"):
                         st.session_state['selected_movie_id'] = movie['movie_id']
                         st.session_state['page'] = 'movie_detail'
+                        init_trending_counter().record_view(movie['movie_id'])
                         st.rerun()
 
+def display_paged_grid(engine, movie_indices, grid_key, query_state, cols=5):
+    # The page number resets whenever the query or filters behind the grid change.
+    page_key = f"page_{grid_key}"
+    if st.session_state.get(f"{page_key}_query") != query_state:
+        st.session_state[f"{page_key}_query"] = query_state
+        st.session_state[page_key] = 0
+    
+    page = st.session_state[page_key]
+    page_movies, total = engine.get_page(movie_indices, page, PAGE_SIZE)
+    n_pages = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+    
+    display_movie_grid(page_movies, cols=cols)
+    
+    if page + 1 < n_pages:
+        next_movies, _ = engine.get_page(movie_indices, page + 1, PAGE_SIZE)
+        init_poster_fetcher().prefetch_async(next_movies['poster_url'].tolist())
+    
+    prev_col, info_col, next_col = st.columns([1, 3, 1])
+    with prev_col:
+        if st.button("← Previous", key=f"{page_key}_prev", disabled=page == 0):
+            st.session_state[page_key] = page - 1
+            st.rerun()
+    with info_col:
+        st.markdown(f"<p style='text-align: center; color: #b3b3b3;'>Page {page + 1} of {n_pages} • {total} movies</p>", unsafe_allow_html=True)
+    with next_col:
+        if st.button("Next →", key=f"{page_key}_next", disabled=page + 1 >= n_pages):
+            st.session_state[page_key] = page + 1
+            st.rerun()
+
 def display_movie_detail(movie, engine):
     st.markdown(f"<h1 style='color: #E50914;'>{movie['title']}</h1>", unsafe_allow_html=True)
     
     col1, col2 = st.columns([1, 2])
     
     with col1:
-        try:
-            response = requests.get(movie['poster_url'], timeout=5)
-            img = Image.open(BytesIO(response.content))
-            st.image(img, use_container_width=True)
-        except:
-            st.image("https://via.placeholder.com/300x450/1a1a1a/ffffff?text=No+Poster", use_container_width=True)
+        display_poster(init_poster_fetcher().fetch(movie['poster_url']))
         
         st.markdown("### Rate This Movie")
         user_rating = st.slider("Your Rating", 1.0, 10.0, 5.0, 0.5, key=f"rate_{movie['movie_id']}")
         
         if st.button("Submit Rating", key=f"submit_rating_{movie['movie_id']}"):
-            if 'user_ratings' not in st.session_state:
-                st.session_state['user_ratings'] = {}
-            st.session_state['user_ratings'][movie['movie_id']] = user_rating
+            rate_movie(movie['movie_id'], user_rating)
             st.success(f"Rated {movie['title']} with {user_rating} stars!")
     
     with col2:
@@ -203,18 +313,21 @@ def display_movie_detail(movie, engine):
         st.markdown(f"<p><strong>Director:</strong> {movie['director']}</p>", unsafe_allow_html=True)
         st.markdown(f"<p><strong>Cast:</strong> {movie['cast']}</p>", unsafe_allow_html=True)
         st.markdown(f"<p><strong>Year:</strong> {movie['year']}</p>", unsafe_allow_html=True)
-        st.markdown(f"<p><strong>Rating:</strong> ⭐ {movie['rating']}/10</p>", unsafe_allow_html=True)
+        st.markdown(f"<p><strong>Rating:</strong> ⭐ {movie['rating']:.1f}/10</p>", unsafe_allow_html=True)
         
         st.markdown("</div>", unsafe_allow_html=True)
     
     st.markdown("<div class='section-title'>More Like This</div>", unsafe_allow_html=True)
     
     user_ratings = st.session_state.get('user_ratings', {})
+    recommendation_cache = init_recommendation_cache()
     
     if user_ratings:
-        similar_movies = engine.get_hybrid_recommendations(movie['movie_id'], user_ratings, n_recommendations=10)
+        similar_movies = recommendation_cache.get_hybrid_recommendations(
+            movie['movie_id'], user_ratings, n_recommendations=10, user_id=st.session_state.get('user_id')
+        )
     else:
-        similar_movies = engine.get_content_based_recommendations(movie['movie_id'], n_recommendations=10)
+        similar_movies = recommendation_cache.get_content_based_recommendations(movie['movie_id'], n_recommendations=10)
     
     display_movie_grid(similar_movies, cols=5)
     
@@ -222,16 +335,100 @@ def display_movie_detail(movie, engine):
         st.session_state['page'] = 'browse'
         st.rerun()
 
+def rate_movie(movie_id, rating):
+    st.session_state.setdefault('user_ratings', {})[movie_id] = rating
+    user_id = st.session_state.get('user_id')
+    if user_id is not None:
+        init_ratings_repository().submit(user_id, movie_id, rating)
+    invalidate_user_recommendations()
+    init_trending_counter().record_rating(movie_id, rating)
+
+def invalidate_user_recommendations():
+    # Entries keyed on the user's old ratings can never be requested again,
+    # so they are dropped instead of filling the cache until they expire.
+    user_id = st.session_state.get('user_id')
+    if user_id is not None:
+        init_recommendation_cache().invalidate_user(user_id)
+
+def sign_in(username):
+    # Ratings given before signing in are stored under the account, then the
+    # account's full rating history becomes the session's ratings.
+    user = init_auth_manager().get_user_info(username)
+    repository = init_ratings_repository()
+    user_id = repository.get_user_id(user['username'], user['email'], user['password_hash'])
+    for movie_id, rating in st.session_state.get('user_ratings', {}).items():
+        repository.submit(user_id, movie_id, rating)
+    st.session_state['username'] = username
+    st.session_state['user_id'] = user_id
+    st.session_state['user_ratings'] = repository.get_user_ratings(user_id)
+    invalidate_user_recommendations()
+
+def sign_out():
+    invalidate_user_recommendations()
+    st.session_state.pop('username', None)
+    st.session_state.pop('user_id', None)
+    st.session_state['user_ratings'] = {}
+
+def display_account():
+    st.markdown("### 👤 Account")
+    
+    if st.session_state.get('user_id') is not None:
+        st.markdown(f"Signed in as **{st.session_state['username']}**")
+        if st.button("Log Out", key="logout"):
+            sign_out()
+            st.rerun()
+        return
+    
+    auth_manager = init_auth_manager()
+    login_tab, signup_tab = st.tabs(["Log In", "Sign Up"])
+    
+    with login_tab:
+        username = st.text_input("Username", key="login_username")
+        password = st.text_input("Password", type="password", key="login_password")
+        if st.button("Log In", key="login_submit"):
+            success, message = auth_manager.authenticate(username, password)
+            if success:
+                sign_in(username)
+                st.rerun()
+            st.error(message)
+    
+    with signup_tab:
+        username = st.text_input("Username", key="signup_username")
+        email = st.text_input("Email", key="signup_email")
+        password = st.text_input("Password", type="password", key="signup_password")
+        if st.button("Create Account", key="signup_submit"):
+            if not username or not email or not password:
+                st.error("Username, email and password are required")
+            else:
+                success, message = auth_manager.create_user(username, password, email)
+                if success:
+                    sign_in(username)
+                    st.rerun()
+                st.error(message)
+
 def main():
+    init_metrics_server()
+    try:
+        with span('render_page'):
+            render_page()
+    finally:
+        export_metrics()
+
+def render_page():
     apply_netflix_style()
     
-    engine = init_recommendation_engine()
-    movies_df = load_data()
+    with span('render_engine_init'):
+        engine = get_engine()
+    movies_df = engine.movies_df
     
     if 'page' not in st.session_state:
         st.session_state['page'] = 'browse'
     if 'user_ratings' not in st.session_state:
-        st.session_state['user_ratings'] = {}
+        user_id = st.session_state.get('user_id')
+        if user_id is not None:
+            st.session_state['user_ratings'] = init_ratings_repository().get_user_ratings(user_id)
+        else:
+            st.session_state['user_ratings'] = {}
     if 'selected_movie_id' not in st.session_state:
         st.session_state['selected_movie_id'] = None
     
@@ -239,6 +436,9 @@ def main():
     st.markdown("<p style='text-align: center; color: #b3b3b3; margin-bottom: 30px;'>Powered by Machine Learning Recommendations</p>", unsafe_allow_html=True)
     
     with st.sidebar:
+        display_account()
+        
+        st.markdown("---")
         st.markdown("### 🎯 Navigation")
         
         nav_option = st.radio(
@@ -274,6 +474,7 @@ def main():
         
         if st.button("Clear All Ratings"):
             st.session_state['user_ratings'] = {}
+            invalidate_user_recommendations()
             st.success("Ratings cleared!")
             st.rerun()
     
@@ -286,43 +487,33 @@ def main():
             st.session_state['page'] = 'browse'
             st.rerun()
     else:
-        filtered_movies = movies_df
-        
-        if selected_genre != 'All':
-            filtered_movies = engine.filter_by_genre(selected_genre)
-        
-        filtered_movies = filtered_movies[
-            (filtered_movies['year'] >= year_range[0]) & 
-            (filtered_movies['year'] <= year_range[1])
-        ]
-        
-        filtered_movies = filtered_movies[
-            (filtered_movies['rating'] >= rating_range[0]) & 
-            (filtered_movies['rating'] <= rating_range[1])
-        ]
+        genres = None if selected_genre == 'All' else [selected_genre]
+        filters = {'genres': genres, 'year_range': year_range, 'rating_range': rating_range}
         
         if nav_option == "Browse All":
             st.markdown("<div class='section-title'>All Movies</div>", unsafe_allow_html=True)
-            display_movie_grid(filtered_movies, cols=5)
+            display_paged_grid(engine, engine.filter(**filters), "browse", (genres, year_range, rating_range))
         
         elif nav_option == "Search Movies":
             st.markdown("<div class='section-title'>Search Movies</div>", unsafe_allow_html=True)
             search_query = st.text_input("Enter movie title, genre, actor, or director...")
             
             if search_query:
-                search_results = engine.search_movies(search_query)
-                search_results = search_results[
-                    (search_results['year'] >= year_range[0]) & 
-                    (search_results['year'] <= year_range[1]) &
-                    (search_results['rating'] >= rating_range[0]) & 
-                    (search_results['rating'] <= rating_range[1])
-                ]
+                suggestions = engine.autocomplete(search_query, 5)
+                if not suggestions.empty:
+                    suggestion_columns = st.columns(len(suggestions))
+                    for column, suggestion in zip(suggestion_columns, suggestions.to_dict('records')):
+                        with column:
+                            if st.button(suggestion['title'], key=f"suggest_{suggestion['movie_id']}"):
+                                st.session_state['selected_movie_id'] = suggestion['movie_id']
+                                st.session_state['page'] = 'movie_detail'
+                                init_trending_counter().record_view(suggestion['movie_id'])
+                                st.rerun()
                 
-                if selected_genre != 'All':
-                    search_results = search_results[search_results['genre'].str.contains(selected_genre, na=False, case=False)]
+                movie_indices, _ = engine.search(search_query, **filters)
                 
-                st.markdown(f"<p style='color: #b3b3b3;'>Found {len(search_results)} results</p>", unsafe_allow_html=True)
-                display_movie_grid(search_results, cols=5)
+                st.markdown(f"<p style='color: #b3b3b3;'>Found {len(movie_indices)} results</p>", unsafe_allow_html=True)
+                display_paged_grid(engine, movie_indices, "search", (search_query, genres, year_range, rating_range))
             else:
                 st.info("Enter a search term to find movies")
         
@@ -334,39 +525,22 @@ def main():
             if len(user_ratings) == 0:
                 st.info("Rate some movies to get personalized recommendations!")
                 st.markdown("<div class='section-title'>Popular Movies to Get Started</div>", unsafe_allow_html=True)
-                recommendations = engine.get_top_rated_movies(20)
+                recommendations = engine.get_top_rated_movies(20, **filters)
             else:
-                recommendations = engine.get_collaborative_recommendations(user_ratings, n_recommendations=20)
-            
-            recommendations = recommendations[
-                (recommendations['year'] >= year_range[0]) & 
-                (recommendations['year'] <= year_range[1]) &
-                (recommendations['rating'] >= rating_range[0]) & 
-                (recommendations['rating'] <= rating_range[1])
-            ]
-            
-            if selected_genre != 'All':
-                recommendations = recommendations[recommendations['genre'].str.contains(selected_genre, na=False, case=False)]
+                recommendations = init_recommendation_cache().get_cf_recommendations(
+                    user_ratings, n_recommendations=20, user_id=st.session_state.get('user_id'), **filters
+                )
             
             display_movie_grid(recommendations, cols=5)
         
         elif nav_option == "Top Rated":
             st.markdown("<div class='section-title'>Top Rated Movies</div>", unsafe_allow_html=True)
-            top_rated = filtered_movies.nlargest(20, 'rating')
+            top_rated = engine.get_top_rated_movies(20, **filters)
             display_movie_grid(top_rated, cols=5)
         
         elif nav_option == "Trending Now":
             st.markdown("<div class='section-title'>Trending Now</div>", unsafe_allow_html=True)
-            trending = engine.get_trending_movies(20)
-            trending = trending[
-                (trending['year'] >= year_range[0]) & 
-                (trending['year'] <= year_range[1]) &
-                (trending['rating'] >= rating_range[0]) & 
-                (trending['rating'] <= rating_range[1])
-            ]
-            
-            if selected_genre != 'All':
-                trending = trending[trending['genre'].str.contains(selected_genre, na=False, case=False)]
+            trending = engine.get_trending_movies(20, **filters)
             
             display_movie_grid(trending, cols=5)
 
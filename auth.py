@@ -1,65 +1,162 @@
 import pandas as pd
+import csv
 import hashlib
+import io
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from instrumentation import timed
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+USER_COLUMNS = ['username', 'password_hash', 'email', 'created_at']
 
 class AuthManager:
     def __init__(self, users_file='users.csv'):
         self.users_file = users_file
+        self.lock = threading.RLock()
+        self.users = {}
+        self.emails = {}
+        self.offset = 0
+        self.inode = None
         self.init_users_file()
+        self.refresh()
     
     def init_users_file(self):
         if not os.path.exists(self.users_file):
-            df = pd.DataFrame(columns=['username', 'password_hash', 'email', 'created_at'])
-            df.to_csv(self.users_file, index=False)
+            with self.open_log() as f:
+                if f.tell() == 0:
+                    csv.writer(f, lineterminator='\n').writerow(USER_COLUMNS)
+    
+    @contextmanager
+    def open_log(self):
+        # Holds an exclusive lock on the users file for appends and rewrites.
+        # If a compaction replaced the file while we waited, lock the new one.
+        with self.lock:
+            while True:
+                f = open(self.users_file, 'a', newline='')
+                try:
+                    if fcntl is not None:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                    if os.fstat(f.fileno()).st_ino == os.stat(self.users_file).st_ino:
+                        yield f
+                        return
+                finally:
+                    f.close()
+    
+    @timed('auth_refresh')
+    def refresh(self):
+        # The users file is an append-only log: only bytes written since the
+        # last refresh (by this or another process) are parsed.
+        with self.lock:
+            stat = os.stat(self.users_file)
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                self.users, self.emails, self.offset = {}, {}, 0
+                self.inode = stat.st_ino
+            size = stat.st_size
+            if size == self.offset:
+                return
+            
+            with open(self.users_file, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read(size - self.offset)
+            
+            complete = data.rfind(b'\n') + 1
+            lines = data[:complete].decode('utf-8')
+            rows = csv.reader(io.StringIO(lines))
+            
+            if self.offset == 0:
+                next(rows, None)
+            for row in rows:
+                self.index_user(dict(zip(USER_COLUMNS, row)))
+            self.offset += complete
+    
+    def index_user(self, user):
+        username = user.get('username')
+        if not username or username in self.users:
+            return
+        self.users[username] = user
+        if user.get('email'):
+            self.emails.setdefault(user['email'], username)
     
     def hash_password(self, password):
         return hashlib.sha256(password.encode()).hexdigest()
     
     def load_users(self):
-        return pd.read_csv(self.users_file)
+        self.refresh()
+        with self.lock:
+            return pd.DataFrame(list(self.users.values()), columns=USER_COLUMNS)
     
     def save_users(self, df):
-        df.to_csv(self.users_file, index=False)
+        self.rewrite(df[USER_COLUMNS].astype(str).values.tolist())
+    
+    def compact(self):
+        # The snapshot is taken under the file lock, so a signup appended by
+        # another writer cannot land between reading the log and replacing it.
+        with self.open_log():
+            self.refresh()
+            rows = [[user[column] for column in USER_COLUMNS] for user in self.users.values()]
+            self.replace_log(rows)
+    
+    def rewrite(self, rows):
+        with self.open_log():
+            self.replace_log(rows)
+    
+    def replace_log(self, rows):
+        # Callers must hold open_log().
+        tmp_file = f'{self.users_file}.tmp-{os.getpid()}'
+        with open(tmp_file, 'w', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(USER_COLUMNS)
+            writer.writerows(rows)
+        os.replace(tmp_file, self.users_file)
+        self.refresh()
     
     def user_exists(self, username):
-        users_df = self.load_users()
-        return username in users_df['username'].values
+        self.refresh()
+        return username in self.users
     
     def email_exists(self, email):
-        users_df = self.load_users()
-        return email in users_df['email'].values
+        self.refresh()
+        return email in self.emails
     
+    @timed('auth_create_user')
     def create_user(self, username, password, email):
-        if self.user_exists(username):
-            return False, "Username already exists"
-        
-        if self.email_exists(email):
-            return False, "Email already registered"
+        new_user = {
+            'username': username,
+            'password_hash': self.hash_password(password),
+            'email': email,
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
         
-        users_df = self.load_users()
-        
-        new_user = pd.DataFrame({
-            'username': [username],
-            'password_hash': [self.hash_password(password)],
-            'email': [email],
-            'created_at': [datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
-        })
-        
-        users_df = pd.concat([users_df, new_user], ignore_index=True)
-        self.save_users(users_df)
+        with self.open_log() as f:
+            self.refresh()
+            
+            if username in self.users:
+                return False, "Username already exists"
+            
+            if email in self.emails:
+                return False, "Email already registered"
+            
+            csv.writer(f, lineterminator='\n').writerow([new_user[column] for column in USER_COLUMNS])
+            f.flush()
+            os.fsync(f.fileno())
+            self.refresh()
         
         return True, "Account created successfully"
     
     def authenticate(self, username, password):
-        users_df = self.load_users()
-        
-        user = users_df[users_df['username'] == username]
+        self.refresh()
+        user = self.users.get(username)
         
-        if user.empty:
+        if user is None:
             return False, "Username not found"
         
-        stored_hash = user.iloc[0]['password_hash']
+        stored_hash = user['password_hash']
         
         if self.hash_password(password) == stored_hash:
             return True, "Login successful"
@@ -67,9 +164,9 @@ class AuthManager:
             return False, "Incorrect password"
     
     def get_user_info(self, username):
-        users_df = self.load_users()
-        user = users_df[users_df['username'] == username]
+        self.refresh()
+        user = self.users.get(username)
         
-        if not user.empty:
-            return user.iloc[0].to_dict()
+        if user is not None:
+            return dict(user)
         return None
@@ -0,0 +1,49 @@
+import argparse
+import time
+import numpy as np
+from recom_engine import MovieRecommendationEngine
+from benchmarks.synthetic import generate_catalog
+
+def sample_user_ratings(engine, n_users, n_ratings, seed=0):
+    rng = np.random.default_rng(seed)
+    movie_ids = engine.movies_df['movie_id'].values
+    return [
+        dict(zip(rng.choice(movie_ids, n_ratings, replace=False).tolist(), rng.uniform(1, 5, n_ratings).tolist()))
+        for _ in range(n_users)
+    ]
+
+def run(n_movies, n_users, k, probes, n_lists=None, seed=0):
+    engine = MovieRecommendationEngine(generate_catalog(n_movies, seed=seed), n_neighbors=10)
+    users = sample_user_ratings(engine, n_users, 10, seed)
+    
+    start = time.perf_counter()
+    exact = [set(engine.get_collaborative_recommendations(u, k)['movie_id']) for u in users]
+    exact_ms = (time.perf_counter() - start) / n_users * 1000
+    
+    start = time.perf_counter()
+    index = engine.build_ann_index(n_lists)
+    build_s = time.perf_counter() - start
+    print(f'{n_movies} movies, {len(index.centroids)} lists, built in {build_s:.2f}s; exact path {exact_ms:.2f} ms/query')
+    
+    for n_probe in probes:
+        index.n_probe = n_probe
+        start = time.perf_counter()
+        approx = [set(engine.get_collaborative_recommendations(u, k)['movie_id']) for u in users]
+        ann_ms = (time.perf_counter() - start) / n_users * 1000
+        recall = np.mean([len(a & e) / max(len(e), 1) for a, e in zip(approx, exact)])
+        print(f'  n_probe={n_probe:<4d} recall@{k}={recall:.3f}  {ann_ms:.2f} ms/query')
+    
+    engine.ann_index = None
+
+def main():
+    parser = argparse.ArgumentParser(description='Recall@k and latency of the IVF index against exact scoring.')
+    parser.add_argument('--movies', type=int, default=50000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--lists', type=int, default=None)
+    parser.add_argument('--probes', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+    run(args.movies, args.users, args.k, args.probes, args.lists)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import multiprocessing
+import resource
+import time
+import numpy as np
+from recom_engine import MovieRecommendationEngine
+from collaborative import MatrixFactorization
+from benchmarks.synthetic import generate_catalog, generate_ratings, parse_size
+from benchmarks.ann_recall import sample_user_ratings
+from benchmarks.results import latency_summary, new_report, save_report
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure(calls):
+    samples = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return latency_summary(samples)
+
+def run_size(n_movies, n_queries=200, n_neighbors=50, seed=0):
+    catalog = generate_catalog(n_movies, seed=seed)
+    ratings = generate_ratings(catalog, max(n_movies // 10, 100), seed=seed)
+    results = []
+    
+    def record(benchmark, **values):
+        results.append({'benchmark': benchmark, 'n_movies': n_movies, 'peak_rss_mb': peak_rss_mb(), **values})
+    
+    start = time.perf_counter()
+    engine = MovieRecommendationEngine(catalog, n_neighbors=n_neighbors)
+    record('construct', seconds=time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    cf_model = MatrixFactorization().fit(ratings['user_id'], ratings['movie_id'], ratings['rating'])
+    engine.attach_cf_model(cf_model)
+    record('train_cf', seconds=time.perf_counter() - start)
+    
+    rng = np.random.default_rng(seed)
+    movie_ids = rng.choice(catalog['movie_id'].values, n_queries).tolist()
+    users = sample_user_ratings(engine, n_queries, 10, seed)
+    words = catalog['title'].str.split().str[-1].values[rng.integers(0, n_movies, n_queries)]
+    genres = engine.get_all_genres()
+    
+    record('content', **measure(lambda m=m: engine.get_content_based_recommendations(m, 10) for m in movie_ids))
+    record('collaborative', **measure(lambda u=u: engine.get_collaborative_recommendations(u, 10) for u in users))
+    record('hybrid', **measure(
+        lambda m=m, u=u: engine.get_hybrid_recommendations(m, u, 10) for m, u in zip(movie_ids, users)
+    ))
+    record('cf', **measure(lambda u=u: engine.get_cf_recommendations(u, 10) for u in users))
+    record('top_rated', **measure(lambda: engine.get_top_rated_movies(20) for _ in range(n_queries)))
+    record('trending', **measure(lambda: engine.get_trending_movies(20) for _ in range(n_queries)))
+    record('search', **measure(lambda w=w: engine.search_movies(f'movie {w}') for w in words))
+    record('autocomplete', **measure(lambda w=w: engine.autocomplete(w[:3], 5) for w in words))
+    record('filter', **measure(
+        lambda g=g: engine.filter_mask([g], (1990, 2020), (5.0, 10.0)) for g in rng.choice(genres, n_queries)
+    ))
+    return results
+
+def _run_size_worker(args):
+    return run_size(*args)
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup time, per-request latency and peak RSS of the engine.')
+    parser.add_argument('--sizes', nargs='+', default=['1k', '10k'], help='1k, 10k, 100k, 1m or row counts')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--neighbors', type=int, default=50)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    report = new_report(sizes=args.sizes, queries=args.queries, neighbors=args.neighbors, seed=args.seed)
+    # Every size runs in a fresh process so peak RSS is not inherited from a
+    # larger catalog measured earlier.
+    context = multiprocessing.get_context('spawn')
+    for size in args.sizes:
+        with context.Pool(1) as pool:
+            results = pool.apply(_run_size_worker, ((parse_size(size), args.queries, args.neighbors, args.seed),))
+        report['results'].extend(results)
+        for result in results:
+            timing = f'{result["seconds"]:.2f}s' if 'seconds' in result else f'p50 {result["p50_ms"]:.2f}ms  p95 {result["p95_ms"]:.2f}ms'
+            print(f'{result["n_movies"]:>8} {result["benchmark"]:<14} {timing:<32} rss {result["peak_rss_mb"]:.0f}MB')
+    
+    save_report(report, args.output)
+    print(f'-> {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from PIL import Image
+from posters import PosterFetcher
+from benchmarks.results import latency_summary
+
+def poster_bytes(size=(600, 900)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (180, 30, 40)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+def start_server(latency):
+    # Serves one poster for /posters/<n>.jpg and a 404 for everything else,
+    # counting every request so the caller can see which ones reached it.
+    body = poster_bytes()
+    hits = Counter()
+    lock = threading.Lock()
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                hits[self.path] += 1
+            time.sleep(latency)
+            if self.path.startswith('/posters/'):
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self.send_error(404)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    class Server(ThreadingHTTPServer):
+        # The default backlog of 5 drops connects from a full worker pool,
+        # which then wait out a one second SYN retry.
+        request_queue_size = 128
+    
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, hits
+
+def timed_prefetch(fetcher, urls):
+    start = time.perf_counter()
+    paths = fetcher.prefetch(urls)
+    return paths, time.perf_counter() - start
+
+def run(n_posters=40, callers=4, latency=0.05, workers=8):
+    # Timing only; tests/test_posters.py checks the same scenarios for
+    # correctness against this server.
+    server, _ = start_server(latency)
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    urls = [f'{base}/posters/{i}.jpg' for i in range(n_posters)]
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        fetcher = PosterFetcher(cache_dir=cache_dir, max_workers=workers)
+        
+        # Several callers asking for the same page at once, as concurrent
+        # sessions rendering one grid do.
+        results = [None] * callers
+        def caller(i):
+            results[i] = timed_prefetch(fetcher, urls)
+        threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        cold = latency_summary([seconds for _, seconds in results])
+        _, warm_seconds = timed_prefetch(fetcher, urls)
+        fetcher.close()
+        
+        restarted = PosterFetcher(cache_dir=cache_dir, max_workers=workers)
+        _, restart_seconds = timed_prefetch(restarted, urls)
+        restarted.close()
+    
+    server.shutdown()
+    print(f'cold page of {n_posters} x {callers} callers: p50 {cold["p50_ms"]:.1f}ms  max {max(s for _, s in results) * 1000:.1f}ms')
+    print(f'warm page: {warm_seconds * 1000:.1f}ms  after restart: {restart_seconds * 1000:.1f}ms')
+
+def main():
+    parser = argparse.ArgumentParser(description='Time cold and warm poster pages against a local HTTP server.')
+    parser.add_argument('--posters', type=int, default=40)
+    parser.add_argument('--callers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds the server waits before each response')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    
+    run(args.posters, args.callers, args.latency, args.workers)
+
+if __name__ == '__main__':
+    main()
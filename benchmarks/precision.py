@@ -0,0 +1,92 @@
+import argparse
+import time
+import numpy as np
+from recom_engine import MovieRecommendationEngine
+from benchmarks.synthetic import generate_catalog
+from benchmarks.ann_recall import sample_user_ratings
+from benchmarks.results import latency_summary, new_report, save_report
+
+CONFIGURATIONS = [
+    ('float64', None),
+    ('float32', None),
+    ('int8', None),
+    ('int8', 4),
+]
+
+def similarity_bytes(engine):
+    matrix = engine.tfidf_matrix
+    total = matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    for array in (engine.cosine_sim, engine.neighbor_indices, engine.neighbor_scores):
+        if array is not None:
+            total += array.nbytes
+    return total
+
+def timed_results(call, items):
+    samples, results = [], []
+    for item in items:
+        start = time.perf_counter()
+        results.append(call(item))
+        samples.append(time.perf_counter() - start)
+    return latency_summary(samples), results
+
+def run(n_movies, n_neighbors, n_queries, k=10, seed=0):
+    catalog = generate_catalog(n_movies, seed=seed)
+    rng = np.random.default_rng(seed)
+    movie_ids = rng.choice(catalog['movie_id'].values, n_queries).tolist()
+    reference, rows = None, []
+    
+    for precision, rerank_factor in CONFIGURATIONS:
+        start = time.perf_counter()
+        engine = MovieRecommendationEngine(catalog, n_neighbors=n_neighbors, precision=precision, rerank_factor=rerank_factor)
+        build_seconds = time.perf_counter() - start
+        users = sample_user_ratings(engine, n_queries, 10, seed)
+        
+        content_latency, content = timed_results(
+            lambda movie_id, engine=engine: engine.get_content_based_recommendations(movie_id, k)['movie_id'].tolist(),
+            movie_ids
+        )
+        profile_latency, profile = timed_results(
+            lambda ratings, engine=engine: engine.get_collaborative_recommendations(ratings, k)['movie_id'].tolist(),
+            users
+        )
+        if reference is None:
+            reference = content, profile
+        
+        name = precision if rerank_factor is None else f'{precision}+rerank{rerank_factor}'
+        rows.append({
+            'benchmark': f'precision_{name}',
+            'n_movies': n_movies,
+            'seconds': build_seconds,
+            'state_mb': similarity_bytes(engine) / 1e6,
+            'content_recall': recall(content, reference[0]),
+            'profile_recall': recall(profile, reference[1]),
+            'content_p50_ms': content_latency['p50_ms'],
+            'profile_p50_ms': profile_latency['p50_ms'],
+            **{key: value for key, value in content_latency.items() if key != 'calls'},
+        })
+    return rows
+
+def recall(results, reference):
+    return float(np.mean([len(set(a) & set(b)) / max(len(b), 1) for a, b in zip(results, reference)]))
+
+def main():
+    parser = argparse.ArgumentParser(description='Accuracy and speed of float64, float32 and int8 engine state.')
+    parser.add_argument('--movies', type=int, default=20000)
+    parser.add_argument('--neighbors', type=int, default=None, help='neighbor index width; dense similarity when omitted')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+    
+    rows = run(args.movies, args.neighbors, args.queries)
+    print(f'{"configuration":<26}{"build s":>9}{"state MB":>10}{"content p50":>13}{"profile p50":>13}{"recall c/p":>14}')
+    for row in rows:
+        print(f'{row["benchmark"]:<26}{row["seconds"]:>9.2f}{row["state_mb"]:>10.1f}{row["content_p50_ms"]:>11.2f}ms'
+              f'{row["profile_p50_ms"]:>11.2f}ms{row["content_recall"]:>8.3f}/{row["profile_recall"]:.3f}')
+    
+    if args.output:
+        report = new_report(movies=args.movies, neighbors=args.neighbors, queries=args.queries)
+        report['results'] = rows
+        save_report(report, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+
+FORMAT_VERSION = 1
+
+def latency_summary(samples):
+    samples = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        'calls': int(len(samples)),
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'p99_ms': float(np.percentile(samples, 99)),
+    }
+
+def new_report(**config):
+    return {
+        'format_version': FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': config,
+        'results': [],
+    }
+
+def save_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+def load_report(path):
+    with open(path) as f:
+        report = json.load(f)
+    if report.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f'{path}: unsupported benchmark format {report.get("format_version")}')
+    return report
+
+def result_key(result):
+    return result['benchmark'], result['n_movies']
+
+def compare(baseline, current, threshold=0.1, metric='p95_ms'):
+    # Startup results carry seconds instead of latency percentiles, so each
+    # row is compared on whichever of the two it has.
+    baseline_results = {result_key(result): result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        previous = baseline_results.get(result_key(result))
+        if previous is None:
+            continue
+        field = metric if metric in result else 'seconds'
+        if field not in result or field not in previous:
+            continue
+        before, after = previous[field], result[field]
+        change = (after - before) / before if before > 0 else 0.0
+        rows.append((result['benchmark'], result['n_movies'], field, before, after, change, change > threshold))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown that counts as a regression')
+    parser.add_argument('--metric', default='p95_ms', choices=['mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'])
+    args = parser.parse_args()
+    
+    rows = compare(load_report(args.baseline), load_report(args.current), args.threshold, args.metric)
+    regressions = 0
+    print(f'{"benchmark":<24}{"movies":>10}{"metric":>10}{"baseline":>12}{"current":>12}{"change":>9}')
+    for benchmark, n_movies, field, before, after, change, regressed in rows:
+        regressions += regressed
+        flag = '  REGRESSION' if regressed else ''
+        print(f'{benchmark:<24}{n_movies:>10}{field:>10}{before:>12.3f}{after:>12.3f}{change:>+9.1%}{flag}')
+    
+    if regressions:
+        print(f'{regressions} regression(s) above {args.threshold:.0%}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
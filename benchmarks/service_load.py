@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from benchmarks.results import latency_summary
+
+async def request(reader, writer, method, path, body=None):
+    body = json.dumps(body).encode('utf-8') if body is not None else b''
+    head = f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n'
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+    
+    status_line = await reader.readuntil(b'\r\n')
+    status = int(status_line.split(b' ', 2)[1])
+    headers = await reader.readuntil(b'\r\n\r\n')
+    length = 0
+    for line in headers.decode('latin-1').split('\r\n'):
+        if line.lower().startswith('content-length:'):
+            length = int(line.split(':', 1)[1])
+    await reader.readexactly(length)
+    return status
+
+def make_request(rng, movie_ids, mix):
+    kind = rng.choices(list(mix), weights=list(mix.values()))[0]
+    if kind == 'similar':
+        return kind, 'GET', f'/similar?movie_id={rng.choice(movie_ids)}&n=10', None
+    if kind == 'recommend':
+        ratings = {str(movie_id): rng.uniform(1, 5) for movie_id in rng.sample(movie_ids, 10)}
+        return kind, 'POST', '/recommend', {'ratings': ratings, 'n': 10}
+    if kind == 'search':
+        return kind, 'GET', f'/search?q=movie+{rng.randint(1, 999)}&n=10', None
+    return kind, 'GET', '/trending?n=10', None
+
+async def client(host, port, deadline, movie_ids, mix, samples, statuses, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            kind, method, path, body = make_request(rng, movie_ids, mix)
+            start = time.perf_counter()
+            status = await request(reader, writer, method, path, body)
+            samples.setdefault(kind, []).append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+async def run(host, port, concurrency, duration, mix, seed=0):
+    reader, writer = await asyncio.open_connection(host, port)
+    await request(reader, writer, 'GET', '/health')
+    writer.close()
+    
+    # Movie ids come from the trending endpoint so the script needs no catalog file.
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'GET /trending?n=100 HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n')
+    response = await reader.read()
+    writer.close()
+    movie_ids = [record['movie_id'] for record in json.loads(response.split(b'\r\n\r\n', 1)[1])['results']]
+    
+    samples, statuses = {}, {}
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, deadline, movie_ids, mix, samples, statuses, seed + i) for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    
+    total = sum(statuses.values())
+    print(f'{total} requests in {elapsed:.1f}s = {total / elapsed:.0f} req/s with {concurrency} clients; status {statuses}')
+    for kind, kind_samples in sorted(samples.items()):
+        summary = latency_summary(kind_samples)
+        print(f'  {kind:<10} n={summary["calls"]:<7} p50 {summary["p50_ms"]:.2f}ms  p95 {summary["p95_ms"]:.2f}ms  p99 {summary["p99_ms"]:.2f}ms')
+    return samples, statuses
+
+def main():
+    parser = argparse.ArgumentParser(description='Closed-loop load test against a running service.py.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--mix', default='similar=4,recommend=4,search=1,trending=1',
+                        help='relative weights of the endpoints')
+    args = parser.parse_args()
+    
+    mix = {name: float(weight) for name, weight in (part.split('=') for part in args.mix.split(','))}
+    asyncio.run(run(args.host, args.port, args.concurrency, args.duration, mix))
+
+if __name__ == '__main__':
+    main()
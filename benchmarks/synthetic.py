@@ -0,0 +1,90 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+GENRES = ['Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary', 'Drama',
+          'Family', 'Fantasy', 'Horror', 'Mystery', 'Romance', 'Sci-Fi', 'Thriller', 'War', 'Western']
+# Rough shares of each genre in public movie catalogs; drama and comedy dominate.
+GENRE_WEIGHTS = np.array([8, 4, 2, 14, 5, 3, 20, 3, 3, 6, 3, 8, 4, 10, 2, 1], dtype=np.float64)
+SIZES = {'1k': 1000, '10k': 10000, '100k': 100000, '1m': 1000000}
+
+def generate_catalog(n_movies, seed=0, n_keywords=5000, n_people=20000):
+    rng = np.random.default_rng(seed)
+    keywords = np.array([f'kw{i}' for i in range(n_keywords)])
+    people = np.array([f'Person{i}' for i in range(n_people)])
+    
+    # Zipf-like popularity, so a few keywords and people appear in many titles.
+    keyword_weights = 1.0 / np.arange(1, n_keywords + 1)
+    keyword_weights /= keyword_weights.sum()
+    people_weights = 1.0 / np.arange(1, n_people + 1) ** 0.8
+    people_weights /= people_weights.sum()
+    
+    n_genres = rng.choice([1, 2, 3], n_movies, p=[0.35, 0.45, 0.2])
+    # Gumbel top-k draws weighted genres without replacement for every row at once.
+    genre_ids = np.argsort(-(np.log(GENRE_WEIGHTS) + rng.gumbel(size=(n_movies, len(GENRES)))), axis=1)[:, :3]
+    genre_names = np.array(GENRES)
+    keyword_ids = rng.choice(n_keywords, (n_movies, 6), p=keyword_weights)
+    cast_ids = rng.choice(n_people, (n_movies, 4), p=people_weights)
+    director_ids = rng.choice(n_people, n_movies, p=people_weights)
+    
+    return pd.DataFrame({
+        'movie_id': np.arange(1, n_movies + 1),
+        'title': [f'Movie {i} {keywords[k]}' for i, k in enumerate(keyword_ids[:, 0])],
+        'genre': [', '.join(genre_names[row[:g]]) for row, g in zip(genre_ids, n_genres)],
+        'keywords': [' '.join(keywords[row]) for row in keyword_ids],
+        'director': people[director_ids],
+        'cast': [', '.join(people[row]) for row in cast_ids],
+        'year': np.clip(2025 - rng.exponential(18, n_movies).astype(int), 1920, 2025),
+        'rating': np.round(np.clip(rng.normal(6.5, 1.2, n_movies), 1, 10), 1),
+        'poster_url': [f'https://posters.example/{i}.jpg' for i in range(n_movies)],
+        'description': '',
+    })
+
+def generate_ratings(catalog, n_users, ratings_per_user=20, seed=0):
+    # Users rate popular movies far more often, and every user and movie has
+    # a bias around the catalog rating, so factor models have signal to find.
+    rng = np.random.default_rng(seed)
+    n_movies = len(catalog)
+    movie_weights = 1.0 / np.arange(1, n_movies + 1) ** 0.7
+    movie_weights = movie_weights[rng.permutation(n_movies)]
+    movie_weights /= movie_weights.sum()
+    
+    counts = np.maximum(rng.poisson(ratings_per_user, n_users), 1)
+    user_ids = np.repeat(np.arange(1, n_users + 1), counts)
+    positions = rng.choice(n_movies, counts.sum(), p=movie_weights)
+    user_bias = rng.normal(0, 0.6, n_users)[user_ids - 1]
+    
+    base = catalog['rating'].values[positions] / 2
+    ratings = np.clip(np.round((base + user_bias + rng.normal(0, 0.7, len(positions))) * 2) / 2, 0.5, 5.0)
+    ratings = pd.DataFrame({
+        'user_id': user_ids,
+        'movie_id': catalog['movie_id'].values[positions],
+        'rating': ratings,
+    })
+    return ratings.drop_duplicates(['user_id', 'movie_id'], keep='last').reset_index(drop=True)
+
+def parse_size(size):
+    return SIZES.get(str(size).lower()) or int(size)
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic movies_data.csv and ratings.csv.')
+    parser.add_argument('--size', default='10k', help='1k, 10k, 100k, 1m or a row count')
+    parser.add_argument('--users', type=int, default=None)
+    parser.add_argument('--ratings-per-user', type=int, default=20)
+    parser.add_argument('--output-dir', default='benchmark_data')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    n_movies = parse_size(args.size)
+    n_users = args.users or max(n_movies // 10, 100)
+    os.makedirs(args.output_dir, exist_ok=True)
+    
+    catalog = generate_catalog(n_movies, seed=args.seed)
+    ratings = generate_ratings(catalog, n_users, args.ratings_per_user, seed=args.seed)
+    catalog.to_csv(os.path.join(args.output_dir, 'movies_data.csv'), index=False)
+    ratings.to_csv(os.path.join(args.output_dir, 'ratings.csv'), index=False)
+    print(f'{len(catalog)} movies, {len(ratings)} ratings from {n_users} users -> {args.output_dir}')
+
+if __name__ == '__main__':
+    main()
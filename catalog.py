@@ -0,0 +1,123 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+CATALOG_COLUMNS = ['movie_id', 'title', 'genre', 'keywords', 'director', 'cast', 'year', 'rating', 'poster_url', 'description']
+CATEGORICAL_COLUMNS = ['genre', 'director']
+INTEGER_COLUMNS = ['movie_id', 'year']
+FLOAT_COLUMNS = ['rating']
+
+def load_catalog(path, columns=None):
+    # Parquet reads only the projected columns; CSV falls back to usecols,
+    # which still parses every line but keeps skipped columns out of memory.
+    columns = columns or CATALOG_COLUMNS
+    if path.endswith('.parquet'):
+        movies_df = pd.read_parquet(path, columns=columns)
+    else:
+        available = pd.read_csv(path, nrows=0).columns
+        movies_df = pd.read_csv(path, usecols=[column for column in columns if column in available])
+    return compact_catalog(movies_df)
+
+def iter_catalog(path, chunk_size=50000, columns=None):
+    # Yields compacted frames of at most chunk_size rows, so a build over the
+    # whole catalog never holds more than one chunk of raw text.
+    columns = columns or CATALOG_COLUMNS
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield compact_catalog(batch.to_pandas())
+    else:
+        available = pd.read_csv(path, nrows=0).columns
+        usecols = [column for column in columns if column in available]
+        for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunk_size):
+            yield compact_catalog(chunk)
+
+def compact_catalog(movies_df):
+    if 'movie_id' in movies_df:
+        # A movie without an id can be neither looked up nor rated, and
+        # keeping it would turn the whole id column into float32.
+        movies_df = movies_df[pd.to_numeric(movies_df['movie_id'], errors='coerce').notna()]
+    movies_df = movies_df.reset_index(drop=True)
+    for column in CATEGORICAL_COLUMNS:
+        if column in movies_df and not isinstance(movies_df[column].dtype, pd.CategoricalDtype):
+            movies_df[column] = movies_df[column].astype('category')
+    for column in INTEGER_COLUMNS:
+        if column in movies_df:
+            values = pd.to_numeric(movies_df[column], errors='coerce')
+            # Missing years cannot live in int32, so those columns stay float32.
+            movies_df[column] = values.astype(np.float32 if values.isna().any() else np.int32)
+    for column in FLOAT_COLUMNS:
+        if column in movies_df:
+            # Ratings stay float64: float32 would turn 7.2 into 7.19999..., which
+            # drops boundary values from range filters and leaks into output.
+            movies_df[column] = pd.to_numeric(movies_df[column], errors='coerce').astype(np.float64)
+    return movies_df
+
+def text_column(series):
+    # Works for object and categorical columns alike; fillna('') on a
+    # categorical would fail because '' is not one of its categories.
+    return series.astype(object).fillna('').astype(str)
+
+def combined_features(movies_df):
+    combined = (
+        text_column(movies_df['genre']) + ' ' +
+        text_column(movies_df['keywords']) + ' ' +
+        text_column(movies_df['director']) + ' ' +
+        text_column(movies_df['cast'])
+    )
+    return combined.str.lower()
+
+def catalog_memory(movies_df):
+    return int(movies_df.memory_usage(index=True, deep=True).sum())
+
+def memory_report(before_df, after_df):
+    before, after = catalog_memory(before_df), catalog_memory(after_df)
+    return {
+        'before_bytes': before,
+        'after_bytes': after,
+        'saved_bytes': before - after,
+        'saved_ratio': (before - after) / before if before else 0.0,
+    }
+
+class RowView:
+    __slots__ = ('frame', 'position')
+    
+    def __init__(self, frame, position):
+        self.frame = frame
+        self.position = position
+    
+    def __getitem__(self, column):
+        return self.frame[column].iat[self.position]
+    
+    def __contains__(self, column):
+        return column in self.frame.columns
+    
+    def get(self, column, default=None):
+        if column not in self.frame.columns:
+            return default
+        return self[column]
+    
+    def keys(self):
+        return list(self.frame.columns)
+    
+    def to_dict(self):
+        return {column: self[column] for column in self.frame.columns}
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a catalog CSV to compact Parquet and report the memory saved.')
+    parser.add_argument('csv_path')
+    parser.add_argument('--parquet', default=None, help='output path, defaults to the CSV path with .parquet')
+    args = parser.parse_args()
+    
+    raw = pd.read_csv(args.csv_path)
+    compact = compact_catalog(raw)
+    parquet_path = args.parquet or os.path.splitext(args.csv_path)[0] + '.parquet'
+    compact.to_parquet(parquet_path, index=False)
+    
+    report = memory_report(raw, compact)
+    print(f'{args.csv_path}: {report["before_bytes"] / 1e6:.1f} MB -> {report["after_bytes"] / 1e6:.1f} MB '
+          f'({report["saved_ratio"]:.0%} saved) -> {parquet_path}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import numpy as np
+from scipy import sparse
+
+class MatrixFactorization:
+    def __init__(self, n_factors=32, regularization=0.1, n_iterations=10, chunk_nnz=16384, seed=0):
+        self.n_factors = n_factors
+        self.regularization = regularization
+        self.n_iterations = n_iterations
+        self.chunk_nnz = chunk_nnz
+        self.seed = seed
+        self.user_ids = np.zeros(0, dtype=np.int64)
+        self.movie_ids = np.zeros(0, dtype=np.int64)
+        self.user_factors = np.zeros((0, n_factors), dtype=np.float32)
+        self.item_factors = np.zeros((0, n_factors), dtype=np.float32)
+        self.global_mean = 0.0
+    
+    def fit(self, user_ids, movie_ids, ratings):
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        ratings = np.asarray(ratings, dtype=np.float32)
+        
+        self.user_ids, user_rows = np.unique(user_ids, return_inverse=True)
+        self.movie_ids, item_cols = np.unique(movie_ids, return_inverse=True)
+        self.global_mean = float(ratings.mean()) if len(ratings) else 0.0
+        
+        shape = (len(self.user_ids), len(self.movie_ids))
+        user_item = sparse.csr_matrix((ratings - self.global_mean, (user_rows, item_cols)), shape=shape)
+        user_item.sum_duplicates()
+        item_user = user_item.T.tocsr()
+        
+        rng = np.random.default_rng(self.seed)
+        scale = 1.0 / np.sqrt(self.n_factors)
+        self.user_factors = (rng.standard_normal((shape[0], self.n_factors)) * scale).astype(np.float32)
+        self.item_factors = (rng.standard_normal((shape[1], self.n_factors)) * scale).astype(np.float32)
+        
+        for _ in range(self.n_iterations):
+            self.user_factors = self._solve_side(user_item, self.item_factors)
+            self.item_factors = self._solve_side(item_user, self.user_factors)
+        
+        return self
+    
+    def _solve_side(self, matrix, other_factors):
+        # Alternating least squares step: every row gets a ridge regression
+        # against the factors of the entities it interacted with. Rows are
+        # solved in chunks of roughly chunk_nnz ratings (and at most
+        # chunk_nnz / n_factors rows, which bounds the stacked Gram
+        # matrices) with batched solves.
+        n_rows = matrix.shape[0]
+        factors = np.zeros((n_rows, self.n_factors), dtype=np.float32)
+        counts = np.diff(matrix.indptr)
+        identity = np.eye(self.n_factors, dtype=np.float64)
+        max_rows = max(1, self.chunk_nnz // self.n_factors)
+        
+        start = 0
+        while start < n_rows:
+            end = int(np.searchsorted(matrix.indptr, matrix.indptr[start] + self.chunk_nnz, side='right'))
+            end = min(max(end - 1, start + 1), start + max_rows, n_rows)
+            
+            rows = start + np.flatnonzero(counts[start:end])
+            if len(rows):
+                lo, hi = matrix.indptr[start], matrix.indptr[end]
+                neighbors = other_factors[matrix.indices[lo:hi]].astype(np.float64)
+                values = matrix.data[lo:hi].astype(np.float64)
+                offsets = matrix.indptr[rows] - lo
+                
+                # One factor column at a time, so the temporary is nnz x f
+                # rather than the nnz x f x f of all outer products at once.
+                gram = np.empty((len(rows), self.n_factors, self.n_factors), dtype=np.float64)
+                for i in range(self.n_factors):
+                    gram[:, i, :] = np.add.reduceat(neighbors[:, i:i + 1] * neighbors, offsets, axis=0)
+                rhs = np.add.reduceat(neighbors * values[:, None], offsets, axis=0)
+                gram += self.regularization * counts[rows][:, None, None] * identity
+                factors[rows] = np.linalg.solve(gram, rhs[..., None])[..., 0]
+            
+            start = end
+        
+        return factors
+    
+    def fold_in(self, movie_ids, ratings):
+        positions = self.item_positions(movie_ids)
+        known = positions >= 0
+        if not known.any():
+            return np.zeros(self.n_factors, dtype=np.float32)
+        
+        neighbors = self.item_factors[positions[known]].astype(np.float64)
+        values = np.asarray(ratings, dtype=np.float64)[known] - self.global_mean
+        gram = neighbors.T @ neighbors + self.regularization * known.sum() * np.eye(self.n_factors)
+        return np.linalg.solve(gram, neighbors.T @ values).astype(np.float32)
+    
+    def user_vector(self, user_id):
+        position = np.searchsorted(self.user_ids, user_id)
+        if position < len(self.user_ids) and self.user_ids[position] == user_id:
+            return self.user_factors[position]
+        return None
+    
+    def item_positions(self, movie_ids):
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        positions = np.searchsorted(self.movie_ids, movie_ids)
+        positions = np.minimum(positions, max(len(self.movie_ids) - 1, 0))
+        found = len(self.movie_ids) > 0
+        if found:
+            found = self.movie_ids[positions] == movie_ids
+        return np.where(found, positions, -1)
+    
+    def align_item_factors(self, catalog_movie_ids):
+        # Item factors reordered to catalog row positions; movies without
+        # ratings get a zero vector, which is_unrated() lets callers skip.
+        positions = self.item_positions(catalog_movie_ids)
+        aligned = np.zeros((len(positions), self.n_factors), dtype=np.float32)
+        aligned[positions >= 0] = self.item_factors[positions[positions >= 0]]
+        return aligned
+    
+    def is_unrated(self, catalog_movie_ids):
+        return self.item_positions(catalog_movie_ids) < 0
+    
+    def save(self, path):
+        np.savez(
+            path,
+            user_ids=self.user_ids,
+            movie_ids=self.movie_ids,
+            user_factors=self.user_factors,
+            item_factors=self.item_factors,
+            params=np.array([self.n_factors, self.regularization, self.n_iterations, self.global_mean], dtype=np.float64)
+        )
+    
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            n_factors, regularization, n_iterations, global_mean = data['params']
+            model = cls(int(n_factors), float(regularization), int(n_iterations))
+            model.user_ids = data['user_ids']
+            model.movie_ids = data['movie_ids']
+            model.user_factors = data['user_factors']
+            model.item_factors = data['item_factors']
+            model.global_mean = float(global_mean)
+        return model
+
+def train_from_repository(repository, **params):
+    rows = repository.get_all_ratings()
+    if not rows:
+        return MatrixFactorization(**params)
+    user_ids, movie_ids, ratings = (np.array(column) for column in zip(*rows))
+    return MatrixFactorization(**params).fit(user_ids, movie_ids, ratings)
+
+def main():
+    from ratings_store import RatingsRepository
+    
+    parser = argparse.ArgumentParser(description='Train latent factors from the user_ratings table.')
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--output', default='cf_model.npz')
+    parser.add_argument('--factors', type=int, default=32)
+    parser.add_argument('--regularization', type=float, default=0.1)
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+    
+    repository = RatingsRepository.from_url(args.database_url) if args.database_url else RatingsRepository()
+    model = train_from_repository(
+        repository,
+        n_factors=args.factors,
+        regularization=args.regularization,
+        n_iterations=args.iterations
+    )
+    repository.close()
+    model.save(args.output)
+    print(f'Trained {len(model.user_ids)} users x {len(model.movie_ids)} movies -> {args.output}')
+
+if __name__ == '__main__':
+    main()
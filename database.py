@@ -1,13 +1,30 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text
+from contextlib import contextmanager
+from sqlalchemy import create_engine, inspect, Column, Integer, String, Float, DateTime, Text, Index
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, scoped_session
 from datetime import datetime
 
-DATABASE_URL = os.getenv('DATABASE_URL')
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///movierecom.db')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+RATING_INDEX = 'ix_user_ratings_user_movie'
 
-engine = create_engine(DATABASE_URL, echo=False)
+def create_db_engine(database_url=DATABASE_URL):
+    if database_url.startswith('sqlite'):
+        return create_engine(database_url, echo=False, connect_args={'check_same_thread': False})
+    return create_engine(
+        database_url,
+        echo=False,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=True
+    )
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ScopedSession = scoped_session(SessionLocal)
 Base = declarative_base()
 
 class User(Base):
@@ -21,19 +38,42 @@ class User(Base):
 
 class UserRating(Base):
     __tablename__ = 'user_ratings'
+    __table_args__ = (
+        Index(RATING_INDEX, 'user_id', 'movie_id', unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False)
     movie_id = Column(Integer, nullable=False)
     rating = Column(Float, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
+def init_db(bind=None):
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    ensure_rating_index(bind)
+
+def ensure_rating_index(bind):
+    # create_all skips tables that already exist, so a user_ratings table
+    # from before the unique index would never get it and every
+    # ON CONFLICT (user_id, movie_id) upsert would fail.
+    rating_index = next(index for index in UserRating.__table__.indexes if index.name == RATING_INDEX)
+    try:
+        rating_index.create(bind=bind, checkfirst=True)
+    except SQLAlchemyError as error:
+        raise RuntimeError(
+            f'Could not create unique index {RATING_INDEX} on user_ratings; '
+            'remove duplicate (user_id, movie_id) rows and restart'
+        ) from error
+    
+    indexes = inspect(bind).get_indexes(UserRating.__tablename__)
+    if not any(index['unique'] and index['column_names'] == ['user_id', 'movie_id'] for index in indexes):
+        raise RuntimeError(f'user_ratings has no unique (user_id, movie_id) index; expected {RATING_INDEX}')
 
+@contextmanager
 def get_db():
     db = SessionLocal()
     try:
-        return db
+        yield db
     finally:
-        pass
+        db.close()
@@ -0,0 +1,130 @@
+import copy
+import numpy as np
+import pandas as pd
+from catalog import text_column
+
+class FacetIndex:
+    def __init__(self, movies_df):
+        self.build(movies_df)
+    
+    def build(self, movies_df):
+        self.n_rows = len(movies_df)
+        
+        genre_column = text_column(pd.Series(movies_df['genre'].values))
+        genre_lists = genre_column.str.split(',').explode().str.strip()
+        genre_lists = genre_lists[genre_lists != '']
+        codes, genres = pd.factorize(genre_lists, sort=True)
+        
+        multi_hot = np.zeros((len(genres), self.n_rows), dtype=bool)
+        multi_hot[codes, genre_lists.index.values] = True
+        
+        self.set_genres(genres.tolist(), multi_hot)
+        self.set_ranges(
+            movies_df['year'].to_numpy(dtype=np.float64, na_value=np.nan),
+            movies_df['rating'].to_numpy(dtype=np.float64, na_value=np.nan)
+        )
+    
+    def set_genres(self, genres, multi_hot):
+        self.genres = genres
+        self.genre_codes = {genre: code for code, genre in enumerate(self.genres)}
+        self.genre_bits = np.packbits(multi_hot, axis=1)
+    
+    def set_ranges(self, years, ratings):
+        self.n_rows = len(years)
+        self.years, self.ratings = years, ratings
+        self.year_order, self.sorted_years = self._sorted_values(years)
+        self.rating_order, self.sorted_ratings = self._sorted_values(ratings)
+    
+    def multi_hot(self, genres=None):
+        genres = genres or self.genres
+        multi_hot = np.zeros((len(genres), self.n_rows), dtype=bool)
+        for code, genre in enumerate(genres):
+            if genre in self.genre_codes:
+                multi_hot[code] = np.unpackbits(self.genre_bits[self.genre_codes[genre]], count=self.n_rows)
+        return multi_hot
+    
+    def added(self, movies_df):
+        # Like SearchIndex.added, a new index is returned and this one is left
+        # as is for readers that still hold it. The new rows' bits go past this
+        # index's n_rows, which its readers never look at, into spare bytes
+        # reserved by doubling; only a new genre or a full buffer copies them.
+        added = FacetIndex(movies_df)
+        start, n_rows = self.n_rows, self.n_rows + added.n_rows
+        n_bytes = (n_rows + 7) // 8
+        genre_codes = dict(self.genre_codes)
+        for genre in added.genres:
+            genre_codes.setdefault(genre, len(genre_codes))
+        
+        bits = self.genre_bits
+        if len(genre_codes) > len(bits) or n_bytes > bits.shape[1]:
+            bits = np.zeros((len(genre_codes), max(n_bytes, 2 * bits.shape[1])), dtype=np.uint8)
+            bits[:len(self.genre_bits), :self.genre_bits.shape[1]] = self.genre_bits
+        
+        # The byte holding row start keeps its leading bits; everything after
+        # them is rewritten, which also clears bits left by a discarded update.
+        first = start // 8
+        offset = start - 8 * first
+        rows = np.zeros((len(genre_codes), 8 * (n_bytes - first)), dtype=bool)
+        rows[:, :offset] = np.unpackbits(bits[:, first:first + 1], axis=1)[:, :offset]
+        for genre, code in added.genre_codes.items():
+            rows[genre_codes[genre], offset:offset + added.n_rows] = np.unpackbits(added.genre_bits[code], count=added.n_rows)
+        bits[:, first:n_bytes] = np.packbits(rows, axis=1)
+        
+        index = copy.copy(self)
+        index.genres = sorted(genre_codes)
+        index.genre_codes = genre_codes
+        index.genre_bits = bits
+        index.n_rows = n_rows
+        index.years = np.concatenate([self.years, added.years])
+        index.ratings = np.concatenate([self.ratings, added.ratings])
+        index.year_order, index.sorted_years = self._merged_values(self.year_order, self.sorted_years, added.year_order + start, added.sorted_years)
+        index.rating_order, index.sorted_ratings = self._merged_values(self.rating_order, self.sorted_ratings, added.rating_order + start, added.sorted_ratings)
+        return index
+    
+    def removed(self, keep):
+        multi_hot = self.multi_hot()[:, keep]
+        present = multi_hot.any(axis=1)
+        index = copy.copy(self)
+        index.set_genres([genre for genre, used in zip(self.genres, present) if used], multi_hot[present])
+        index.set_ranges(self.years[keep], self.ratings[keep])
+        return index
+    
+    def mask(self, genres=None, year_range=None, rating_range=None):
+        mask = np.ones(self.n_rows, dtype=bool)
+        
+        if genres:
+            bits = None
+            for genre in genres:
+                code = self.genre_codes.get(genre)
+                if code is None:
+                    return np.zeros(self.n_rows, dtype=bool)
+                bits = self.genre_bits[code] if bits is None else bits & self.genre_bits[code]
+            mask &= np.unpackbits(bits, count=self.n_rows).astype(bool)
+        
+        if year_range is not None:
+            mask &= self._range_mask(self.year_order, self.sorted_years, year_range)
+        
+        if rating_range is not None:
+            mask &= self._range_mask(self.rating_order, self.sorted_ratings, rating_range)
+        
+        return mask
+    
+    def filter(self, genres=None, year_range=None, rating_range=None):
+        return np.flatnonzero(self.mask(genres, year_range, rating_range))
+    
+    def _range_mask(self, order, sorted_values, value_range):
+        lo = np.searchsorted(sorted_values, value_range[0], side='left')
+        hi = np.searchsorted(sorted_values, value_range[1], side='right')
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[order[lo:hi]] = True
+        return mask
+    
+    def _sorted_values(self, values):
+        order = np.argsort(values, kind='stable')
+        return order, values[order]
+    
+    def _merged_values(self, order, sorted_values, new_order, new_sorted):
+        # Same result as a stable sort of the concatenated values, without
+        # sorting the existing rows again.
+        positions = np.searchsorted(sorted_values, new_sorted, side='right')
+        return np.insert(order, positions, new_order), np.insert(sorted_values, positions, new_sorted)
@@ -0,0 +1,44 @@
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+N_FEATURES = 2 ** 18
+
+class HashingTfidf:
+    # Hashed term columns need no fitted vocabulary, so any chunk (or any
+    # movie added later) lands in the same column space. Only the IDF vector
+    # is learned, from document frequencies counted while streaming.
+    vocabulary_ = None
+    
+    def __init__(self, n_features=N_FEATURES, dtype=np.float32, idf=None):
+        self.n_features = n_features
+        self.dtype = dtype
+        self.idf_ = idf
+        self.hasher = HashingVectorizer(
+            n_features=n_features,
+            stop_words='english',
+            alternate_sign=False,
+            norm=None,
+            dtype=dtype
+        )
+    
+    def term_counts(self, documents):
+        counts = self.hasher.transform(documents)
+        counts.sort_indices()
+        return counts
+    
+    def set_document_frequency(self, document_frequency, n_documents):
+        # Same smoothed IDF as TfidfVectorizer, so scores stay comparable.
+        self.idf_ = (np.log((1 + n_documents) / (1 + document_frequency)) + 1).astype(self.dtype)
+        return self
+    
+    def transform(self, documents):
+        counts = self.term_counts(documents)
+        counts.data *= self.idf_[counts.indices]
+        return normalize(counts, copy=False)
+    
+    def build_analyzer(self):
+        return self.hasher.build_analyzer()
+    
+    def get_params(self):
+        return {'n_features': self.n_features, 'dtype': self.dtype}
@@ -0,0 +1,182 @@
+import cProfile
+import functools
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '0') == '1'
+METRICS_FILE = os.getenv('METRICS_FILE')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', '500'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+METRIC_PREFIX = 'movierec'
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+NULL_SPAN = nullcontext()
+
+class Metrics:
+    def __init__(self, enabled=False, profile_sample_rate=0.0, profile_slow_ms=500, profile_dir='profiles'):
+        self.enabled = enabled
+        self.profile_sample_rate = profile_sample_rate
+        self.profile_slow_ms = profile_slow_ms
+        self.profile_dir = profile_dir
+        self.lock = threading.Lock()
+        # Only one cProfile session can be active per interpreter.
+        self.profiler_lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+    
+    def increment(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+    
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+    
+    def span(self, stage):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, stage)
+    
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+    
+    def render_prometheus(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+        
+        lines = []
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f'{METRIC_PREFIX}_{name}'
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric}{_format_labels(labels)} {value}')
+        
+        for (name, labels), (buckets, total, count) in histograms:
+            metric = f'{METRIC_PREFIX}_{name}'
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f'# TYPE {metric} histogram')
+            for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f'{metric}_bucket{_format_labels(labels + (("le", repr(bound)),))} {bucket_count}')
+            lines.append(f'{metric}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{metric}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{metric}_count{_format_labels(labels)} {count}')
+        
+        return '\n'.join(lines) + '\n'
+    
+    def write_prometheus(self, path):
+        # Written to a temporary file and renamed, so a node_exporter textfile
+        # collector never reads a half-written file.
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+    
+    def serve(self, port, host='127.0.0.1'):
+        metrics = self
+        
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+        return server
+
+class Span:
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+        self.profiler = None
+    
+    def __enter__(self):
+        metrics = self.metrics
+        if metrics.profile_sample_rate and random.random() < metrics.profile_sample_rate:
+            if metrics.profiler_lock.acquire(blocking=False):
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed = time.perf_counter() - self.start
+        self.metrics.observe('stage_seconds', elapsed, stage=self.stage)
+        if exc_type is not None:
+            self.metrics.increment('stage_errors_total', stage=self.stage)
+        
+        if self.profiler is not None:
+            self.profiler.disable()
+            try:
+                if elapsed * 1000 >= self.metrics.profile_slow_ms:
+                    os.makedirs(self.metrics.profile_dir, exist_ok=True)
+                    name = f'{self.stage}-{time.strftime("%Y%m%d-%H%M%S")}-{int(elapsed * 1000)}ms.prof'
+                    self.profiler.dump_stats(os.path.join(self.metrics.profile_dir, name))
+                    self.metrics.increment('slow_profiles_total', stage=self.stage)
+            finally:
+                self.profiler = None
+                self.metrics.profiler_lock.release()
+        return False
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+metrics = Metrics(METRICS_ENABLED, PROFILE_SAMPLE_RATE, PROFILE_SLOW_MS, PROFILE_DIR)
+
+def timed(stage):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            with Span(metrics, stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def span(stage):
+    return metrics.span(stage)
+
+def increment(name, value=1, **labels):
+    metrics.increment(name, value, **labels)
+
+def export_metrics():
+    if metrics.enabled and METRICS_FILE:
+        metrics.write_prometheus(METRICS_FILE)
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from hashing_tfidf import HashingTfidf
+from quantize import QuantizedScores, score_dtype
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+
+def catalog_fingerprint(catalog_path, **params):
+    digest = hashlib.sha256()
+    digest.update(f'format={FORMAT_VERSION};'.encode())
+    for key in sorted(params):
+        digest.update(f'{key}={params[key]};'.encode())
+    
+    with open(catalog_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    
+    return digest.hexdigest()
+
+def artifact_path(artifact_dir, fingerprint):
+    return os.path.join(artifact_dir, fingerprint)
+
+def is_valid_artifact(path):
+    manifest = read_manifest(path)
+    return manifest is not None and manifest.get('format_version') == FORMAT_VERSION
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_model(engine, path, fingerprint=None):
+    tmp_path = staging_path(path)
+    
+    tfidf_matrix = engine.tfidf_matrix.tocsr()
+    arrays = {
+        'idf': engine.tfidf.idf_,
+        'tfidf_data': tfidf_matrix.data,
+        'tfidf_indices': tfidf_matrix.indices,
+        'tfidf_indptr': tfidf_matrix.indptr,
+    }
+    if engine.cosine_sim is not None:
+        arrays.update(_score_arrays('cosine_sim', engine.cosine_sim))
+    else:
+        arrays['neighbor_indices'] = engine.neighbor_indices
+        arrays.update(_score_arrays('neighbor_scores', engine.neighbor_scores))
+    
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f'{name}.npy'), np.ascontiguousarray(array))
+    
+    vocabulary = engine.tfidf.vocabulary_
+    if vocabulary is not None:
+        vocabulary = {term: int(index) for term, index in vocabulary.items()}
+    write_manifest(tmp_path, {
+        'fingerprint': fingerprint,
+        'n_movies': int(tfidf_matrix.shape[0]),
+        'n_features': int(tfidf_matrix.shape[1]),
+        'n_neighbors': engine.n_neighbors,
+        'precision': engine.precision,
+        'vectorizer': _vectorizer_kind(engine.tfidf),
+        'vectorizer_params': _vectorizer_params(engine.tfidf),
+        'vocabulary': vocabulary,
+        'drift_baseline': engine.drift_baseline,
+        'arrays': sorted(arrays),
+    })
+    commit_artifact(tmp_path, path)
+
+def staging_path(path):
+    # Written to a sibling temp directory and renamed into place, so readers
+    # never see a half-written artifact.
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    return tmp_path
+
+def write_manifest(tmp_path, manifest):
+    manifest = dict(manifest, format_version=FORMAT_VERSION)
+    with open(os.path.join(tmp_path, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f)
+
+def commit_artifact(tmp_path, path):
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Another process published the same artifact first.
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not is_valid_artifact(path):
+            raise
+
+def load_model(engine, path, mmap=True):
+    manifest = read_manifest(path)
+    if manifest is None or manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f'No compatible model artifact at {path}')
+    
+    mmap_mode = 'r' if mmap else None
+    arrays = {
+        name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+        for name in manifest['arrays']
+    }
+    
+    if manifest['n_movies'] != len(engine.movies_df):
+        raise ValueError(f'Artifact at {path} was built for {manifest["n_movies"]} movies, '
+                         f'catalog has {len(engine.movies_df)}')
+    
+    params = dict(manifest['vectorizer_params'])
+    params['dtype'] = np.dtype(params['dtype']).type
+    
+    if manifest.get('vectorizer') == 'hashing':
+        tfidf = HashingTfidf(**params)
+    else:
+        params['ngram_range'] = tuple(params['ngram_range'])
+        tfidf = TfidfVectorizer(**params)
+        tfidf.vocabulary_ = manifest['vocabulary']
+    tfidf.idf_ = np.asarray(arrays['idf'])
+    
+    engine.tfidf = tfidf
+    engine.tfidf_matrix = sparse.csr_matrix(
+        (arrays['tfidf_data'], arrays['tfidf_indices'], arrays['tfidf_indptr']),
+        shape=(manifest['n_movies'], manifest['n_features']),
+        copy=False
+    )
+    engine.n_neighbors = manifest['n_neighbors']
+    engine.precision = manifest.get('precision', 'float64')
+    engine.dtype = score_dtype(engine.precision)
+    engine.cosine_sim = _load_scores('cosine_sim', arrays)
+    engine.neighbor_indices = arrays.get('neighbor_indices')
+    engine.neighbor_scores = _load_scores('neighbor_scores', arrays)
+    # Artifacts written before the baseline was recorded measure it again.
+    drift_baseline = manifest.get('drift_baseline')
+    engine.drift_baseline = engine.measure_drift_baseline() if drift_baseline is None else drift_baseline
+    return manifest
+
+def _score_arrays(name, scores):
+    if isinstance(scores, QuantizedScores):
+        return {f'{name}_codes': scores.codes, f'{name}_scales': scores.scales}
+    return {name: scores}
+
+def _load_scores(name, arrays):
+    if f'{name}_codes' in arrays:
+        return QuantizedScores(arrays[f'{name}_codes'], arrays[f'{name}_scales'])
+    return arrays.get(name)
+
+def _vectorizer_kind(vectorizer):
+    return 'hashing' if isinstance(vectorizer, HashingTfidf) else 'tfidf'
+
+def _vectorizer_params(vectorizer):
+    params = vectorizer.get_params()
+    params['dtype'] = np.dtype(params['dtype']).name
+    return params
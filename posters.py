@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+from instrumentation import timed, increment
+
+THUMBNAIL_SIZE = (300, 450)
+
+logger = logging.getLogger(__name__)
+
+class ThumbnailCache:
+    def __init__(self, cache_dir='poster_cache', max_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.load_entries()
+    
+    def load_entries(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.jpg') and os.path.isfile(path):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+        
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+            self.total_bytes += size
+    
+    def key(self, url):
+        return hashlib.sha1(url.encode()).hexdigest() + '.jpg'
+    
+    def get(self, url):
+        name = self.key(url)
+        path = os.path.join(self.cache_dir, name)
+        with self.lock:
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+        
+        try:
+            os.utime(path)
+        except OSError:
+            with self.lock:
+                self._forget(name)
+            return None
+        return path
+    
+    def put(self, url, image):
+        name = self.key(url)
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        
+        image.save(tmp_path, format='JPEG', quality=85)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        
+        with self.lock:
+            self._forget(name)
+            self.entries[name] = size
+            self.total_bytes += size
+            self._evict()
+        return path
+    
+    def _forget(self, name):
+        size = self.entries.pop(name, None)
+        if size is not None:
+            self.total_bytes -= size
+    
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            name, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+class PosterFetcher:
+    def __init__(self, cache_dir='poster_cache', max_cache_bytes=200 * 1024 * 1024, max_workers=8,
+                 timeout=5, negative_ttl=3600, max_failed=10000, thumbnail_size=THUMBNAIL_SIZE, session=None):
+        self.cache = ThumbnailCache(cache_dir, max_cache_bytes)
+        self.timeout = timeout
+        self.negative_ttl = negative_ttl
+        self.max_failed = max_failed
+        self.thumbnail_size = thumbnail_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='poster')
+        self.session = session or self.create_session(max_workers)
+        self.failed = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.RLock()
+    
+    def create_session(self, pool_size):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
+    @timed('poster_fetch')
+    def fetch(self, url):
+        if not isinstance(url, str) or not url:
+            return None
+        
+        path = self.cache.get(url)
+        if path is not None:
+            increment('poster_requests_total', result='cache_hit')
+            return path
+        
+        if self.is_known_broken(url):
+            increment('poster_requests_total', result='known_broken')
+            return None
+        
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            image = Image.open(BytesIO(response.content))
+            image = image.convert('RGB')
+            image.thumbnail(self.thumbnail_size)
+        except (requests.RequestException, OSError, Image.DecompressionBombError):
+            # Only a failed download or an undecodable image marks the URL
+            # broken; PIL reports unreadable data as OSError.
+            increment('poster_requests_total', result='failed')
+            self.mark_broken(url)
+            return None
+        
+        increment('poster_requests_total', result='downloaded')
+        try:
+            return self.cache.put(url, image)
+        except OSError:
+            # A full or read-only cache directory is not the poster's fault,
+            # so the URL is tried again on the next request.
+            increment('poster_requests_total', result='cache_error')
+            logger.exception('Could not write thumbnail for %s to %s', url, self.cache.cache_dir)
+            return None
+    
+    def mark_broken(self, url):
+        # Oldest entries go first once max_failed URLs are remembered, as in
+        # the thumbnail LRU, so a stream of distinct bad URLs stays bounded.
+        with self.lock:
+            self.failed[url] = time.monotonic() + self.negative_ttl
+            self.failed.move_to_end(url)
+            while len(self.failed) > self.max_failed:
+                self.failed.popitem(last=False)
+    
+    def is_known_broken(self, url):
+        with self.lock:
+            expires_at = self.failed.get(url)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self.failed[url]
+                return False
+            return True
+    
+    def submit(self, url):
+        # Concurrent requests for the same URL share one download.
+        with self.lock:
+            future = self.in_flight.get(url)
+            if future is None:
+                future = self.executor.submit(self.fetch, url)
+                self.in_flight[url] = future
+                future.add_done_callback(lambda _: self._finish(url))
+            return future
+    
+    def _finish(self, url):
+        with self.lock:
+            self.in_flight.pop(url, None)
+    
+    def prefetch(self, urls):
+        futures = {url: self.submit(url) for url in dict.fromkeys(urls)}
+        return {url: future.result() for url, future in futures.items()}
+    
+    def prefetch_async(self, urls):
+        return [self.submit(url) for url in dict.fromkeys(urls)]
+    
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,70 @@
+import numpy as np
+
+PRECISIONS = ('float64', 'float32', 'int8')
+NEG_INF_CODE = -128
+
+class QuantizedScores:
+    # Row-scaled int8 codes that index like the float array they replace:
+    # reads return dequantized float32, and -inf survives as a reserved code.
+    def __init__(self, codes, scales):
+        self.codes = codes
+        self.scales = scales
+    
+    @classmethod
+    def quantize(cls, scores, block_size=4096):
+        scores = np.asarray(scores)
+        codes = np.empty(scores.shape, dtype=np.int8)
+        scales = np.ones(scores.shape[0], dtype=np.float32)
+        for start in range(0, scores.shape[0], block_size):
+            block = np.asarray(scores[start:start + block_size], dtype=np.float32)
+            finite = np.isfinite(block)
+            peak = np.abs(np.where(finite, block, 0)).max(axis=1, initial=0) / 127
+            peak[peak == 0] = 1
+            scales[start:start + block_size] = peak
+            codes[start:start + block_size] = np.where(
+                finite, np.clip(np.rint(block / peak[:, None]), -127, 127), NEG_INF_CODE
+            )
+        return cls(codes, scales)
+    
+    @property
+    def shape(self):
+        return self.codes.shape
+    
+    @property
+    def dtype(self):
+        return np.dtype(np.float32)
+    
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.scales.nbytes
+    
+    def __len__(self):
+        return len(self.codes)
+    
+    def __getitem__(self, key):
+        rows = key[0] if isinstance(key, tuple) else key
+        codes = np.asarray(self.codes[key])
+        scales = np.asarray(self.scales[rows], dtype=np.float32)
+        if codes.ndim == 2:
+            scales = scales.reshape(-1, 1)
+        values = codes.astype(np.float32) * scales
+        values[codes == NEG_INF_CODE] = -np.inf
+        return values
+    
+    def __array__(self, dtype=None, copy=None):
+        values = self[:]
+        return values if dtype is None else values.astype(dtype)
+
+def score_dtype(precision):
+    if precision not in PRECISIONS:
+        raise ValueError(f'Unknown precision {precision!r}; expected one of {PRECISIONS}')
+    return np.float64 if precision == 'float64' else np.float32
+
+def store_scores(scores, precision):
+    if scores is None or isinstance(scores, QuantizedScores):
+        return scores
+    if precision == 'int8':
+        return QuantizedScores.quantize(scores)
+    if precision == 'float32':
+        return np.asarray(scores, dtype=np.float32)
+    return scores
@@ -0,0 +1,63 @@
+import numpy as np
+
+def top_k(scores, k, exclude=None):
+    scores = np.asarray(scores)
+    
+    if exclude is not None:
+        scores = np.where(_as_mask(exclude, scores.shape[-1]), -np.inf, scores)
+    
+    n_items = scores.shape[-1]
+    k = min(k, n_items)
+    
+    if k <= 0:
+        empty_shape = scores.shape[:-1] + (0,)
+        return np.zeros(empty_shape, dtype=np.intp), np.zeros(empty_shape, dtype=scores.dtype)
+    
+    if k < n_items:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n_items), scores.shape).copy()
+    
+    candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+    order = np.argsort(-candidate_scores, axis=-1, kind='stable')
+    indices = np.take_along_axis(candidates, order, axis=-1)
+    values = np.take_along_axis(candidate_scores, order, axis=-1)
+    
+    if scores.ndim == 1:
+        keep = values > -np.inf
+        return indices[keep], values[keep]
+    
+    return indices, values
+
+def normalize_scores(scores, method='minmax', mask=None):
+    # Statistics come from the rows in mask only, so excluded items with
+    # extreme scores do not squash the range of the real candidates.
+    scores = np.asarray(scores, dtype=np.float64)
+    if method is None:
+        return scores
+    
+    reference = scores if mask is None else scores[mask]
+    if len(reference) == 0:
+        return np.zeros_like(scores)
+    
+    if method == 'minmax':
+        low, high = reference.min(), reference.max()
+        if high <= low:
+            return np.zeros_like(scores)
+        return (scores - low) / (high - low)
+    
+    if method == 'zscore':
+        # A constant signal can still have a tiny nonzero std from rounding.
+        if reference.max() <= reference.min():
+            return np.zeros_like(scores)
+        return (scores - reference.mean()) / reference.std()
+    
+    raise ValueError(f'Unknown normalization: {method}')
+
+def _as_mask(exclude, n_items):
+    exclude = np.asarray(exclude)
+    if exclude.dtype == bool:
+        return exclude
+    mask = np.zeros(n_items, dtype=bool)
+    mask[exclude.astype(np.intp)] = True
+    return mask
@@ -0,0 +1,179 @@
+import logging
+import queue
+import threading
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker, scoped_session
+from database import ScopedSession, User, UserRating, create_db_engine, init_db
+from instrumentation import increment, timed
+
+logger = logging.getLogger(__name__)
+
+class RatingsRepository:
+    def __init__(self, session_factory=None, flush_interval=1.0, batch_size=500, max_retry_interval=60.0):
+        self.session_factory = session_factory or ScopedSession
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_retry_interval = max_retry_interval
+        self.pending = queue.Queue()
+        # Rows from a batch that failed to write. They are older than anything
+        # still queued, so the next flush starts from them and newer
+        # submissions for the same (user, movie) still win.
+        self.failed = {}
+        self.flush_lock = threading.Lock()
+        self.closed = threading.Event()
+        self.writer = threading.Thread(target=self._write_behind, name='ratings-writer', daemon=True)
+        self.writer.start()
+    
+    @classmethod
+    def from_url(cls, database_url, **kwargs):
+        engine = create_db_engine(database_url)
+        init_db(engine)
+        session_factory = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+        return cls(session_factory, **kwargs)
+    
+    def get_user_id(self, username, email, password_hash):
+        # Ratings are keyed by the id of the account's row in the users
+        # table, which is created the first time the account signs in.
+        session = self.session_factory()
+        try:
+            query = select(User.id).where(User.username == username)
+            user_id = session.execute(query).scalar_one_or_none()
+            if user_id is None:
+                user = User(username=username, email=email, password_hash=password_hash)
+                session.add(user)
+                try:
+                    session.commit()
+                    user_id = user.id
+                except IntegrityError:
+                    # Another session created the row first.
+                    session.rollback()
+                    user_id = session.execute(query).scalar_one()
+            return user_id
+        finally:
+            self.session_factory.remove()
+    
+    def submit(self, user_id, movie_id, rating):
+        self.pending.put((int(user_id), int(movie_id), float(rating), datetime.utcnow()))
+    
+    @timed('ratings_flush')
+    def flush(self):
+        with self.flush_lock:
+            batch, self.failed = self.failed, {}
+            while True:
+                try:
+                    user_id, movie_id, rating, created_at = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                # Only the latest rating per (user, movie) reaches the database.
+                batch[(user_id, movie_id)] = (rating, created_at)
+                if len(batch) >= self.batch_size:
+                    self._write(batch)
+                    batch = {}
+            if batch:
+                self._write(batch)
+    
+    def _write(self, batch):
+        try:
+            self._upsert(batch)
+        except Exception:
+            self.failed = batch
+            raise
+    
+    def get_user_ratings(self, user_id):
+        self.flush()
+        session = self.session_factory()
+        try:
+            rows = session.execute(
+                select(UserRating.movie_id, UserRating.rating).where(UserRating.user_id == int(user_id))
+            )
+            return {movie_id: rating for movie_id, rating in rows}
+        finally:
+            self.session_factory.remove()
+    
+    def get_all_ratings(self):
+        self.flush()
+        session = self.session_factory()
+        try:
+            rows = session.execute(select(UserRating.user_id, UserRating.movie_id, UserRating.rating))
+            return list(rows)
+        finally:
+            self.session_factory.remove()
+    
+    def get_rating_events(self, since=None):
+        # Oldest first, so a replay feeds the trending counter in event order.
+        self.flush()
+        session = self.session_factory()
+        try:
+            query = select(UserRating.movie_id, UserRating.rating, UserRating.created_at).order_by(UserRating.created_at)
+            if since is not None:
+                query = query.where(UserRating.created_at >= since)
+            return list(session.execute(query))
+        finally:
+            self.session_factory.remove()
+    
+    def close(self):
+        self.closed.set()
+        self.writer.join()
+        self.flush()
+    
+    def _write_behind(self):
+        delay = self.flush_interval
+        while not self.closed.wait(delay):
+            try:
+                self.flush()
+                delay = self.flush_interval
+            except Exception:
+                # The failed rows are kept for the next attempt; back off so a
+                # down database is not hammered every interval.
+                delay = min(delay * 2, self.max_retry_interval)
+                increment('ratings_flush_errors_total')
+                logger.exception('Writing %d ratings failed; retrying in %.1fs', len(self.failed), delay)
+    
+    def _upsert(self, batch):
+        rows = [
+            {'user_id': user_id, 'movie_id': movie_id, 'rating': rating, 'created_at': created_at}
+            for (user_id, movie_id), (rating, created_at) in batch.items()
+        ]
+        session = self.session_factory()
+        try:
+            statement = self._upsert_statement(session.get_bind().dialect.name)
+            if statement is not None:
+                session.execute(statement, rows)
+            else:
+                self._merge_rows(session, rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.session_factory.remove()
+    
+    def _upsert_statement(self, dialect_name):
+        if dialect_name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        elif dialect_name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            return None
+        
+        statement = insert(UserRating)
+        return statement.on_conflict_do_update(
+            index_elements=['user_id', 'movie_id'],
+            set_={'rating': statement.excluded.rating, 'created_at': statement.excluded.created_at}
+        )
+    
+    def _merge_rows(self, session, rows):
+        for row in rows:
+            existing = session.execute(
+                select(UserRating).where(
+                    UserRating.user_id == row['user_id'],
+                    UserRating.movie_id == row['movie_id']
+                )
+            ).scalar_one_or_none()
+            if existing is None:
+                session.add(UserRating(**row))
+            else:
+                existing.rating = row['rating']
+                existing.created_at = row['created_at']
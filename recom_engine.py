@@ -1,160 +1,868 @@
 import pandas as pd
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity, linear_kernel
+from sklearn.metrics.pairwise import linear_kernel
 from sklearn.preprocessing import MinMaxScaler
 import re
+from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse
+import os
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from types import MappingProxyType
+import model_store
+from ranking import top_k, normalize_scores
+from catalog import RowView, combined_features, compact_catalog, load_catalog
+from instrumentation import timed
+from search_index import SearchIndex
+from facet_index import FacetIndex
+from ann_index import IVFIndex
+from quantize import score_dtype, store_scores
+
+_worker_engine = None
+
+def _init_batch_worker(engine):
+    global _worker_engine
+    _worker_engine = engine
+
+def _recommend_batch_worker(user_ratings_list, n_recommendations, chunk_size):
+    return _worker_engine.recommend_batch(user_ratings_list, n_recommendations, chunk_size=chunk_size)
+
+def _similar_batch_worker(movie_ids, n_recommendations, chunk_size):
+    return _worker_engine.similar_batch(movie_ids, n_recommendations, chunk_size=chunk_size)
+
+class EngineState:
+    # Everything that changes together when the catalog does. A published
+    # state is never modified: writers fill in a copy and swap it in.
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+    
+    def copy(self):
+        return EngineState(**self.__dict__)
+
+def _state_property(name):
+    def get(self):
+        return getattr(self.current_state(), name)
+    
+    def set(self, value):
+        setattr(self.current_state(), name, value)
+    
+    return property(get, set)
+
+def snapshot(method):
+    # Pins one state for the whole call, so a concurrent add_movies,
+    # remove_movies or refit can never mix old and new rows in one result.
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(self.pinned, 'state', None) is not None:
+            return method(self, *args, **kwargs)
+        self.pinned.state = self.state
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.pinned.state = None
+    return wrapper
 
 class MovieRecommendationEngine:
-    def __init__(self, movies_df):
-        self.movies_df = movies_df.copy()
+    refit_drift_threshold = 0.2
+    drift_baseline_sample = 10000
+    auto_refit = True
+    # Read-only so a caller mutating the default cannot change it for every
+    # engine; pass weights to get_hybrid_recommendations instead.
+    hybrid_weights = MappingProxyType({'content': 0.5, 'collaborative': 0.5})
+    hybrid_normalization = 'minmax'
+    
+    movies_df = _state_property('movies_df')
+    movie_index = _state_property('movie_index')
+    search_index = _state_property('search_index')
+    facet_index = _state_property('facet_index')
+    tfidf = _state_property('tfidf')
+    tfidf_matrix = _state_property('tfidf_matrix')
+    cosine_sim = _state_property('cosine_sim')
+    neighbor_indices = _state_property('neighbor_indices')
+    neighbor_scores = _state_property('neighbor_scores')
+    ann_index = _state_property('ann_index')
+    cf_item_factors = _state_property('cf_item_factors')
+    cf_unrated = _state_property('cf_unrated')
+    catalog_version = _state_property('catalog_version')
+    
+    def __init__(self, movies_df, n_neighbors=None, block_size=512, model_path=None, ann_lists=None, ann_probe=8,
+                 precision='float64', rerank_factor=None):
+        self.state = EngineState(ann_index=None, cf_item_factors=None, cf_unrated=None, catalog_version=0)
+        self.pinned = threading.local()
+        self.movies_df = compact_catalog(movies_df)
+        self.n_neighbors = n_neighbors
+        self.block_size = block_size
+        self.precision = precision
+        self.dtype = score_dtype(precision)
+        self.rerank_factor = rerank_factor
+        self.cf_model = None
+        self.ann_lists = ann_lists
+        self.ann_probe = ann_probe
+        self.trending = None
+        self.update_lock = threading.RLock()
+        self.refit_thread = None
+        self.refit_log = None
+        self.drift_tokens = 0
+        self.drift_unknown_tokens = 0
+        self.drift_baseline = 0.0
         self.prepare_data()
-        self.build_content_based_model()
         
-    def prepare_data(self):
-        self.movies_df['combined_features'] = (
-            self.movies_df['genre'].fillna('') + ' ' +
-            self.movies_df['keywords'].fillna('') + ' ' +
-            self.movies_df['director'].fillna('') + ' ' +
-            self.movies_df['cast'].fillna('')
+        if model_path is not None:
+            self.load_model(model_path)
+        else:
+            self.build_content_based_model()
+        
+        if ann_lists is not None:
+            self.build_ann_index(ann_lists, ann_probe)
+    
+    def __getstate__(self):
+        attributes = dict(self.__dict__)
+        for name in ('update_lock', 'pinned', 'refit_thread', 'refit_log'):
+            attributes.pop(name)
+        return attributes
+    
+    def __setstate__(self, attributes):
+        self.__dict__.update(attributes)
+        self.update_lock = threading.RLock()
+        self.pinned = threading.local()
+        self.refit_thread = None
+        self.refit_log = None
+    
+    def current_state(self):
+        return getattr(self.pinned, 'state', None) or self.state
+    
+    @contextmanager
+    def staged_state(self):
+        # Writers replace attributes on a shallow copy, which readers cannot
+        # see until it is published by the single assignment below. Nested
+        # writers (add_movies replacing rows) share the outer copy.
+        if getattr(self.pinned, 'staging', False):
+            yield self.pinned.state
+            return
+        staged = self.state.copy()
+        self.pinned.state, self.pinned.staging = staged, True
+        try:
+            yield staged
+            self.state = staged
+        finally:
+            self.pinned.state, self.pinned.staging = None, False
+    
+    @classmethod
+    def from_catalog(cls, catalog_path, movies_df=None, artifact_dir='artifacts', n_neighbors=None, block_size=512, **engine_kwargs):
+        if movies_df is None:
+            movies_df = load_catalog(catalog_path)
+        
+        fingerprint = model_store.catalog_fingerprint(
+            catalog_path,
+            n_neighbors=n_neighbors,
+            precision=engine_kwargs.get('precision', 'float64')
         )
+        path = model_store.artifact_path(artifact_dir, fingerprint)
         
-        self.movies_df['combined_features'] = self.movies_df['combined_features'].str.lower()
-        self.movies_df['title_lower'] = self.movies_df['title'].str.lower()
+        if model_store.is_valid_artifact(path):
+            return cls(movies_df, n_neighbors=n_neighbors, block_size=block_size, model_path=path, **engine_kwargs)
         
+        engine = cls(movies_df, n_neighbors=n_neighbors, block_size=block_size, **engine_kwargs)
+        os.makedirs(artifact_dir, exist_ok=True)
+        engine.save_model(path, fingerprint)
+        return engine
+    
+    def save_model(self, path, fingerprint=None):
+        model_store.save_model(self, path, fingerprint)
+    
+    def load_model(self, path, mmap=True):
+        return model_store.load_model(self, path, mmap=mmap)
+        
+    def prepare_data(self):
+        self.build_movie_index()
+        self.search_index = SearchIndex(self.movies_df, popularity=self.movies_df['rating'].values)
+        self.facet_index = FacetIndex(self.movies_df)
+    
+    def combined_features(self, movies_df):
+        # Only needed while fitting or transforming, so it is never stored on
+        # the catalog frame.
+        return combined_features(movies_df)
+    
+    def build_movie_index(self):
+        # Iterate in reverse so the first row wins when a movie_id is duplicated.
+        movie_ids = self.movies_df['movie_id'].tolist()
+        self.movie_index = dict(zip(reversed(movie_ids), range(len(movie_ids) - 1, -1, -1)))
+    
+    @snapshot
+    def get_movie_index(self, movie_id):
+        return self.movie_index.get(movie_id)
+    
+    def get_movie_indices(self, movie_ids):
+        movie_index = self.movie_index
+        positions = [movie_index.get(movie_id, -1) for movie_id in movie_ids]
+        return np.array(positions, dtype=np.intp)
+        
+    @timed('engine_build_model')
     def build_content_based_model(self):
-        self.tfidf = TfidfVectorizer(stop_words='english', max_features=5000)
-        self.tfidf_matrix = self.tfidf.fit_transform(self.movies_df['combined_features'])
-        self.cosine_sim = linear_kernel(self.tfidf_matrix, self.tfidf_matrix)
+        self.tfidf = TfidfVectorizer(stop_words='english', max_features=5000, dtype=self.dtype)
+        features = self.combined_features(self.movies_df)
+        self.tfidf_matrix = self.tfidf.fit_transform(features)
+        self.drift_baseline = self.measure_drift_baseline(features)
         
-    def get_content_based_recommendations(self, movie_id, n_recommendations=10):
-        idx = self.movies_df[self.movies_df['movie_id'] == movie_id].index
+        if self.n_neighbors is None:
+            self.cosine_sim = linear_kernel(self.tfidf_matrix, self.tfidf_matrix)
+            self.neighbor_indices = None
+            self.neighbor_scores = None
+        else:
+            self.cosine_sim = None
+            self.neighbor_indices, self.neighbor_scores = self.build_neighbor_index(self.n_neighbors, self.block_size)
         
-        if len(idx) == 0:
+        self.store_similarities()
+    
+    def store_similarities(self):
+        # int8 keeps row-scaled codes; float32 halves the dense matrix. The
+        # TF-IDF rows themselves stay in floating point for exact re-ranking.
+        self.cosine_sim = store_scores(self.cosine_sim, self.precision)
+        self.neighbor_scores = store_scores(self.neighbor_scores, self.precision)
+    
+    def build_ann_index(self, n_lists=None, n_probe=8):
+        # TF-IDF rows are already L2-normalized, so the index shares the matrix.
+        self.ann_index = IVFIndex(n_lists=n_lists, n_probe=n_probe).fit(self.tfidf_matrix, normalized=True)
+        return self.ann_index
+    
+    @timed('engine_neighbor_index')
+    def build_neighbor_index(self, n_neighbors, block_size=512):
+        # Only block_size x N similarities are materialized at a time; the
+        # index itself is N x K, so memory grows with N*K instead of N^2.
+        n_movies = self.tfidf_matrix.shape[0]
+        k = max(min(n_neighbors, n_movies - 1), 0)
+        return self.compute_neighbor_rows(np.arange(n_movies), k, block_size)
+    
+    def compute_neighbor_rows(self, rows, k, block_size=512):
+        neighbor_indices = np.zeros((len(rows), k), dtype=np.int32)
+        neighbor_scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+        
+        if k <= 0:
+            return neighbor_indices, neighbor_scores
+        
+        for start in range(0, len(rows), block_size):
+            end = min(start + block_size, len(rows))
+            block = linear_kernel(self.tfidf_matrix[rows[start:end]], self.tfidf_matrix)
+            block[np.arange(end - start), rows[start:end]] = -np.inf
+            
+            top, scores = top_k(block, k)
+            width = top.shape[1]
+            neighbor_indices[start:end, :width], neighbor_scores[start:end, :width] = top, scores
+        
+        return neighbor_indices, neighbor_scores
+    
+    @timed('engine_add_movies')
+    def add_movies(self, movies_df):
+        with self.update_lock, self.staged_state():
+            new_movies = compact_catalog(movies_df)
+            replaced = [movie_id for movie_id in new_movies['movie_id'] if movie_id in self.movie_index]
+            if replaced:
+                self.remove_movies(replaced)
+            
+            features = self.combined_features(new_movies)
+            new_matrix = self.tfidf.transform(features)
+            start = len(self.movies_df)
+            
+            self.movies_df = pd.concat([self.movies_df, new_movies], ignore_index=True)
+            self.build_movie_index()
+            self.tfidf_matrix = sparse.vstack([self.tfidf_matrix, new_matrix], format='csr')
+            
+            if self.cosine_sim is not None:
+                cross = linear_kernel(self.tfidf_matrix, new_matrix)
+                self.cosine_sim = np.block([[np.asarray(self.cosine_sim), cross[:start]], [cross.T]])
+            else:
+                self.update_neighbors_for_added(start)
+            
+            self.search_index = self.search_index.added(new_movies, popularity=new_movies['rating'].values)
+            self.facet_index = self.facet_index.added(new_movies)
+            if self.ann_index is not None:
+                self.ann_index = self.ann_index.added(self.tfidf_matrix, new_matrix)
+            if self.cf_model is not None:
+                self.attach_cf_model(self.cf_model)
+            
+            self.store_similarities()
+            self.catalog_version += 1
+            self.log_change(self.add_movies, new_movies)
+            self.track_vocabulary_drift(features)
+    
+    @timed('engine_remove_movies')
+    def remove_movies(self, movie_ids):
+        with self.update_lock, self.staged_state():
+            positions = self.get_movie_indices(movie_ids)
+            positions = positions[positions >= 0]
+            if len(positions) == 0:
+                return
+            
+            keep = np.ones(len(self.movies_df), dtype=bool)
+            keep[positions] = False
+            kept_rows = np.flatnonzero(keep)
+            
+            self.movies_df = self.movies_df.iloc[kept_rows].reset_index(drop=True)
+            self.build_movie_index()
+            self.tfidf_matrix = self.tfidf_matrix[kept_rows]
+            
+            if self.cosine_sim is not None:
+                self.cosine_sim = self.cosine_sim[np.ix_(kept_rows, kept_rows)]
+            else:
+                self.update_neighbors_for_removed(keep)
+            
+            self.search_index = self.search_index.removed(keep)
+            self.facet_index = self.facet_index.removed(keep)
+            if self.ann_index is not None:
+                self.ann_index = self.ann_index.removed(self.tfidf_matrix, keep)
+            if self.cf_model is not None:
+                self.attach_cf_model(self.cf_model)
+            
+            self.store_similarities()
+            self.catalog_version += 1
+            self.log_change(self.remove_movies, list(movie_ids))
+    
+    def log_change(self, method, argument):
+        # Only kept while a refit is fitting, so it can replay what it missed.
+        if self.refit_log is not None:
+            self.refit_log.append((method.__name__, argument))
+    
+    def update_neighbors_for_added(self, start):
+        # New rows get full neighbor lists; an existing row is only touched
+        # when one of the new movies beats the weakest neighbor it already has.
+        n_movies = self.tfidf_matrix.shape[0]
+        k = max(min(self.n_neighbors, n_movies - 1), 0)
+        indices, scores = self._widen_neighbors(self.neighbor_indices, self.neighbor_scores, k)
+        new_rows = np.arange(start, n_movies)
+        new_indices, new_scores = self.compute_neighbor_rows(new_rows, k, self.block_size)
+        
+        if k > 0:
+            new_matrix = self.tfidf_matrix[start:]
+            for block_start in range(0, start, self.block_size):
+                block_end = min(block_start + self.block_size, start)
+                block = linear_kernel(self.tfidf_matrix[block_start:block_end], new_matrix)
+                affected = np.flatnonzero(block.max(axis=1) > scores[block_start:block_end, -1])
+                if len(affected) == 0:
+                    continue
+                
+                rows = block_start + affected
+                candidate_indices = np.hstack([indices[rows], np.broadcast_to(new_rows, (len(rows), len(new_rows)))])
+                candidate_scores = np.hstack([scores[rows], block[affected].astype(np.float32)])
+                top, top_scores = top_k(candidate_scores, k)
+                indices[rows] = np.take_along_axis(candidate_indices, top, axis=1)
+                scores[rows] = top_scores
+        
+        self.neighbor_indices = np.vstack([indices, new_indices])
+        self.neighbor_scores = np.vstack([scores, new_scores])
+    
+    def update_neighbors_for_removed(self, keep):
+        # Lists that pointed at a removed movie are recomputed; all others
+        # only have their indices shifted to the new row positions.
+        n_movies = int(keep.sum())
+        k = max(min(self.n_neighbors, n_movies - 1), 0)
+        new_positions = np.cumsum(keep) - 1
+        
+        indices = self.neighbor_indices[keep]
+        scores = np.array(self.neighbor_scores[keep])
+        valid = scores > -np.inf
+        affected = np.flatnonzero((valid & ~keep[indices]).any(axis=1))
+        
+        indices = new_positions[indices].astype(np.int32)
+        indices, scores = self._widen_neighbors(indices[:, :k], scores[:, :k], k)
+        if len(affected):
+            indices[affected], scores[affected] = self.compute_neighbor_rows(affected, k, self.block_size)
+        
+        self.neighbor_indices, self.neighbor_scores = indices, scores
+    
+    def _widen_neighbors(self, indices, scores, k):
+        indices, scores = np.array(indices), np.array(scores)
+        if indices.shape[1] >= k:
+            return indices, scores
+        pad = k - indices.shape[1]
+        indices = np.hstack([indices, np.zeros((len(indices), pad), dtype=np.int32)])
+        scores = np.hstack([scores, np.full((len(scores), pad), -np.inf, dtype=np.float32)])
+        return indices, scores
+    
+    def track_vocabulary_drift(self, documents):
+        counts = self.count_unknown_tokens(documents)
+        if counts is None:
+            return
+        self.drift_tokens += counts[0]
+        self.drift_unknown_tokens += counts[1]
+        
+        if self.auto_refit and self.vocabulary_drift() > self.refit_drift_threshold:
+            self.start_background_refit()
+    
+    def count_unknown_tokens(self, documents, known=None):
+        analyzer = self.tfidf.build_analyzer()
+        vocabulary = self.tfidf.vocabulary_
+        if vocabulary is None:
+            # Hashed features have no out-of-vocabulary terms to drift on.
+            return None
+        known = vocabulary if known is None else known
+        n_tokens = n_unknown = 0
+        for document in documents:
+            tokens = analyzer(document)
+            n_tokens += len(tokens)
+            n_unknown += sum(token not in known for token in tokens)
+        return n_tokens, n_unknown
+    
+    def measure_drift_baseline(self, documents=None):
+        # Even an ordinary new movie brings terms the model has never seen,
+        # and max_features leaves rare terms out of any refit as well, so
+        # drift is measured above the rate a refit would still leave. It is
+        # estimated leave-one-out on (a sample of) the fitted documents: a
+        # term that only one of them contains counts as unknown there.
+        vocabulary = self.tfidf.vocabulary_
+        if vocabulary is None:
+            return 0.0
+        if documents is None:
+            documents = self.combined_features(self.movies_df)
+        document_frequency = np.bincount(self.tfidf_matrix.indices, minlength=len(vocabulary))
+        known = {term for term, column in vocabulary.items() if document_frequency[column] > 1}
+        step = max(1, len(documents) // self.drift_baseline_sample)
+        n_tokens, n_unknown = self.count_unknown_tokens(documents.iloc[::step], known)
+        return n_unknown / n_tokens if n_tokens else 0.0
+    
+    def vocabulary_drift(self):
+        if self.drift_tokens == 0:
+            return 0.0
+        return max(0.0, self.drift_unknown_tokens / self.drift_tokens - self.drift_baseline)
+    
+    def start_background_refit(self):
+        with self.update_lock:
+            if self.refit_thread is not None and self.refit_thread.is_alive():
+                return self.refit_thread
+            self.refit_thread = threading.Thread(target=self.refit, name='engine-refit', daemon=True)
+            self.refit_thread.start()
+            return self.refit_thread
+    
+    @timed('engine_refit')
+    def refit(self):
+        # The new model is fitted on a snapshot without holding the lock.
+        # Updates made meanwhile are logged and replayed onto it, outside the
+        # lock until it has caught up, so under continuous ingestion the
+        # refit still lands and writers only wait for the last few changes.
+        with self.update_lock:
+            movies_df = self.movies_df
+            self.refit_log = []
+        
+        try:
+            fresh = type(self)(
+                movies_df,
+                n_neighbors=self.n_neighbors,
+                block_size=self.block_size,
+                ann_lists=self.ann_lists,
+                ann_probe=self.ann_probe,
+                precision=self.precision,
+                rerank_factor=self.rerank_factor
+            )
+            fresh.auto_refit = False
+            
+            replayed = 0
+            while True:
+                with self.update_lock:
+                    pending = self.refit_log[replayed:]
+                    if not pending:
+                        with self.staged_state() as staged:
+                            staged.__dict__.update(fresh.state.__dict__, catalog_version=self.catalog_version + 1)
+                            if self.cf_model is not None:
+                                self.attach_cf_model(self.cf_model)
+                        # Rows replayed onto the new vocabulary count towards
+                        # the next refit just as they would after it.
+                        self.drift_tokens = fresh.drift_tokens
+                        self.drift_unknown_tokens = fresh.drift_unknown_tokens
+                        self.drift_baseline = fresh.drift_baseline
+                        return True
+                for name, argument in pending:
+                    getattr(fresh, name)(argument)
+                replayed += len(pending)
+        finally:
+            with self.update_lock:
+                self.refit_log = None
+    
+    @timed('engine_content')
+    @snapshot
+    def get_content_based_recommendations(self, movie_id, n_recommendations=10, **filters):
+        idx = self.get_movie_index(movie_id)
+        
+        if idx is None:
             return pd.DataFrame()
         
-        idx = idx[0]
-        sim_scores = list(enumerate(self.cosine_sim[idx]))
-        sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-        sim_scores = sim_scores[1:n_recommendations+1]
+        # With a rerank factor, the stored (possibly quantized) scores only
+        # pick a shortlist, which is then ordered by exact TF-IDF products.
+        shortlist = n_recommendations * self.rerank_factor if self.rerank_factor else n_recommendations
+        eligible = self.eligible_mask(**filters)
         
-        movie_indices = [i[0] for i in sim_scores]
-        recommendations = self.movies_df.iloc[movie_indices].copy()
-        recommendations['similarity_score'] = [i[1] for i in sim_scores]
+        if self.cosine_sim is None:
+            movie_indices, scores = self.neighbor_indices[idx], self.neighbor_scores[idx]
+            keep = scores > -np.inf
+            if eligible is not None:
+                keep &= eligible[movie_indices]
+            
+            if eligible is not None and keep.sum() < shortlist:
+                # The stored neighbor list holds too few eligible movies, so
+                # this query is scored against the whole catalog instead.
+                movie_indices, scores = top_k(self.content_scores(idx), shortlist, exclude=self.exclusion_mask(eligible, idx))
+            else:
+                movie_indices, scores = movie_indices[keep][:shortlist], scores[keep][:shortlist]
+        else:
+            movie_indices, scores = top_k(self.cosine_sim[idx], shortlist, exclude=self.exclusion_mask(eligible, idx))
         
-        return recommendations
+        if self.rerank_factor:
+            movie_indices, scores = self.rerank_exact(idx, movie_indices, n_recommendations)
+        
+        return self.ranked_frame(movie_indices, scores, 'similarity_score')
+    
+    def rerank_exact(self, idx, candidates, n_recommendations):
+        exact = np.asarray((self.tfidf_matrix[candidates] @ self.tfidf_matrix[idx].T).todense()).ravel()
+        order, scores = top_k(exact, n_recommendations)
+        return candidates[order], scores
     
-    def get_collaborative_recommendations(self, user_ratings, n_recommendations=10):
+    @timed('engine_collaborative')
+    @snapshot
+    def get_collaborative_recommendations(self, user_ratings, n_recommendations=10, **filters):
         if not user_ratings:
-            return self.get_top_rated_movies(n_recommendations)
+            return self.get_top_rated_movies(n_recommendations, **filters)
+        
+        user_profile, rated = self.build_user_profile(user_ratings)
+        eligible = self.eligible_mask(**filters)
         
-        user_profile = np.zeros(self.tfidf_matrix.shape[1])
-        total_weight = 0
+        if self.ann_index is not None:
+            profile_norm = np.linalg.norm(user_profile) or 1.0
+            movie_indices, scores = self.ann_index.search(user_profile, n_recommendations, exclude=rated, mask=eligible)
+            scores = scores / profile_norm
+        else:
+            # TF-IDF rows are unit length, so one sparse mat-vec in the model
+            # dtype gives the cosine without cosine_similarity renormalizing
+            # the whole catalog on every call.
+            profile_norm = np.linalg.norm(user_profile) or 1.0
+            sim_scores = self.tfidf_matrix @ user_profile / profile_norm
+            movie_indices, scores = top_k(sim_scores, n_recommendations, exclude=self.exclusion_mask(eligible, rated))
         
-        for movie_id, rating in user_ratings.items():
-            idx = self.movies_df[self.movies_df['movie_id'] == movie_id].index
-            if len(idx) > 0:
-                idx = idx[0]
-                weight = (rating - 2.5) / 2.5
-                user_profile += self.tfidf_matrix[idx].toarray()[0] * weight
-                total_weight += abs(weight)
+        return self.ranked_frame(movie_indices, scores, 'recommendation_score')
+    
+    def rating_weights(self, user_ratings):
+        positions = self.get_movie_indices(list(user_ratings.keys()))
+        ratings = np.fromiter(user_ratings.values(), dtype=np.float64, count=len(user_ratings))
+        
+        known = positions >= 0
+        positions = positions[known]
+        weights = (ratings[known] - 2.5) / 2.5
+        total_weight = np.abs(weights).sum()
         
         if total_weight > 0:
-            user_profile = user_profile / total_weight
+            weights = weights / total_weight
         
-        user_profile_matrix = user_profile.reshape(1, -1)
-        sim_scores = cosine_similarity(user_profile_matrix, self.tfidf_matrix)[0]
+        return positions, weights.astype(self.dtype)
+    
+    def build_user_profile(self, user_ratings):
+        positions, weights = self.rating_weights(user_ratings)
+        user_profile = self.tfidf_matrix[positions].T @ weights
+        return user_profile, positions
+    
+    @timed('engine_recommend_batch')
+    @snapshot
+    def recommend_batch(self, user_ratings_list, n_recommendations=10, chunk_size=256, n_jobs=None):
+        if n_jobs is not None and n_jobs > 1 and len(user_ratings_list) > chunk_size:
+            return self._run_sharded(_recommend_batch_worker, user_ratings_list, n_recommendations, chunk_size, n_jobs)
         
-        rated_movie_ids = set(user_ratings.keys())
-        recommendations_with_scores = []
+        results = [None] * len(user_ratings_list)
+        rated_users = [i for i, user_ratings in enumerate(user_ratings_list) if user_ratings]
         
-        for idx, score in enumerate(sim_scores):
-            movie_id = self.movies_df.iloc[idx]['movie_id']
-            if movie_id not in rated_movie_ids:
-                recommendations_with_scores.append((idx, score))
+        if len(rated_users) < len(user_ratings_list):
+            top_rated = self.get_top_rated_movies(n_recommendations)
+            for i, user_ratings in enumerate(user_ratings_list):
+                if not user_ratings:
+                    results[i] = top_rated.copy()
         
-        recommendations_with_scores = sorted(recommendations_with_scores, key=lambda x: x[1], reverse=True)
-        recommendations_with_scores = recommendations_with_scores[:n_recommendations]
+        for start in range(0, len(rated_users), chunk_size):
+            chunk = rated_users[start:start + chunk_size]
+            weight_matrix = self.build_rating_weight_matrix([user_ratings_list[i] for i in chunk])
+            
+            # Profiles are stacked into one sparse matrix so the whole chunk is
+            # scored with a single product against the catalog.
+            profiles = weight_matrix @ self.tfidf_matrix
+            norms = np.sqrt(np.asarray(profiles.multiply(profiles).sum(axis=1))).ravel()
+            norms[norms == 0] = 1
+            
+            sim_scores = np.asarray((profiles @ self.tfidf_matrix.T).todense()) / norms[:, None]
+            rated = weight_matrix.copy()
+            rated.data[:] = 1
+            rated = rated.toarray().astype(bool)
+            
+            movie_indices, scores = top_k(sim_scores, n_recommendations, exclude=rated)
+            frames = self._frames_with_scores(movie_indices, scores, 'recommendation_score')
+            for i, frame in zip(chunk, frames):
+                results[i] = frame
         
-        movie_indices = [i[0] for i in recommendations_with_scores]
-        recommendations = self.movies_df.iloc[movie_indices].copy()
-        recommendations['recommendation_score'] = [i[1] for i in recommendations_with_scores]
+        return results
+    
+    def build_rating_weight_matrix(self, user_ratings_list):
+        rows, cols, values = [], [], []
+        for row, user_ratings in enumerate(user_ratings_list):
+            positions, weights = self.rating_weights(user_ratings)
+            rows.append(np.full(len(positions), row))
+            cols.append(positions)
+            values.append(weights)
         
-        return recommendations
+        shape = (len(user_ratings_list), self.tfidf_matrix.shape[0])
+        weight_matrix = sparse.csr_matrix(
+            (np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+            shape=shape
+        )
+        weight_matrix.sum_duplicates()
+        return weight_matrix
     
-    def get_hybrid_recommendations(self, movie_id, user_ratings, n_recommendations=10):
-        content_recs = self.get_content_based_recommendations(movie_id, n_recommendations * 2)
-        collab_recs = self.get_collaborative_recommendations(user_ratings, n_recommendations * 2)
+    @timed('engine_similar_batch')
+    @snapshot
+    def similar_batch(self, movie_ids, n_recommendations=10, chunk_size=256, n_jobs=None):
+        if n_jobs is not None and n_jobs > 1 and len(movie_ids) > chunk_size:
+            return self._run_sharded(_similar_batch_worker, movie_ids, n_recommendations, chunk_size, n_jobs)
         
-        if content_recs.empty:
-            return collab_recs.head(n_recommendations)
-        if collab_recs.empty:
-            return content_recs.head(n_recommendations)
+        positions = self.get_movie_indices(movie_ids)
+        results = [pd.DataFrame()] * len(movie_ids)
+        known = np.flatnonzero(positions >= 0)
         
-        content_scores = dict(zip(content_recs['movie_id'], content_recs.get('similarity_score', [1] * len(content_recs))))
-        collab_scores = dict(zip(collab_recs['movie_id'], collab_recs.get('recommendation_score', [1] * len(collab_recs))))
+        for start in range(0, len(known), chunk_size):
+            chunk = known[start:start + chunk_size]
+            rows = positions[chunk]
+            
+            if self.cosine_sim is None:
+                movie_indices = self.neighbor_indices[rows, :n_recommendations]
+                scores = self.neighbor_scores[rows, :n_recommendations]
+            else:
+                sim_scores = self.cosine_sim[rows]
+                self_mask = np.zeros(sim_scores.shape, dtype=bool)
+                self_mask[np.arange(len(rows)), rows] = True
+                movie_indices, scores = top_k(sim_scores, n_recommendations, exclude=self_mask)
+            
+            frames = self._frames_with_scores(movie_indices, scores, 'similarity_score')
+            for i, frame in zip(chunk, frames):
+                results[i] = frame
         
-        all_movie_ids = set(content_scores.keys()) | set(collab_scores.keys())
+        return results
+    
+    def _frames_with_scores(self, movie_indices, scores, score_column):
+        # One gather for the whole chunk, then cheap per-row slices of it.
+        keep = scores > -np.inf
+        offsets = np.concatenate([[0], np.cumsum(keep.sum(axis=1))])
         
-        hybrid_scores = {}
-        for movie_id in all_movie_ids:
-            content_score = content_scores.get(movie_id, 0) * 0.5
-            collab_score = collab_scores.get(movie_id, 0) * 0.5
-            hybrid_scores[movie_id] = content_score + collab_score
+        stacked = self.movies_df.take(movie_indices[keep])
+        stacked[score_column] = scores[keep]
+        return [stacked.iloc[offsets[row]:offsets[row + 1]] for row in range(len(movie_indices))]
+    
+    def _run_sharded(self, worker, items, n_recommendations, chunk_size, n_jobs):
+        shard_size = max(chunk_size, -(-len(items) // n_jobs))
+        shards = [items[start:start + shard_size] for start in range(0, len(items), shard_size)]
         
-        sorted_movies = sorted(hybrid_scores.items(), key=lambda x: x[1], reverse=True)
-        top_movie_ids = [movie_id for movie_id, score in sorted_movies[:n_recommendations]]
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_batch_worker, initargs=(self,)) as executor:
+            futures = [executor.submit(worker, shard, n_recommendations, chunk_size) for shard in shards]
+            return [frame for future in futures for frame in future.result()]
+    
+    def attach_cf_model(self, cf_model):
+        with self.update_lock, self.staged_state():
+            self.cf_model = cf_model
+            self.cf_item_factors = cf_model.align_item_factors(self.movies_df['movie_id'].values)
+            self.cf_unrated = cf_model.is_unrated(self.movies_df['movie_id'].values)
+    
+    @timed('engine_cf')
+    @snapshot
+    def get_cf_recommendations(self, user_ratings, n_recommendations=10, user_id=None, **filters):
+        if self.cf_model is None:
+            return self.get_collaborative_recommendations(user_ratings, n_recommendations, **filters)
         
-        recommendations = self.movies_df[self.movies_df['movie_id'].isin(top_movie_ids)].copy()
-        recommendations['hybrid_score'] = recommendations['movie_id'].map(dict(sorted_movies))
-        recommendations = recommendations.sort_values('hybrid_score', ascending=False)
+        user_vector = self.cf_model.user_vector(user_id) if user_id is not None else None
+        if user_vector is None:
+            if not user_ratings:
+                return self.get_top_rated_movies(n_recommendations, **filters)
+            user_vector = self.cf_model.fold_in(list(user_ratings.keys()), list(user_ratings.values()))
         
-        return recommendations
+        sim_scores = self.cf_item_factors @ user_vector
+        rated = self.get_movie_indices(list((user_ratings or {}).keys()))
+        # Movies nobody has rated have no factors; their score of 0 would
+        # rank them above every movie the model predicts below average.
+        exclude = self.exclusion_mask(self.eligible_mask(**filters), rated[rated >= 0]) | self.cf_unrated
+        movie_indices, scores = top_k(sim_scores, n_recommendations, exclude=exclude)
+        return self.ranked_frame(movie_indices, scores, 'recommendation_score')
     
-    def get_top_rated_movies(self, n=10):
-        return self.movies_df.nlargest(n, 'rating')
-    
-    def get_trending_movies(self, n=10):
-        recent_movies = self.movies_df[self.movies_df['year'] >= 2010].copy()
-        recent_movies['trend_score'] = recent_movies['rating'] * (recent_movies['year'] - 2000) / 25
-        return recent_movies.nlargest(n, 'trend_score')
-    
-    def search_movies(self, query):
-        query = query.lower()
-        mask = (
-            self.movies_df['title_lower'].str.contains(query, na=False, regex=False) |
-            self.movies_df['genre'].str.lower().str.contains(query, na=False, regex=False) |
-            self.movies_df['director'].str.lower().str.contains(query, na=False, regex=False) |
-            self.movies_df['cast'].str.lower().str.contains(query, na=False, regex=False) |
-            self.movies_df['keywords'].str.lower().str.contains(query, na=False, regex=False)
-        )
-        return self.movies_df[mask]
+    @timed('engine_hybrid')
+    @snapshot
+    def get_hybrid_recommendations(self, movie_id, user_ratings, n_recommendations=10, weights=None, normalization=None,
+                                   **filters):
+        # Both signals are scored over the whole catalog and blended in one
+        # pass, so a movie ranked just outside either list still gets its
+        # real score instead of 0. normalization is one scheme for every
+        # signal or a {signal: scheme} mapping; a scheme of None (or a signal
+        # missing from the mapping) blends that signal's raw scores.
+        weights = weights or self.hybrid_weights
+        if normalization is None:
+            normalization = self.hybrid_normalization
+        
+        signals = {}
+        exclude = self.exclusion_mask(self.eligible_mask(**filters))
+        
+        idx = self.get_movie_index(movie_id)
+        if idx is not None and weights.get('content', 0):
+            signals['content'] = self.content_scores(idx)
+            exclude[idx] = True
+        
+        if user_ratings and weights.get('collaborative', 0):
+            signals['collaborative'], rated = self.profile_scores(user_ratings)
+            exclude[rated] = True
+        
+        if not signals:
+            return self.get_top_rated_movies(n_recommendations, **filters)
+        
+        if not isinstance(normalization, dict):
+            normalization = dict.fromkeys(signals, normalization)
+        
+        total_weight = sum(weights[name] for name in signals)
+        hybrid_scores = np.zeros(len(self.movies_df), dtype=np.float64)
+        for name, scores in signals.items():
+            hybrid_scores += weights[name] / total_weight * normalize_scores(scores, normalization.get(name), ~exclude)
+        
+        movie_indices, scores = top_k(hybrid_scores, n_recommendations, exclude=exclude)
+        return self.ranked_frame(movie_indices, scores, 'hybrid_score')
+    
+    def content_scores(self, idx):
+        if self.cosine_sim is not None:
+            return np.asarray(self.cosine_sim[idx], dtype=np.float64)
+        return np.asarray((self.tfidf_matrix @ self.tfidf_matrix[idx].T).todense()).ravel()
+    
+    def profile_scores(self, user_ratings):
+        user_profile, rated = self.build_user_profile(user_ratings)
+        profile_norm = np.linalg.norm(user_profile) or 1.0
+        return self.tfidf_matrix @ user_profile / profile_norm, rated
+    
+    @timed('engine_top_rated')
+    @snapshot
+    def get_top_rated_movies(self, n=10, **filters):
+        ratings = self.movies_df['rating'].values
+        exclude = self.exclusion_mask(self.eligible_mask(**filters)) | np.isnan(ratings)
+        movie_indices, scores = top_k(ratings, n, exclude=exclude)
+        return self.movies_df.iloc[movie_indices[scores > -np.inf]]
+    
+    def attach_trending(self, trending):
+        self.trending = trending
+    
+    @timed('engine_trending')
+    @snapshot
+    def get_trending_movies(self, n=10, **filters):
+        eligible = self.eligible_mask(**filters)
+        if self.trending is None or len(self.trending) == 0:
+            movie_indices, scores = self.static_trending(n, self.exclusion_mask(eligible))
+        else:
+            movie_indices, scores = self.live_trending(n, eligible)
+        
+        return self.ranked_frame(movie_indices, scores, 'trend_score')
+    
+    def live_trending(self, n, eligible=None):
+        # Removed movies can still sit in the counter, so the whole heap is
+        # read and filtered; it is bounded by the counter's capacity.
+        ranked = [(self.movie_index.get(movie_id), score) for movie_id, score in self.trending.top(self.trending.capacity)]
+        ranked = [
+            (position, score) for position, score in ranked
+            if position is not None and (eligible is None or eligible[position])
+        ][:n]
+        movie_indices = np.array([position for position, _ in ranked], dtype=np.intp)
+        scores = np.array([score for _, score in ranked], dtype=np.float64)
+        
+        if len(movie_indices) < n:
+            # Movies without recent activity fill the remaining slots.
+            extra, extra_scores = self.static_trending(n - len(movie_indices), self.exclusion_mask(eligible, movie_indices))
+            extra = extra[extra_scores > -np.inf]
+            movie_indices = np.concatenate([movie_indices, extra])
+            scores = np.concatenate([scores, np.zeros(len(extra))])
+        return movie_indices, scores
     
+    def static_trending(self, n, exclude=None):
+        years = self.movies_df['year'].values
+        trend_scores = self.movies_df['rating'].values * (years - 2000) / 25
+        mask = (years < 2010) | np.isnan(trend_scores)
+        if exclude is not None:
+            mask |= exclude
+        return top_k(trend_scores, n, exclude=mask)
+    
+    @timed('engine_search')
+    @snapshot
+    def search(self, query, **filters):
+        # Ranked row positions and scores only, like filter; callers that
+        # page through the results take just the rows they show.
+        return self.search_index.search(query, mask=self.eligible_mask(**filters))
+    
+    @snapshot
+    def search_movies(self, query, **filters):
+        movie_indices, scores = self.search(query, **filters)
+        return self.ranked_frame(movie_indices, scores, 'search_score')
+    
+    @snapshot
+    def search_page(self, query, page=0, page_size=20, **filters):
+        movie_indices, scores = self.search(query, **filters)
+        start = page * page_size
+        end = start + page_size
+        return self.ranked_frame(movie_indices[start:end], scores[start:end], 'search_score'), len(movie_indices)
+    
+    @timed('engine_autocomplete')
+    @snapshot
+    def autocomplete(self, prefix, n=10):
+        return self.movies_df.iloc[self.search_index.autocomplete(prefix, n)]
+    
+    @snapshot
+    def filter(self, genres=None, year_range=None, rating_range=None):
+        return self.facet_index.filter(genres, year_range, rating_range)
+    
+    @timed('engine_filter')
+    @snapshot
+    def filter_mask(self, genres=None, year_range=None, rating_range=None):
+        return self.facet_index.mask(genres, year_range, rating_range)
+    
+    def eligible_mask(self, genres=None, year_range=None, rating_range=None):
+        # None when no filter is set, so unfiltered calls skip the mask.
+        if not genres and year_range is None and rating_range is None:
+            return None
+        return self.filter_mask(genres, year_range, rating_range)
+    
+    def exclusion_mask(self, eligible, positions=None):
+        # Filtered-out movies are excluded before top-k rather than dropped
+        # from the result afterwards, so every returned slot is eligible.
+        exclude = np.zeros(len(self.movies_df), dtype=bool) if eligible is None else ~eligible
+        if positions is not None:
+            exclude[positions] = True
+        return exclude
+    
+    def ranked_frame(self, movie_indices, scores, score_column):
+        # -inf marks slots top_k had to fill with excluded movies because
+        # fewer than n were eligible.
+        keep = np.asarray(scores) > -np.inf
+        recommendations = self.movies_df.take(np.asarray(movie_indices)[keep])
+        recommendations[score_column] = np.asarray(scores)[keep]
+        return recommendations
+    
+    @snapshot
     def filter_by_genre(self, genre):
         if genre == 'All':
             return self.movies_df
-        return self.movies_df[self.movies_df['genre'].str.contains(genre, na=False, case=False)]
+        return self.movies_df.iloc[self.filter(genres=[genre])]
     
+    @snapshot
     def filter_by_year_range(self, min_year, max_year):
-        return self.movies_df[
-            (self.movies_df['year'] >= min_year) & 
-            (self.movies_df['year'] <= max_year)
-        ]
+        return self.movies_df.iloc[self.filter(year_range=(min_year, max_year))]
     
+    @snapshot
     def filter_by_rating_range(self, min_rating, max_rating):
-        return self.movies_df[
-            (self.movies_df['rating'] >= min_rating) & 
-            (self.movies_df['rating'] <= max_rating)
-        ]
+        return self.movies_df.iloc[self.filter(rating_range=(min_rating, max_rating))]
+    
+    @snapshot
+    def get_page(self, movie_indices, page=0, page_size=20):
+        total = len(movie_indices)
+        start = page * page_size
+        return self.movies_df.iloc[movie_indices[start:start + page_size]], total
     
+    @snapshot
     def get_movie_by_id(self, movie_id):
-        movies = self.movies_df[self.movies_df['movie_id'] == movie_id]
-        if len(movies) > 0:
-            return movies.iloc[0]
+        idx = self.get_movie_index(movie_id)
+        if idx is not None:
+            return RowView(self.movies_df, idx)
         return None
     
+    @snapshot
     def get_all_genres(self):
-        all_genres = set()
-        for genres in self.movies_df['genre'].dropna():
-            all_genres.update([g.strip() for g in genres.split(',')])
-        return sorted(list(all_genres))
+        return list(self.facet_index.genres)
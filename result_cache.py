@@ -0,0 +1,119 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from instrumentation import increment
+
+class RecommendationCache:
+    def __init__(self, engine, max_entries=2048, ttl=600):
+        self.engine = engine
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.user_keys = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_content_based_recommendations(self, movie_id, n_recommendations=10, **filters):
+        # Content results do not depend on the user, so every session shares them.
+        key = self.make_key('content', movie_id, None, n_recommendations, filters)
+        return self.get_or_compute(key, None, lambda: self.engine.get_content_based_recommendations(
+            movie_id, n_recommendations, **filters
+        ))
+    
+    def get_collaborative_recommendations(self, user_ratings, n_recommendations=10, user_id=None, **filters):
+        key = self.make_key('collaborative', None, user_ratings, n_recommendations, filters)
+        return self.get_or_compute(key, user_id, lambda: self.engine.get_collaborative_recommendations(
+            user_ratings, n_recommendations, **filters
+        ))
+    
+    def get_hybrid_recommendations(self, movie_id, user_ratings, n_recommendations=10, user_id=None, **filters):
+        key = self.make_key('hybrid', movie_id, user_ratings, n_recommendations, filters)
+        return self.get_or_compute(key, user_id, lambda: self.engine.get_hybrid_recommendations(
+            movie_id, user_ratings, n_recommendations, **filters
+        ))
+    
+    def get_cf_recommendations(self, user_ratings, n_recommendations=10, user_id=None, **filters):
+        key = self.make_key('cf', user_id, user_ratings, n_recommendations, filters)
+        return self.get_or_compute(key, user_id, lambda: self.engine.get_cf_recommendations(
+            user_ratings, n_recommendations, user_id=user_id, **filters
+        ))
+    
+    def make_key(self, kind, movie_id, user_ratings, n_recommendations, filters):
+        # Ratings are hashed in sorted order so the key does not depend on the
+        # order a session rated movies in. The catalog version is part of the
+        # key, so adding or removing movies makes older entries unreachable.
+        payload = json.dumps([
+            kind,
+            movie_id,
+            sorted((str(key), float(value)) for key, value in (user_ratings or {}).items()),
+            n_recommendations,
+            sorted((name, value) for name, value in filters.items() if value is not None),
+            getattr(self.engine, 'catalog_version', 0),
+        ], default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    def get_or_compute(self, key, user_id, compute):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                increment('recommendation_cache_requests_total', result='hit')
+                return entry[1].copy()
+            self.misses += 1
+        increment('recommendation_cache_requests_total', result='miss')
+        
+        result = compute()
+        
+        with self.lock:
+            self.entries[key] = (now + self.ttl, result, user_id)
+            self.entries.move_to_end(key)
+            if user_id is not None:
+                self.user_keys.setdefault(user_id, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+        
+        return result.copy()
+    
+    def bind(self, engine):
+        # Entries computed by a previous engine are dropped when the engine
+        # is swapped for a newly published version.
+        with self.lock:
+            if engine is self.engine:
+                return
+            self.engine = engine
+            self.entries.clear()
+            self.user_keys.clear()
+    
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for key in self.user_keys.pop(user_id, ()):
+                self._drop(key)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.user_keys.clear()
+    
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+    
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None and entry[2] is not None:
+            keys = self.user_keys.get(entry[2])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.user_keys[entry[2]]
@@ -0,0 +1,216 @@
+import bisect
+import copy
+import re
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from ranking import top_k
+from catalog import text_column
+
+TOKEN_PATTERN = r'(?u)\b\w+\b'
+FIELD_WEIGHTS = {
+    'title': 5.0,
+    'cast': 3.0,
+    'director': 3.0,
+    'genre': 2.0,
+    'keywords': 1.0,
+}
+CACHED_PREFIX_LENGTH = 2
+CACHED_COMPLETIONS = 50
+MIN_DELTA_ROWS = 1024
+DELTA_MERGE_FRACTION = 0.1
+
+class SearchIndex:
+    def __init__(self, movies_df, field_weights=None, popularity=None):
+        self.field_weights = field_weights or FIELD_WEIGHTS
+        self.tokenizer = re.compile(TOKEN_PATTERN)
+        self.build(movies_df, popularity)
+    
+    def build(self, movies_df, popularity=None):
+        fields = {
+            field: text_column(movies_df[field])
+            for field in self.field_weights
+        }
+        
+        # CountVectorizer keeps its vocabulary in sorted order, so every prefix
+        # maps to one contiguous range of columns.
+        vectorizer = CountVectorizer(token_pattern=TOKEN_PATTERN, binary=True, dtype=np.float32)
+        vectorizer.fit(text for values in fields.values() for text in values)
+        self.terms = vectorizer.get_feature_names_out().tolist()
+        self.term_index = vectorizer.vocabulary_
+        
+        weighted = None
+        for field, values in fields.items():
+            field_matrix = vectorizer.transform(values) * self.field_weights[field]
+            weighted = field_matrix if weighted is None else weighted.maximum(field_matrix)
+            if field == 'title':
+                self.title_postings = sparse.csc_matrix(field_matrix)
+        
+        self.postings = sparse.csc_matrix(weighted)
+        self.n_rows = len(movies_df)
+        
+        if popularity is None:
+            popularity = np.zeros(self.n_rows, dtype=np.float32)
+        self.popularity = np.nan_to_num(np.asarray(popularity, dtype=np.float32), nan=0.0)
+        self._completion_cache = {}
+        self.delta = None
+    
+    def added(self, movies_df, popularity=None):
+        # Returns a new index and leaves this one untouched for readers still
+        # using it. Only the added rows are tokenized; their postings are
+        # appended to a small delta index, which is folded into the main
+        # posting lists once it outgrows DELTA_MERGE_FRACTION of them.
+        batch = SearchIndex(movies_df, self.field_weights, popularity)
+        delta = batch if self.delta is None else self.delta.appended(batch)
+        
+        if delta.n_rows > max(MIN_DELTA_ROWS, DELTA_MERGE_FRACTION * self.n_rows):
+            index = self.appended(delta)
+            index.delta = None
+        else:
+            index = copy.copy(self)
+            index.delta = delta
+        return index
+    
+    def appended(self, other):
+        # Rows of other follow this index's rows. Both vocabularies are mapped
+        # onto their sorted union, so prefixes still cover contiguous columns.
+        terms = sorted(set(self.terms).union(other.terms))
+        term_index = {term: column for column, term in enumerate(terms)}
+        columns = np.array([term_index[term] for term in self.terms], dtype=np.intp)
+        other_columns = np.array([term_index[term] for term in other.terms], dtype=np.intp)
+        shape = (self.n_rows + other.n_rows, len(terms))
+        
+        index = copy.copy(self)
+        index.terms, index.term_index = terms, term_index
+        index.postings = _stack_postings(self.postings, columns, other.postings, other_columns, shape)
+        index.title_postings = _stack_postings(self.title_postings, columns, other.title_postings, other_columns, shape)
+        index.popularity = np.concatenate([self.popularity, other.popularity])
+        index.n_rows = shape[0]
+        index._completion_cache = {}
+        return index
+    
+    def removed(self, keep):
+        index = copy.copy(self)
+        rows = np.flatnonzero(keep[:self.n_rows])
+        index.postings = self.postings[rows]
+        index.title_postings = self.title_postings[rows]
+        index.popularity = self.popularity[rows]
+        index.n_rows = len(rows)
+        index._completion_cache = {}
+        
+        if self.delta is not None:
+            delta = self.delta.removed(keep[self.n_rows:])
+            index.delta = delta if delta.n_rows else None
+        return index
+    
+    def tokenize(self, text):
+        return self.tokenizer.findall(text.lower())
+    
+    def prefix_range(self, prefix):
+        lo = bisect.bisect_left(self.terms, prefix)
+        hi = bisect.bisect_left(self.terms, prefix + '\uffff', lo)
+        return lo, hi
+    
+    def search(self, query, mask=None):
+        rows, scores = self._search_rows(query)
+        popularity = self.popularity[rows]
+        
+        if self.delta is not None:
+            delta_rows, delta_scores = self.delta.search(query)
+            popularity = np.concatenate([popularity, self.delta.popularity[delta_rows]])
+            rows = np.concatenate([rows, delta_rows + self.n_rows])
+            scores = np.concatenate([scores, delta_scores])
+        
+        if mask is not None:
+            eligible = mask[rows]
+            rows, scores, popularity = rows[eligible], scores[eligible], popularity[eligible]
+        
+        order = np.lexsort((-popularity, -scores))
+        return rows[order], scores[order]
+    
+    def _search_rows(self, query):
+        tokens = self.tokenize(query)
+        if not tokens:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)
+        
+        rows, scores = None, None
+        for i, token in enumerate(tokens):
+            is_last = i == len(tokens) - 1
+            token_rows, token_scores = self._token_postings(self.postings, token, prefix=is_last)
+            
+            if rows is None:
+                rows, scores = token_rows, token_scores
+            else:
+                rows, left, right = np.intersect1d(rows, token_rows, assume_unique=True, return_indices=True)
+                scores = scores[left] + token_scores[right]
+            
+            if len(rows) == 0:
+                break
+        
+        return rows, scores
+    
+    def autocomplete(self, prefix, n=10):
+        rows = self._autocomplete_rows(prefix, n)
+        if self.delta is None:
+            return rows
+        
+        delta_rows = self.delta.autocomplete(prefix, n)
+        popularity = np.concatenate([self.popularity[rows], self.delta.popularity[delta_rows]])
+        rows = np.concatenate([rows, delta_rows + self.n_rows])
+        top, _ = top_k(popularity, n)
+        return rows[top]
+    
+    def _autocomplete_rows(self, prefix, n):
+        tokens = self.tokenize(prefix)
+        if not tokens:
+            return np.zeros(0, dtype=np.intp)
+        
+        last = tokens[-1]
+        if len(tokens) == 1 and len(last) <= CACHED_PREFIX_LENGTH and n <= CACHED_COMPLETIONS:
+            # Very short prefixes match a large share of titles, so their
+            # completions are computed once and reused.
+            if last not in self._completion_cache:
+                rows, _ = self._token_postings(self.title_postings, last, prefix=True)
+                self._completion_cache[last] = self._most_popular(rows, CACHED_COMPLETIONS)
+            return self._completion_cache[last][:n]
+        
+        rows, _ = self._token_postings(self.title_postings, last, prefix=True)
+        for token in tokens[:-1]:
+            token_rows, _ = self._token_postings(self.title_postings, token, prefix=False)
+            rows = np.intersect1d(rows, token_rows, assume_unique=True)
+        
+        return self._most_popular(rows, n)
+    
+    def _token_postings(self, postings, token, prefix):
+        if prefix:
+            lo, hi = self.prefix_range(token)
+        else:
+            lo = self.term_index.get(token, 0)
+            hi = lo + 1 if token in self.term_index else lo
+        
+        if hi <= lo:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)
+        
+        start, end = postings.indptr[lo], postings.indptr[hi]
+        rows = postings.indices[start:end].astype(np.intp)
+        scores = postings.data[start:end]
+        
+        if hi - lo == 1 or len(rows) == 0:
+            return rows, scores
+        
+        # A prefix covers several terms; a row scores its best-weighted match.
+        order = np.argsort(rows, kind='stable')
+        rows, scores = rows[order], scores[order]
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        return rows[starts], np.maximum.reduceat(scores, starts)
+    
+    def _most_popular(self, rows, n):
+        top, _ = top_k(self.popularity[rows], n)
+        return rows[top]
+
+def _stack_postings(top, top_columns, bottom, bottom_columns, shape):
+    top, bottom = top.tocoo(), bottom.tocoo()
+    return sparse.csc_matrix((
+        np.concatenate([top.data, bottom.data]),
+        (np.concatenate([top.row, bottom.row + top.shape[0]]), np.concatenate([top_columns[top.col], bottom_columns[bottom.col]]))
+    ), shape=shape)
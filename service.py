@@ -0,0 +1,356 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+from recom_engine import MovieRecommendationEngine
+from catalog import load_catalog
+from shared_state import SharedEngine
+from ratings_store import RatingsRepository
+from trending import TrendingCounter
+from instrumentation import increment, metrics, span
+
+RESULT_COLUMNS = ['movie_id', 'title', 'genre', 'year', 'rating', 'poster_url']
+SCORE_COLUMNS = ['similarity_score', 'recommendation_score', 'search_score', 'trend_score', 'hybrid_score']
+MAX_RESULTS = 100
+MAX_BODY_BYTES = 1024 * 1024
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+class Overloaded(Exception):
+    pass
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class MicroBatcher:
+    def __init__(self, name, score_batch, executor, max_batch=64, max_delay=0.005, max_queue=1024):
+        self.name = name
+        self.score_batch = score_batch
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue(max_queue)
+        self.task = None
+    
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+    
+    async def submit(self, item):
+        # A full queue is rejected right away; waiting here would only move
+        # the backlog into open sockets.
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            increment('service_rejected_total', endpoint=self.name)
+            raise Overloaded(self.name)
+        return await future
+    
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            items = [item for item, _ in batch]
+            increment('service_batches_total', endpoint=self.name)
+            increment('service_batched_requests_total', len(batch), endpoint=self.name)
+            try:
+                results = await loop.run_in_executor(self.executor, self.score_batch, items)
+            except Exception as error:
+                results = [error] * len(batch)
+            
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+class RecommendationService:
+    def __init__(self, engine, max_batch=64, max_delay=0.005, max_queue=1024, max_in_flight=256, trending=None):
+        # engine may also be a SharedEngine, which is re-checked for a newly
+        # published version before each engine call.
+        self.engine_source = engine
+        self.trending = trending
+        # Engine calls run one at a time on this thread, which is also what
+        # lets requests pile up into the next batch while one is scoring.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='engine')
+        self.similar_batcher = MicroBatcher('similar', self.score_similar, self.executor, max_batch, max_delay, max_queue)
+        self.recommend_batcher = MicroBatcher('recommend', self.score_recommend, self.executor, max_batch, max_delay, max_queue)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+    
+    @property
+    def engine(self):
+        engine = self.engine_source
+        if isinstance(engine, SharedEngine):
+            engine = engine.get()
+        if self.trending is not None and engine.trending is None:
+            engine.attach_trending(self.trending)
+        return engine
+    
+    def score_similar(self, items):
+        n = max(n_recommendations for _, n_recommendations in items)
+        frames = self.engine.similar_batch([movie_id for movie_id, _ in items], n)
+        return [frame_records(frame.head(n_recommendations)) for frame, (_, n_recommendations) in zip(frames, items)]
+    
+    def score_recommend(self, items):
+        n = max(n_recommendations for _, n_recommendations in items)
+        frames = self.engine.recommend_batch([user_ratings for user_ratings, _ in items], n)
+        return [frame_records(frame.head(n_recommendations)) for frame, (_, n_recommendations) in zip(frames, items)]
+    
+    def search_records(self, text, n_results):
+        frame, total = self.engine.search_page(text, page_size=n_results)
+        return total, frame_records(frame)
+    
+    def trending_records(self, n_results):
+        return frame_records(self.engine.get_trending_movies(n_results))
+    
+    async def start(self, host, port):
+        self.similar_batcher.start()
+        self.recommend_batcher.start()
+        return await asyncio.start_server(self.handle_connection, host, port)
+    
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HTTPError as error:
+            await write_response(writer, error.status, {'error': str(error)}, False)
+        finally:
+            writer.close()
+    
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        route = self.routes().get(url.path)
+        if route is None:
+            return 404, {'error': f'no route for {url.path}'}
+        if method != route[0]:
+            return 405, {'error': f'{url.path} expects {route[0]}'}
+        
+        if self.in_flight >= self.max_in_flight:
+            increment('service_rejected_total', endpoint=url.path)
+            return 503, {'error': 'overloaded'}
+        
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            with span(f'service{url.path.replace("/", "_")}'):
+                return 200, await route[1](parse_qs(url.query), body)
+        except Overloaded:
+            return 503, {'error': 'overloaded'}
+        except HTTPError as error:
+            return error.status, {'error': str(error)}
+        except Exception as error:
+            increment('service_errors_total', endpoint=url.path)
+            return 500, {'error': repr(error)}
+        finally:
+            self.in_flight -= 1
+            metrics.observe('service_request_seconds', time.perf_counter() - start, endpoint=url.path)
+    
+    def routes(self):
+        return {
+            '/health': ('GET', self.health),
+            '/metrics': ('GET', self.metrics_text),
+            '/similar': ('GET', self.similar),
+            '/recommend': ('POST', self.recommend),
+            '/search': ('GET', self.search),
+            '/trending': ('GET', self.trending_movies),
+            '/events': ('POST', self.events),
+        }
+    
+    async def health(self, query, body):
+        return {'status': 'ok', 'movies': len(self.engine.movies_df), 'in_flight': self.in_flight}
+    
+    async def metrics_text(self, query, body):
+        return metrics.render_prometheus()
+    
+    async def similar(self, query, body):
+        movie_id = query_int(query, 'movie_id')
+        records = await self.similar_batcher.submit((movie_id, query_n(query)))
+        return {'movie_id': movie_id, 'results': records}
+    
+    async def recommend(self, query, body):
+        try:
+            payload = json.loads(body or b'{}')
+            user_ratings = {int(movie_id): float(rating) for movie_id, rating in payload.get('ratings', {}).items()}
+            n_recommendations = max(1, min(int(payload.get('n', 10)), MAX_RESULTS))
+        except (ValueError, AttributeError, TypeError) as error:
+            raise HTTPError(400, f'invalid body: {error}')
+        records = await self.recommend_batcher.submit((user_ratings, n_recommendations))
+        return {'results': records}
+    
+    async def search(self, query, body):
+        text = query.get('q', [''])[0]
+        if not text:
+            raise HTTPError(400, 'missing q')
+        loop = asyncio.get_running_loop()
+        total, records = await loop.run_in_executor(self.executor, self.search_records, text, query_n(query))
+        return {'query': text, 'total': total, 'results': records}
+    
+    async def trending_movies(self, query, body):
+        loop = asyncio.get_running_loop()
+        records = await loop.run_in_executor(self.executor, self.trending_records, query_n(query))
+        return {'results': records}
+    
+    async def events(self, query, body):
+        # Each update is O(1), so events are applied inline on the loop.
+        if self.trending is None:
+            raise HTTPError(404, 'trending events are not enabled')
+        try:
+            events = json.loads(body or b'{}').get('events', [])
+            self.trending.consume(events)
+        except (ValueError, AttributeError, KeyError, TypeError) as error:
+            raise HTTPError(400, f'invalid body: {error}')
+        return {'accepted': len(events)}
+
+def query_int(query, name):
+    try:
+        return int(query[name][0])
+    except (KeyError, ValueError):
+        raise HTTPError(400, f'missing or invalid {name}')
+
+def query_n(query):
+    try:
+        return max(1, min(int(query.get('n', ['10'])[0]), MAX_RESULTS))
+    except ValueError:
+        raise HTTPError(400, 'invalid n')
+
+def frame_records(frame):
+    # Column-wise tolist() yields plain Python values, which is far cheaper
+    # than to_dict('records') followed by per-cell numpy conversions.
+    columns = [column for column in RESULT_COLUMNS + SCORE_COLUMNS if column in frame.columns]
+    values = []
+    for column in columns:
+        series = frame[column]
+        if series.dtype.kind == 'f':
+            array = series.to_numpy(dtype=np.float64)
+            values.append([value if math.isfinite(value) else None for value in array.tolist()])
+        else:
+            values.append(series.tolist())
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+async def read_request(reader):
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as error:
+        if error.partial:
+            raise
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(413, 'headers too large')
+    
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, 'malformed request line')
+    
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    
+    try:
+        length = int(headers.get('content-length', '0') or 0)
+    except ValueError:
+        raise HTTPError(400, 'invalid content-length')
+    if length < 0:
+        raise HTTPError(400, 'invalid content-length')
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, 'body too large')
+    body = await reader.readexactly(length) if length else b''
+    return method, target, headers, body
+
+async def write_response(writer, status, payload, keep_alive=True):
+    if isinstance(payload, str):
+        body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+    else:
+        body, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+    headers = [
+        f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}',
+        f'Content-Type: {content_type}',
+        f'Content-Length: {len(body)}',
+        f'Connection: {"keep-alive" if keep_alive else "close"}',
+    ]
+    if status == 503:
+        headers.append('Retry-After: 1')
+    writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+
+async def serve(engine, host='127.0.0.1', port=8000, **service_kwargs):
+    service = RecommendationService(engine, **service_kwargs)
+    server = await service.start(host, port)
+    print(f'Serving {len(service.engine.movies_df)} movies on http://{host}:{port}')
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless JSON API over the recommendation engine.')
+    parser.add_argument('--catalog', default='movies_data.csv')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--neighbors', type=int, default=50)
+    parser.add_argument('--shared-dir', default=None, help='attach to state published by shared_state.py instead of fitting')
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--batch-delay-ms', type=float, default=5.0)
+    parser.add_argument('--max-queue', type=int, default=1024)
+    parser.add_argument('--max-in-flight', type=int, default=256)
+    parser.add_argument('--trending-half-life-hours', type=float, default=72.0)
+    parser.add_argument('--trending-log', default=None, help='replay a JSON-lines event log into the trending counter')
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'), help='seed the trending counter from stored ratings')
+    args = parser.parse_args()
+    
+    trending = TrendingCounter(half_life=args.trending_half_life_hours * 3600)
+    if args.trending_log:
+        trending.load_event_log(args.trending_log)
+    if args.database_url:
+        repository = RatingsRepository.from_url(args.database_url)
+        trending.load_ratings(repository)
+        repository.close()
+    
+    if args.shared_dir:
+        engine = SharedEngine(args.shared_dir)
+    else:
+        engine = MovieRecommendationEngine.from_catalog(args.catalog, load_catalog(args.catalog), n_neighbors=args.neighbors)
+    asyncio.run(serve(
+        engine,
+        args.host,
+        args.port,
+        max_batch=args.max_batch,
+        max_delay=args.batch_delay_ms / 1000,
+        max_queue=args.max_queue,
+        max_in_flight=args.max_in_flight,
+        trending=trending
+    ))
+
+if __name__ == '__main__':
+    main()
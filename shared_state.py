@@ -0,0 +1,139 @@
+import argparse
+import os
+import shutil
+import threading
+import time
+import pandas as pd
+import model_store
+from catalog import load_catalog
+
+# What workers share: the TF-IDF matrix, the similarity or neighbor arrays
+# and the vectorizer state are memory-mapped from the published version, so
+# their pages exist once however many workers attach. What they do not: each
+# worker unpickles its own catalog frame and rebuilds its SearchIndex and
+# FacetIndex from it, since those hold Python objects (strings, dicts,
+# categoricals) that cannot be mapped. That per-worker copy is built by a
+# background loader, never on the request path.
+CURRENT_FILE = 'CURRENT'
+VERSIONS_DIR = 'versions'
+CATALOG_FILE = 'catalog.pkl'
+
+def default_root():
+    # /dev/shm is tmpfs, so the mapped arrays live in shared memory rather
+    # than being paged in from disk by every worker.
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm/movierec'
+    return os.path.join('artifacts', 'shared')
+
+def publish(engine, root=None, keep=3):
+    # A version directory is complete before it becomes visible: the arrays
+    # and catalog are written to a staging path, renamed into versions/, and
+    # only then is CURRENT replaced in one os.replace().
+    root = root or default_root()
+    versions_dir = os.path.join(root, VERSIONS_DIR)
+    os.makedirs(versions_dir, exist_ok=True)
+    
+    version = f'{time.time_ns()}-{os.getpid()}'
+    staging_path = os.path.join(root, f'.staging-{version}')
+    model_store.save_model(engine, staging_path, fingerprint=version)
+    engine.movies_df.to_pickle(os.path.join(staging_path, CATALOG_FILE))
+    os.rename(staging_path, os.path.join(versions_dir, version))
+    
+    tmp_current = os.path.join(root, f'.{CURRENT_FILE}-{version}')
+    with open(tmp_current, 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_current, os.path.join(root, CURRENT_FILE))
+    
+    prune(root, keep)
+    return version
+
+def current_version(root=None):
+    try:
+        with open(os.path.join(root or default_root(), CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def version_path(root, version):
+    return os.path.join(root or default_root(), VERSIONS_DIR, version)
+
+def prune(root=None, keep=3):
+    # Workers that still map an older version keep their pages after the
+    # files are unlinked, so removing old directories is safe.
+    versions_dir = os.path.join(root or default_root(), VERSIONS_DIR)
+    current = current_version(root)
+    versions = sorted(os.listdir(versions_dir), key=lambda name: int(name.split('-')[0]))
+    for version in versions[:-keep] if keep else versions:
+        if version != current:
+            shutil.rmtree(os.path.join(versions_dir, version), ignore_errors=True)
+
+def attach(root=None, version=None, engine_class=None, **engine_kwargs):
+    if engine_class is None:
+        from recom_engine import MovieRecommendationEngine as engine_class
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f'No published engine state under {root or default_root()}')
+    
+    path = version_path(root, version)
+    movies_df = pd.read_pickle(os.path.join(path, CATALOG_FILE))
+    engine = engine_class(movies_df, model_path=path, **engine_kwargs)
+    engine.shared_version = version
+    return engine
+
+class SharedEngine:
+    def __init__(self, root=None, check_interval=5.0, **engine_kwargs):
+        self.root = root or default_root()
+        self.check_interval = check_interval
+        self.engine_kwargs = engine_kwargs
+        self.lock = threading.Lock()
+        self.version = None
+        self.current = None
+        self.loader = None
+        self.checked_at = time.monotonic()
+        self.refresh()
+    
+    def get(self):
+        # Attaching a version takes as long as loading the catalog and
+        # building its search and facet indexes, so a request only starts a
+        # loader and keeps serving the engine it has until the swap.
+        if time.monotonic() - self.checked_at >= self.check_interval:
+            self.checked_at = time.monotonic()
+            self.start_refresh()
+        return self.current
+    
+    def start_refresh(self):
+        loader = self.loader
+        if loader is not None and loader.is_alive():
+            return loader
+        self.loader = threading.Thread(target=self.refresh, name='shared-engine-refresh', daemon=True)
+        self.loader.start()
+        return self.loader
+    
+    def refresh(self):
+        # Requests already holding the previous engine finish on it; the swap
+        # is a single reference assignment.
+        with self.lock:
+            version = current_version(self.root)
+            if version is None or version == self.version:
+                return False
+            self.current = attach(self.root, version, **self.engine_kwargs)
+            self.version = version
+            return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish fitted engine state for workers to map read-only.')
+    parser.add_argument('catalog')
+    parser.add_argument('--root', default=None)
+    parser.add_argument('--neighbors', type=int, default=50)
+    parser.add_argument('--keep', type=int, default=3)
+    args = parser.parse_args()
+    
+    from recom_engine import MovieRecommendationEngine
+    engine = MovieRecommendationEngine(load_catalog(args.catalog), n_neighbors=args.neighbors)
+    version = publish(engine, args.root, args.keep)
+    print(f'Published {len(engine.movies_df)} movies as {version} under {args.root or default_root()}')
+
+if __name__ == '__main__':
+    main()
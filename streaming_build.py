@@ -0,0 +1,197 @@
+import argparse
+import os
+import shutil
+import numpy as np
+from scipy import sparse
+from sklearn.metrics.pairwise import linear_kernel
+import model_store
+from catalog import combined_features, iter_catalog, load_catalog
+from hashing_tfidf import N_FEATURES, HashingTfidf
+from quantize import QuantizedScores, score_dtype
+from ranking import top_k
+
+FEATURE_COLUMNS = ['movie_id', 'genre', 'keywords', 'director', 'cast']
+RAW_FILES = ('counts_data', 'counts_indices', 'counts_indptr')
+
+def stream_build(catalog_path, path, n_neighbors=50, precision='float32', n_features=N_FEATURES,
+                 chunk_size=50000, block_size=512, fingerprint=None):
+    # Writes a model_store artifact without ever holding the catalog text or
+    # the whole matrix in memory: counts go to flat files chunk by chunk, and
+    # every later pass reads them back through memory maps.
+    tmp_path = model_store.staging_path(path)
+    dtype = score_dtype(precision)
+    vectorizer = HashingTfidf(n_features, dtype=dtype)
+    
+    n_movies, nnz, document_frequency = write_term_counts(vectorizer, catalog_path, tmp_path, chunk_size)
+    vectorizer.set_document_frequency(document_frequency, n_movies)
+    np.save(os.path.join(tmp_path, 'idf.npy'), vectorizer.idf_)
+    
+    write_tfidf(vectorizer.idf_, tmp_path, n_movies, nnz, dtype, block_size)
+    tfidf_matrix = load_tfidf(tmp_path, n_movies, n_features)
+    arrays = ['idf', 'tfidf_data', 'tfidf_indices', 'tfidf_indptr']
+    arrays += write_neighbor_index(tfidf_matrix, tmp_path, n_neighbors, precision, block_size)
+    
+    for name in RAW_FILES:
+        os.remove(os.path.join(tmp_path, f'{name}.raw'))
+    
+    model_store.write_manifest(tmp_path, {
+        'fingerprint': fingerprint,
+        'n_movies': n_movies,
+        'n_features': n_features,
+        'n_neighbors': n_neighbors,
+        'precision': precision,
+        'vectorizer': 'hashing',
+        'vectorizer_params': {'n_features': n_features, 'dtype': np.dtype(dtype).name},
+        'vocabulary': None,
+        'arrays': sorted(arrays),
+    })
+    model_store.commit_artifact(tmp_path, path)
+    return path
+
+def write_term_counts(vectorizer, catalog_path, tmp_path, chunk_size):
+    # Pass 1: hash each chunk, count document frequencies, and append the
+    # raw counts as CSR pieces. indptr is shifted by the rows written so far.
+    document_frequency = np.zeros(vectorizer.n_features, dtype=np.int64)
+    n_movies = nnz = 0
+    files = [open(os.path.join(tmp_path, f'{name}.raw'), 'wb') for name in RAW_FILES]
+    data_file, indices_file, indptr_file = files
+    try:
+        np.zeros(1, dtype=np.int64).tofile(indptr_file)
+        for chunk in iter_catalog(catalog_path, chunk_size, FEATURE_COLUMNS):
+            counts = vectorizer.term_counts(combined_features(chunk))
+            document_frequency += np.bincount(counts.indices, minlength=vectorizer.n_features)
+            counts.data.tofile(data_file)
+            counts.indices.astype(np.int32).tofile(indices_file)
+            (counts.indptr[1:] + nnz).astype(np.int64).tofile(indptr_file)
+            n_movies += counts.shape[0]
+            nnz += counts.nnz
+    finally:
+        for f in files:
+            f.close()
+    return n_movies, nnz, document_frequency
+
+def write_tfidf(idf, tmp_path, n_movies, nnz, dtype, block_size):
+    # Pass 2: weight by IDF and L2-normalize rows block by block, writing the
+    # values straight into the final .npy through a memory map.
+    counts = np.memmap(os.path.join(tmp_path, 'counts_data.raw'), dtype=dtype, mode='r', shape=(nnz,))
+    indices = np.memmap(os.path.join(tmp_path, 'counts_indices.raw'), dtype=np.int32, mode='r', shape=(nnz,))
+    indptr = np.memmap(os.path.join(tmp_path, 'counts_indptr.raw'), dtype=np.int64, mode='r', shape=(n_movies + 1,))
+    data = np.lib.format.open_memmap(os.path.join(tmp_path, 'tfidf_data.npy'), mode='w+', dtype=dtype, shape=(nnz,))
+    
+    rows_per_block = block_size * 64
+    for start in range(0, n_movies, rows_per_block):
+        end = min(start + rows_per_block, n_movies)
+        low, high = indptr[start], indptr[end]
+        values = counts[low:high] * idf[indices[low:high]]
+        rows = np.repeat(np.arange(end - start), np.diff(indptr[start:end + 1]))
+        norms = np.sqrt(np.bincount(rows, weights=values.astype(np.float64) ** 2, minlength=end - start))
+        norms[norms == 0] = 1
+        data[low:high] = values / norms[rows]
+    data.flush()
+    del data, counts, indices, indptr
+    
+    _raw_to_npy(tmp_path, 'counts_indices', 'tfidf_indices', np.int32, nnz)
+    _raw_to_npy(tmp_path, 'counts_indptr', 'tfidf_indptr', np.int64, n_movies + 1)
+
+def load_tfidf(tmp_path, n_movies, n_features):
+    arrays = [np.load(os.path.join(tmp_path, f'{name}.npy'), mmap_mode='r')
+              for name in ('tfidf_data', 'tfidf_indices', 'tfidf_indptr')]
+    return sparse.csr_matrix(tuple(arrays), shape=(n_movies, n_features), copy=False)
+
+def write_neighbor_index(tfidf_matrix, tmp_path, n_neighbors, precision, block_size):
+    # Pass 3: like build_neighbor_index, but the candidate side is tiled too,
+    # so a block never materializes more than block_size x tile_size scores
+    # however large the catalog grows.
+    n_movies = tfidf_matrix.shape[0]
+    k = max(min(n_neighbors, n_movies - 1), 0)
+    tile_size = max(block_size * 64, k)
+    
+    outputs = {'neighbor_indices': _open_array(tmp_path, 'neighbor_indices', np.int32, (n_movies, k))}
+    if precision == 'int8':
+        outputs['neighbor_scores_codes'] = _open_array(tmp_path, 'neighbor_scores_codes', np.int8, (n_movies, k))
+        outputs['neighbor_scores_scales'] = _open_array(tmp_path, 'neighbor_scores_scales', np.float32, (n_movies,))
+    else:
+        outputs['neighbor_scores'] = _open_array(tmp_path, 'neighbor_scores', np.float32, (n_movies, k))
+    
+    for start in range(0, n_movies, block_size):
+        end = min(start + block_size, n_movies)
+        block = tfidf_matrix[start:end]
+        best_indices = np.zeros((end - start, k), dtype=np.int32)
+        best_scores = np.full((end - start, k), -np.inf, dtype=np.float32)
+        
+        for tile_start in range(0, n_movies, tile_size):
+            tile_end = min(tile_start + tile_size, n_movies)
+            scores = linear_kernel(block, tfidf_matrix[tile_start:tile_end]).astype(np.float32, copy=False)
+            rows = np.arange(max(start, tile_start), min(end, tile_end))
+            scores[rows - start, rows - tile_start] = -np.inf
+            
+            top, top_scores = top_k(scores, k)
+            candidates = np.hstack([best_indices, top + tile_start])
+            candidate_scores = np.hstack([best_scores, top_scores])
+            order, best_scores = top_k(candidate_scores, k)
+            best_indices = np.take_along_axis(candidates, order, axis=1).astype(np.int32)
+        
+        outputs['neighbor_indices'][start:end] = best_indices
+        if precision == 'int8':
+            quantized = QuantizedScores.quantize(best_scores)
+            outputs['neighbor_scores_codes'][start:end] = quantized.codes
+            outputs['neighbor_scores_scales'][start:end] = quantized.scales
+        else:
+            outputs['neighbor_scores'][start:end] = best_scores
+    
+    for array in outputs.values():
+        array.flush()
+    return list(outputs)
+
+def _open_array(tmp_path, name, dtype, shape):
+    return np.lib.format.open_memmap(os.path.join(tmp_path, f'{name}.npy'), mode='w+', dtype=dtype, shape=shape)
+
+def _raw_to_npy(tmp_path, raw_name, name, dtype, length):
+    # The raw file already holds the array bytes; only the .npy header is new.
+    header = {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)), 'fortran_order': False, 'shape': (length,)}
+    with open(os.path.join(tmp_path, f'{name}.npy'), 'wb') as out, open(os.path.join(tmp_path, f'{raw_name}.raw'), 'rb') as raw:
+        np.lib.format.write_array_header_1_0(out, header)
+        shutil.copyfileobj(raw, out, 1 << 24)
+
+def build_engine(catalog_path, movies_df=None, artifact_dir='artifacts', n_neighbors=50, precision='float32',
+                 n_features=N_FEATURES, chunk_size=50000, block_size=512, engine_class=None, **engine_kwargs):
+    if engine_class is None:
+        from recom_engine import MovieRecommendationEngine as engine_class
+    
+    path, fingerprint = streamed_artifact_path(catalog_path, artifact_dir, n_neighbors, precision, n_features)
+    if not model_store.is_valid_artifact(path):
+        stream_build(catalog_path, path, n_neighbors, precision, n_features, chunk_size, block_size, fingerprint)
+    
+    if movies_df is None:
+        movies_df = load_catalog(catalog_path)
+    return engine_class(movies_df, block_size=block_size, model_path=path, precision=precision, **engine_kwargs)
+
+def streamed_artifact_path(catalog_path, artifact_dir, n_neighbors, precision, n_features):
+    fingerprint = model_store.catalog_fingerprint(
+        catalog_path,
+        vectorizer='hashing',
+        n_features=n_features,
+        n_neighbors=n_neighbors,
+        precision=precision
+    )
+    os.makedirs(artifact_dir, exist_ok=True)
+    return model_store.artifact_path(artifact_dir, fingerprint), fingerprint
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a model artifact from a catalog too large to featurize in memory.')
+    parser.add_argument('catalog')
+    parser.add_argument('--artifact-dir', default='artifacts')
+    parser.add_argument('--neighbors', type=int, default=50)
+    parser.add_argument('--precision', default='float32', choices=['float64', 'float32', 'int8'])
+    parser.add_argument('--features', type=int, default=N_FEATURES)
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--block-size', type=int, default=512)
+    args = parser.parse_args()
+    
+    path, fingerprint = streamed_artifact_path(args.catalog, args.artifact_dir, args.neighbors, args.precision, args.features)
+    stream_build(args.catalog, path, args.neighbors, args.precision, args.features,
+                 args.chunk_size, args.block_size, fingerprint)
+    print(f'Wrote {model_store.read_manifest(path)["n_movies"]} movies to {path}')
+
+if __name__ == '__main__':
+    main()
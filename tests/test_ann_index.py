@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from ann_index import IVFIndex
+
+@pytest.fixture
+def index():
+    items = sparse.random(600, 40, density=0.2, random_state=0, format='csr')
+    return IVFIndex(n_lists=30, n_probe=1).fit(items)
+
+def query_for(index, row):
+    return np.asarray(index.item_matrix[row].todense()).ravel()
+
+def test_search_probes_more_lists_when_exclusions_empty_the_probed_ones(index):
+    query = query_for(index, 0)
+    probed = index.candidates(query, 1)
+    
+    movie_indices, scores = index.search(query, 10, exclude=probed)
+    
+    assert len(movie_indices) == 10
+    assert not np.isin(movie_indices, probed).any()
+    assert np.all(np.diff(scores) <= 0)
+
+def test_search_with_every_list_probed_is_exact(index):
+    query = query_for(index, 3)
+    exclude = np.array([3, 10, 11])
+    
+    _, scores = index.search(query, 5, n_probe=len(index.centroids), exclude=exclude)
+    exact = index.item_matrix @ query
+    exact[exclude] = -np.inf
+    
+    np.testing.assert_allclose(scores, np.sort(exact)[::-1][:5], rtol=1e-5)
+
+def test_search_goes_exhaustive_over_a_small_eligible_set(index):
+    query = query_for(index, 0)
+    mask = np.zeros(index.item_matrix.shape[0], dtype=bool)
+    eligible = np.arange(100, 600, 40)
+    mask[eligible] = True
+    
+    movie_indices, _ = index.search(query, 10, exclude=eligible[:3], mask=mask)
+    
+    assert sorted(movie_indices.tolist()) == sorted(eligible[3:].tolist())
@@ -0,0 +1,33 @@
+import threading
+from auth import AuthManager
+
+def test_compact_keeps_signups_appended_concurrently(tmp_path):
+    users_file = str(tmp_path / 'users.csv')
+    AuthManager(users_file)
+    n_writers, per_writer = 6, 50
+    done = threading.Event()
+    results = []
+    
+    def sign_up(writer):
+        auth = AuthManager(users_file)
+        for i in range(per_writer):
+            name = f'user-{writer}-{i}'
+            results.append(auth.create_user(name, 'secret', f'{name}@example.com')[0])
+    
+    def compact():
+        auth = AuthManager(users_file)
+        while not done.is_set():
+            auth.compact()
+    
+    compactor = threading.Thread(target=compact)
+    compactor.start()
+    writers = [threading.Thread(target=sign_up, args=(w,)) for w in range(n_writers)]
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    compactor.join()
+    
+    assert results.count(True) == n_writers * per_writer
+    assert len(AuthManager(users_file).users) == n_writers * per_writer
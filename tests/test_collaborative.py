@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from benchmarks.synthetic import generate_catalog
+from collaborative import MatrixFactorization
+from recom_engine import MovieRecommendationEngine
+
+def low_rank_ratings(n_users=60, n_movies=40, n_factors=3, density=0.5, seed=0):
+    rng = np.random.default_rng(seed)
+    users = rng.normal(size=(n_users, n_factors))
+    movies = rng.normal(size=(n_movies, n_factors))
+    observed = rng.random((n_users, n_movies)) < density
+    user_rows, movie_cols = np.nonzero(observed)
+    ratings = 5 + (users @ movies.T)[user_rows, movie_cols]
+    return user_rows + 1, movie_cols + 101, ratings
+
+def test_solve_side_matches_a_ridge_regression_per_row():
+    model = MatrixFactorization(n_factors=4, regularization=0.3, chunk_nnz=7)
+    rng = np.random.default_rng(0)
+    matrix = sparse.random(30, 20, density=0.3, random_state=1, format='csr')
+    matrix.data = rng.normal(size=matrix.nnz)
+    other = rng.normal(size=(20, 4)).astype(np.float32)
+    
+    factors = model._solve_side(matrix, other)
+    
+    for row in range(matrix.shape[0]):
+        columns = matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]
+        if len(columns) == 0:
+            assert not factors[row].any()
+            continue
+        neighbors = other[columns].astype(np.float64)
+        values = matrix.data[matrix.indptr[row]:matrix.indptr[row + 1]]
+        gram = neighbors.T @ neighbors + 0.3 * len(columns) * np.eye(4)
+        np.testing.assert_allclose(factors[row], np.linalg.solve(gram, neighbors.T @ values), rtol=1e-4, atol=1e-5)
+
+def test_chunk_size_does_not_change_the_fit():
+    user_ids, movie_ids, ratings = low_rank_ratings()
+    small = MatrixFactorization(n_factors=4, chunk_nnz=16).fit(user_ids, movie_ids, ratings)
+    large = MatrixFactorization(n_factors=4, chunk_nnz=1 << 20).fit(user_ids, movie_ids, ratings)
+    
+    np.testing.assert_allclose(small.user_factors, large.user_factors, rtol=1e-4, atol=1e-5)
+    np.testing.assert_allclose(small.item_factors, large.item_factors, rtol=1e-4, atol=1e-5)
+
+def test_fit_reconstructs_low_rank_ratings():
+    user_ids, movie_ids, ratings = low_rank_ratings()
+    model = MatrixFactorization(n_factors=3, regularization=0.01, n_iterations=20).fit(user_ids, movie_ids, ratings)
+    
+    users = np.searchsorted(model.user_ids, user_ids)
+    movies = model.item_positions(movie_ids)
+    predicted = model.global_mean + np.sum(model.user_factors[users] * model.item_factors[movies], axis=1)
+    
+    assert np.sqrt(np.mean((predicted - ratings) ** 2)) < 0.1 * ratings.std()
+
+def test_fold_in_matches_the_trained_user_vector():
+    user_ids, movie_ids, ratings = low_rank_ratings()
+    model = MatrixFactorization(n_factors=3, regularization=0.01, n_iterations=20).fit(user_ids, movie_ids, ratings)
+    rows = user_ids == 7
+    
+    folded = model.fold_in(movie_ids[rows], ratings[rows])
+    
+    np.testing.assert_allclose(folded, model.user_vector(7), rtol=0.05, atol=0.01)
+    assert model.user_vector(12345) is None
+
+def test_save_and_load_round_trip(tmp_path):
+    model = MatrixFactorization(n_factors=3).fit(*low_rank_ratings())
+    model.save(str(tmp_path / 'cf.npz'))
+    loaded = MatrixFactorization.load(str(tmp_path / 'cf.npz'))
+    
+    np.testing.assert_array_equal(loaded.item_factors, model.item_factors)
+    np.testing.assert_array_equal(loaded.movie_ids, model.movie_ids)
+    assert loaded.global_mean == pytest.approx(model.global_mean)
+
+def test_cf_recommendations_skip_rated_and_unrated_movies():
+    catalog = generate_catalog(60, seed=0)
+    catalog['movie_id'] = np.arange(101, 161)
+    # The model only knows the first 40 movies; the rest were never rated.
+    user_ids, movie_ids, ratings = low_rank_ratings()
+    model = MatrixFactorization(n_factors=3, regularization=0.01, n_iterations=20).fit(user_ids, movie_ids, ratings)
+    engine = MovieRecommendationEngine(catalog, n_neighbors=5)
+    engine.attach_cf_model(model)
+    user_ratings = {int(movie_id): float(rating) for movie_id, rating in zip(movie_ids[user_ids == 7], ratings[user_ids == 7])}
+    
+    recommendations = engine.get_cf_recommendations(user_ratings, n_recommendations=50, user_id=7)
+    
+    recommended = recommendations['movie_id'].tolist()
+    assert not set(recommended) & set(user_ratings)
+    assert all(movie_id < 141 for movie_id in recommended)
+    assert len(recommended) == 40 - len(user_ratings)
+    assert np.all(np.diff(recommendations['recommendation_score'].values) <= 0)
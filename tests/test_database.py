@@ -0,0 +1,24 @@
+import database
+
+class FakeSession:
+    closed = False
+    
+    def close(self):
+        self.closed = True
+
+def test_get_db_closes_the_session(monkeypatch):
+    monkeypatch.setattr(database, 'SessionLocal', FakeSession)
+    
+    with database.get_db() as db:
+        assert not db.closed
+    assert db.closed
+
+def test_get_db_closes_the_session_on_error(monkeypatch):
+    monkeypatch.setattr(database, 'SessionLocal', FakeSession)
+    
+    try:
+        with database.get_db() as db:
+            raise ValueError
+    except ValueError:
+        pass
+    assert db.closed
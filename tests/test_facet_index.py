@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import generate_catalog
+from catalog import compact_catalog
+from facet_index import FacetIndex
+
+def make_catalog(ratings):
+    return compact_catalog(pd.DataFrame({
+        'movie_id': range(1, len(ratings) + 1),
+        'genre': ['Drama'] * len(ratings),
+        'year': [2000] * len(ratings),
+        'rating': ratings,
+    }))
+
+def test_rating_range_includes_its_bounds():
+    movies_df = make_catalog([3.8, 7.1, 7.2, 7.3, 10.0])
+    index = FacetIndex(movies_df)
+    
+    assert index.filter(rating_range=(7.2, 10)).tolist() == [2, 3, 4]
+    assert index.filter(rating_range=(7.3, 7.3)).tolist() == [3]
+    assert index.filter(rating_range=(3.8, 3.8)).tolist() == [0]
+
+def test_ratings_keep_their_decimal_value():
+    movies_df = make_catalog(['7.3', '3.8'])
+    
+    assert movies_df['rating'].tolist() == [7.3, 3.8]
+
+def test_filters_match_a_pandas_scan():
+    movies_df = compact_catalog(generate_catalog(500, seed=3))
+    index = FacetIndex(movies_df)
+    genre_sets = movies_df['genre'].astype(str).str.split(', ').apply(set)
+    
+    for genres, year_range, rating_range in [
+        (['Drama'], None, None),
+        (['Action', 'Comedy'], (1990, 2010), None),
+        (None, (2000, 2000), (5.0, 7.5)),
+        (['Drama'], None, (8.0, 10.0)),
+    ]:
+        expected = pd.Series(True, index=movies_df.index)
+        if genres:
+            expected &= genre_sets.apply(set(genres).issubset)
+        if year_range:
+            expected &= movies_df['year'].between(*year_range)
+        if rating_range:
+            expected &= movies_df['rating'].between(*rating_range)
+        
+        assert index.filter(genres, year_range, rating_range).tolist() == np.flatnonzero(expected).tolist()
+
+def test_unknown_genre_matches_nothing():
+    index = FacetIndex(make_catalog([5.0, 6.0]))
+    
+    assert index.filter(genres=['Drama', 'Western']).tolist() == []
+    assert index.genres == ['Drama']
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics.pairwise import linear_kernel
+import search_index
+from benchmarks.synthetic import generate_catalog
+from facet_index import FacetIndex
+from recom_engine import MovieRecommendationEngine
+from search_index import SearchIndex
+
+def new_movies(n_movies, seed, first_id):
+    movies = generate_catalog(n_movies, seed=seed)
+    movies['movie_id'] += first_id - 1
+    movies['title'] = [f'Added {movie_id} title' for movie_id in movies['movie_id']]
+    return movies
+
+@pytest.fixture
+def catalog():
+    return generate_catalog(400, seed=0)
+
+def assert_neighbors_exact(engine):
+    # Incremental neighbor lists hold the same scores a full rebuild over
+    # the current TF-IDF rows would; ties may order indices differently.
+    n_movies = engine.tfidf_matrix.shape[0]
+    k = engine.neighbor_indices.shape[1]
+    _, expected = engine.compute_neighbor_rows(np.arange(n_movies), k, engine.block_size)
+    np.testing.assert_allclose(engine.neighbor_scores, expected, rtol=1e-5, atol=1e-6)
+    exact = linear_kernel(engine.tfidf_matrix, engine.tfidf_matrix)
+    stored = np.take_along_axis(exact, engine.neighbor_indices.astype(np.intp), axis=1)
+    valid = engine.neighbor_scores > -np.inf
+    np.testing.assert_allclose(stored[valid], engine.neighbor_scores[valid], rtol=1e-5, atol=1e-6)
+
+def test_ordinary_adds_do_not_trigger_a_refit(catalog):
+    engine = MovieRecommendationEngine(generate_catalog(1500, seed=0), n_neighbors=20)
+    for seed in (1, 2, 3):
+        engine.add_movies(new_movies(60, seed, 100000 * seed))
+    
+    # Most new cast and keyword terms are unknown to the model, as they would
+    # be to a refitted one, so the raw rate alone is above the threshold.
+    assert engine.drift_unknown_tokens / engine.drift_tokens > engine.refit_drift_threshold
+    assert engine.vocabulary_drift() < engine.refit_drift_threshold
+    assert engine.refit_thread is None
+
+def test_new_vocabulary_counts_as_drift(catalog):
+    engine = MovieRecommendationEngine(catalog, n_neighbors=10)
+    engine.auto_refit = False
+    movies = new_movies(40, 1, 10000)
+    movies['keywords'] = [f'novel{i} unseen{i} fresh{i}' for i in range(len(movies))]
+    movies['cast'] = [f'Newcomer{i}, Debut{i}' for i in range(len(movies))]
+    movies['director'] = [f'Firsttime{i}' for i in range(len(movies))]
+    engine.add_movies(movies)
+    
+    assert engine.vocabulary_drift() > engine.refit_drift_threshold
+
+def test_drift_baseline_survives_a_saved_model(catalog, tmp_path):
+    engine = MovieRecommendationEngine(catalog, n_neighbors=10)
+    engine.save_model(str(tmp_path / 'model'))
+    loaded = MovieRecommendationEngine(catalog, model_path=str(tmp_path / 'model'))
+    
+    assert loaded.drift_baseline == pytest.approx(engine.drift_baseline)
+
+def test_add_movies_updates_neighbors_and_indexes(catalog):
+    engine = MovieRecommendationEngine(catalog, n_neighbors=10, block_size=64)
+    engine.auto_refit = False
+    movies = new_movies(30, 1, 10000)
+    engine.add_movies(movies)
+    
+    assert len(engine.movies_df) == len(catalog) + len(movies)
+    assert engine.get_movie_index(10005) == len(catalog) + 5
+    assert_neighbors_exact(engine)
+    
+    rows, _ = engine.search('Added 10005')
+    assert engine.movies_df['movie_id'].iloc[rows[0]] == 10005
+    genre = movies['genre'].iloc[0].split(',')[0].strip()
+    assert len(catalog) in engine.filter(genres=[genre])
+
+def test_remove_movies_updates_neighbors_and_indexes(catalog):
+    engine = MovieRecommendationEngine(catalog, n_neighbors=10, block_size=64)
+    removed = catalog['movie_id'].iloc[[0, 7, 150]].tolist()
+    # Remove movies that other rows list as neighbors, so those lists are recomputed.
+    removed.append(int(catalog['movie_id'].iloc[engine.neighbor_indices[3, 0]]))
+    engine.remove_movies(removed)
+    
+    assert len(engine.movies_df) == len(catalog) - len(set(removed))
+    assert all(engine.get_movie_index(movie_id) is None for movie_id in removed)
+    assert not engine.movies_df['movie_id'].isin(removed).any()
+    assert_neighbors_exact(engine)
+    
+    title = catalog['title'].iloc[150]
+    rows, _ = engine.search(title)
+    assert not engine.movies_df['movie_id'].iloc[rows].isin(removed).any()
+
+def test_adding_an_existing_movie_replaces_it(catalog):
+    engine = MovieRecommendationEngine(catalog, n_neighbors=10)
+    engine.auto_refit = False
+    movie = catalog.iloc[[5]].copy()
+    movie['title'] = 'Replacement Title'
+    engine.add_movies(movie)
+    
+    assert len(engine.movies_df) == len(catalog)
+    assert engine.get_movie_by_id(movie['movie_id'].iloc[0])['title'] == 'Replacement Title'
+    assert_neighbors_exact(engine)
+
+def test_dense_similarities_follow_adds_and_removes(catalog):
+    engine = MovieRecommendationEngine(catalog)
+    engine.auto_refit = False
+    engine.add_movies(new_movies(20, 1, 10000))
+    engine.remove_movies(catalog['movie_id'].iloc[:10].tolist())
+    
+    expected = linear_kernel(engine.tfidf_matrix, engine.tfidf_matrix)
+    np.testing.assert_allclose(np.asarray(engine.cosine_sim), expected, rtol=1e-6, atol=1e-9)
+
+def facet_rows(index, **filters):
+    return index.filter(**filters).tolist()
+
+def test_facet_added_leaves_the_original_index_untouched(catalog):
+    base_df, added_df = catalog.iloc[:203], catalog.iloc[203:]
+    base = FacetIndex(base_df)
+    before = {genre: facet_rows(base, genres=[genre]) for genre in base.genres}
+    
+    added = base.added(added_df)
+    expected = FacetIndex(catalog.reset_index(drop=True))
+    
+    assert {genre: facet_rows(base, genres=[genre]) for genre in base.genres} == before
+    assert sorted(added.genres) == sorted(expected.genres)
+    for genre in expected.genres:
+        assert facet_rows(added, genres=[genre]) == facet_rows(expected, genres=[genre])
+    assert facet_rows(added, year_range=(1990, 2005)) == facet_rows(expected, year_range=(1990, 2005))
+    assert facet_rows(added, rating_range=(6.0, 7.5)) == facet_rows(expected, rating_range=(6.0, 7.5))
+
+def test_facet_added_after_a_discarded_update(catalog):
+    # A second update from the same base writes into the shared spare bytes
+    # the discarded one used; none of its bits may leak into the result.
+    base_df = catalog.iloc[:101].reset_index(drop=True)
+    base = FacetIndex(base_df)
+    base.added(catalog.iloc[101:300])
+    
+    other = catalog.iloc[300:320].copy()
+    other['genre'] = 'Western'
+    added = base.added(other)
+    expected = FacetIndex(pd.concat([base_df, other], ignore_index=True))
+    
+    for genre in expected.genres:
+        assert facet_rows(added, genres=[genre]) == facet_rows(expected, genres=[genre])
+
+def test_facet_added_with_a_new_genre(catalog):
+    base = FacetIndex(catalog.iloc[:50])
+    other = catalog.iloc[50:60].copy()
+    other['genre'] = 'Noir, Drama'
+    added = base.added(other)
+    
+    assert 'Noir' in added.genres and 'Noir' not in base.genres
+    assert facet_rows(added, genres=['Noir']) == list(range(50, 60))
+
+def search_results(index, query):
+    rows, scores = index.search(query)
+    return dict(zip(rows.tolist(), scores.tolist()))
+
+@pytest.mark.parametrize('min_delta_rows', [search_index.MIN_DELTA_ROWS, 0])
+def test_search_delta_matches_a_full_build(catalog, monkeypatch, min_delta_rows):
+    # With the default threshold the added rows stay in the delta index;
+    # with none they are merged into the main posting lists right away.
+    monkeypatch.setattr(search_index, 'MIN_DELTA_ROWS', min_delta_rows)
+    base_df, first, second = catalog.iloc[:300], new_movies(20, 1, 10000), new_movies(20, 2, 20000)
+    base = SearchIndex(base_df, popularity=base_df['rating'].values)
+    index = base.added(first, popularity=first['rating'].values).added(second, popularity=second['rating'].values)
+    full_df = pd.concat([base_df, first, second], ignore_index=True)
+    expected = SearchIndex(full_df, popularity=full_df['rating'].values)
+    
+    assert (index.delta is not None) == (min_delta_rows > 0)
+    for query in ['Added 10003', 'Added', 'kw1', 'Person1', 'Drama', 'Movie 12']:
+        assert search_results(index, query) == pytest.approx(search_results(expected, query))
+    assert sorted(index.autocomplete('Added 2', 5).tolist()) == sorted(expected.autocomplete('Added 2', 5).tolist())
+    assert search_results(base, 'Added') == {}
+
+def test_search_delta_survives_removal(catalog):
+    base_df, added_df = catalog.iloc[:300], new_movies(20, 1, 10000)
+    index = SearchIndex(base_df, popularity=base_df['rating'].values).added(added_df, popularity=added_df['rating'].values)
+    full_df = pd.concat([base_df, added_df], ignore_index=True)
+    keep = np.ones(len(full_df), dtype=bool)
+    keep[[3, 305, 310]] = False
+    
+    removed = index.removed(keep)
+    kept_df = full_df[keep].reset_index(drop=True)
+    expected = SearchIndex(kept_df, popularity=kept_df['rating'].values)
+    
+    for query in ['Added', 'Added 10005', 'kw2', 'Person3']:
+        assert search_results(removed, query) == pytest.approx(search_results(expected, query))
@@ -0,0 +1,70 @@
+import os
+import pytest
+import instrumentation
+from instrumentation import Metrics, timed
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    
+    metrics.increment('requests_total')
+    metrics.observe('stage_seconds', 0.2, stage='search')
+    with metrics.span('search'):
+        pass
+    
+    assert metrics.render_prometheus() == '\n'
+
+def test_counters_and_histograms_render_in_prometheus_format():
+    metrics = Metrics(enabled=True)
+    
+    metrics.increment('requests_total', result='hit')
+    metrics.increment('requests_total', 2, result='hit')
+    metrics.increment('requests_total', result='say "hi"')
+    metrics.observe('stage_seconds', 0.02, stage='search')
+    metrics.observe('stage_seconds', 3.0, stage='search')
+    
+    lines = metrics.render_prometheus().splitlines()
+    
+    assert lines.count('# TYPE movierec_requests_total counter') == 1
+    assert 'movierec_requests_total{result="hit"} 3' in lines
+    assert 'movierec_requests_total{result="say \\"hi\\""} 1' in lines
+    assert 'movierec_stage_seconds_bucket{stage="search",le="0.01"} 0' in lines
+    assert 'movierec_stage_seconds_bucket{stage="search",le="0.025"} 1' in lines
+    assert 'movierec_stage_seconds_bucket{stage="search",le="+Inf"} 2' in lines
+    assert 'movierec_stage_seconds_count{stage="search"} 2' in lines
+
+def test_spans_time_stages_and_count_errors():
+    metrics = Metrics(enabled=True)
+    
+    with metrics.span('filter'):
+        pass
+    with pytest.raises(RuntimeError):
+        with metrics.span('filter'):
+            raise RuntimeError
+    
+    assert metrics.histograms[('stage_seconds', (('stage', 'filter'),))][2] == 2
+    assert metrics.counters[('stage_errors_total', (('stage', 'filter'),))] == 1
+
+def test_timed_records_only_while_enabled(monkeypatch):
+    metrics = Metrics(enabled=False)
+    monkeypatch.setattr(instrumentation, 'metrics', metrics)
+    
+    @timed('rank')
+    def rank(value):
+        return value * 2
+    
+    assert rank(2) == 4
+    assert metrics.histograms == {}
+    
+    metrics.enabled = True
+    assert rank(3) == 6
+    assert metrics.histograms[('stage_seconds', (('stage', 'rank'),))][2] == 1
+
+def test_write_prometheus_replaces_the_file(tmp_path):
+    metrics = Metrics(enabled=True)
+    metrics.increment('requests_total')
+    path = tmp_path / 'metrics.prom'
+    
+    metrics.write_prometheus(str(path))
+    
+    assert path.read_text() == metrics.render_prometheus()
+    assert os.listdir(tmp_path) == ['metrics.prom']
@@ -0,0 +1,51 @@
+import os
+import numpy as np
+import pytest
+import model_store
+from benchmarks.synthetic import generate_catalog
+from catalog import load_catalog
+from recom_engine import MovieRecommendationEngine
+
+@pytest.fixture
+def catalog_path(tmp_path):
+    path = tmp_path / 'movies.csv'
+    generate_catalog(200, seed=1).to_csv(path, index=False)
+    return str(path)
+
+@pytest.mark.parametrize('precision', ['float64', 'int8'])
+def test_loaded_model_recommends_like_the_one_it_was_saved_from(tmp_path, catalog_path, precision):
+    movies_df = load_catalog(catalog_path)
+    engine = MovieRecommendationEngine(movies_df, n_neighbors=10, precision=precision)
+    engine.save_model(str(tmp_path / 'model'))
+    
+    loaded = MovieRecommendationEngine(movies_df, model_path=str(tmp_path / 'model'))
+    
+    movie_id = movies_df['movie_id'].iloc[17]
+    assert loaded.precision == precision
+    assert (loaded.get_content_based_recommendations(movie_id, 5)['movie_id'].tolist()
+            == engine.get_content_based_recommendations(movie_id, 5)['movie_id'].tolist())
+    assert (loaded.tfidf.transform(['drama kw1']) != engine.tfidf.transform(['drama kw1'])).nnz == 0
+
+def test_from_catalog_reuses_the_artifact_until_the_catalog_changes(tmp_path, catalog_path):
+    artifact_dir = str(tmp_path / 'artifacts')
+    
+    MovieRecommendationEngine.from_catalog(catalog_path, artifact_dir=artifact_dir, n_neighbors=10)
+    reused = MovieRecommendationEngine.from_catalog(catalog_path, artifact_dir=artifact_dir, n_neighbors=10)
+    
+    assert len(os.listdir(artifact_dir)) == 1
+    assert isinstance(reused.neighbor_indices, np.memmap)
+    
+    with open(catalog_path, 'a') as f:
+        f.write('201,Extra,Drama,kw1,Person1,Person2,2001,7.0,,\n')
+    MovieRecommendationEngine.from_catalog(catalog_path, artifact_dir=artifact_dir, n_neighbors=10)
+    
+    assert len(os.listdir(artifact_dir)) == 2
+
+def test_load_rejects_an_artifact_built_for_another_catalog(tmp_path, catalog_path):
+    movies_df = load_catalog(catalog_path)
+    MovieRecommendationEngine(movies_df, n_neighbors=10).save_model(str(tmp_path / 'model'))
+    
+    assert model_store.is_valid_artifact(str(tmp_path / 'model'))
+    assert not model_store.is_valid_artifact(str(tmp_path / 'missing'))
+    with pytest.raises(ValueError):
+        MovieRecommendationEngine(movies_df.iloc[:100], model_path=str(tmp_path / 'model'))
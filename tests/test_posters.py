@@ -0,0 +1,90 @@
+import threading
+import pytest
+from benchmarks.poster_fetch import start_server
+from posters import PosterFetcher
+
+@pytest.fixture
+def server():
+    server, hits = start_server(latency=0.02)
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    yield base, hits
+    server.shutdown()
+
+@pytest.fixture
+def fetcher(tmp_path):
+    fetcher = PosterFetcher(cache_dir=str(tmp_path), max_workers=8)
+    yield fetcher
+    fetcher.close()
+
+def poster_urls(base, n=12):
+    return [f'{base}/posters/{i}.jpg' for i in range(n)]
+
+def test_concurrent_callers_share_one_download_per_url(server, fetcher):
+    base, hits = server
+    urls = poster_urls(base)
+    results = [None] * 4
+    
+    def caller(i):
+        results[i] = fetcher.prefetch(urls)
+    
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert all(hits[url[len(base):]] == 1 for url in urls)
+    assert all(all(paths.values()) for paths in results)
+
+def test_disk_cache_answers_a_repeated_page(server, fetcher, tmp_path):
+    base, hits = server
+    urls = poster_urls(base)
+    fetcher.prefetch(urls)
+    hits.clear()
+    
+    assert all(fetcher.prefetch(urls).values())
+    assert sum(hits.values()) == 0
+    
+    restarted = PosterFetcher(cache_dir=str(tmp_path))
+    try:
+        assert all(restarted.prefetch(urls).values())
+    finally:
+        restarted.close()
+    assert sum(hits.values()) == 0
+
+def test_broken_urls_are_requested_once_within_the_negative_ttl(server, fetcher):
+    base, hits = server
+    broken = [f'{base}/missing/{i}.jpg' for i in range(3)]
+    
+    assert fetcher.prefetch(broken) == dict.fromkeys(broken)
+    fetcher.prefetch(broken)
+    
+    assert all(hits[url[len(base):]] == 1 for url in broken)
+
+def test_cache_write_errors_do_not_mark_the_url_broken(server, fetcher, monkeypatch):
+    base, hits = server
+    url = poster_urls(base, 1)[0]
+    
+    def full_disk(url, image):
+        raise OSError(28, 'No space left on device')
+    
+    with monkeypatch.context() as patch:
+        patch.setattr(fetcher.cache, 'put', full_disk)
+        assert fetcher.fetch(url) is None
+    
+    assert not fetcher.is_known_broken(url)
+    assert fetcher.fetch(url) is not None
+    assert hits[url[len(base):]] == 2
+
+def test_failed_urls_are_capped(server, tmp_path):
+    base, _ = server
+    fetcher = PosterFetcher(cache_dir=str(tmp_path), max_failed=3)
+    try:
+        broken = [f'{base}/missing/{i}.jpg' for i in range(5)]
+        for url in broken:
+            fetcher.fetch(url)
+        
+        assert list(fetcher.failed) == broken[2:]
+        assert not fetcher.is_known_broken(broken[0])
+    finally:
+        fetcher.close()
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from quantize import QuantizedScores, score_dtype, store_scores
+
+def test_int8_round_trip_error_is_within_half_a_step():
+    scores = np.random.default_rng(0).uniform(-1, 1, (300, 40))
+    scores[5] *= 1e-3
+    
+    quantized = QuantizedScores.quantize(scores, block_size=64)
+    
+    steps = np.abs(scores).max(axis=1, keepdims=True) / 127
+    assert np.all(np.abs(quantized[:] - scores) <= steps / 2 + 1e-6 * steps)
+    assert quantized.codes.dtype == np.int8
+    assert quantized.nbytes < scores.astype(np.float32).nbytes / 3
+
+def test_minus_inf_and_zero_rows_survive_quantization():
+    scores = np.array([[0.5, -np.inf, 0.25], [0.0, 0.0, 0.0]])
+    
+    values = QuantizedScores.quantize(scores)[:]
+    
+    assert values[0, 1] == -np.inf
+    assert values[0, 0] == pytest.approx(0.5)
+    assert values[1].tolist() == [0.0, 0.0, 0.0]
+
+def test_quantized_scores_index_like_the_float_array():
+    scores = np.random.default_rng(1).random((20, 10))
+    quantized = QuantizedScores.quantize(scores)
+    dense = quantized[:]
+    rows = np.array([3, 7, 7])
+    
+    assert quantized.shape == (20, 10) and len(quantized) == 20
+    assert quantized[4].tolist() == dense[4].tolist()
+    assert quantized[rows].tolist() == dense[rows].tolist()
+    assert quantized[2, :5].tolist() == dense[2, :5].tolist()
+    assert np.asarray(quantized).tolist() == dense.tolist()
+
+def test_store_scores_picks_the_precision():
+    scores = np.ones((2, 2))
+    
+    assert store_scores(scores, 'float64') is scores
+    assert store_scores(scores, 'float32').dtype == np.float32
+    assert isinstance(store_scores(scores, 'int8'), QuantizedScores)
+    assert score_dtype('int8') is np.float32
+    with pytest.raises(ValueError):
+        score_dtype('float16')
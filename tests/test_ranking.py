@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from ranking import normalize_scores, top_k
+
+def test_top_k_matches_a_full_sort():
+    scores = np.random.default_rng(0).random(1000)
+    
+    indices, values = top_k(scores, 25)
+    
+    assert indices.tolist() == np.argsort(-scores)[:25].tolist()
+    assert values.tolist() == scores[indices].tolist()
+
+def test_top_k_skips_excluded_positions():
+    scores = np.array([0.9, 0.8, 0.7, 0.6, 0.5])
+    
+    assert top_k(scores, 2, exclude=[0, 2])[0].tolist() == [1, 3]
+    assert top_k(scores, 2, exclude=np.array([True, True, False, False, False]))[0].tolist() == [2, 3]
+
+def test_top_k_drops_minus_inf_from_a_single_row():
+    scores = np.array([0.4, -np.inf, 0.9, -np.inf])
+    
+    indices, values = top_k(scores, 4)
+    
+    assert indices.tolist() == [2, 0]
+    assert values.tolist() == [0.9, 0.4]
+    assert top_k(scores, 3, exclude=[0, 2])[0].tolist() == []
+
+def test_top_k_keeps_rows_rectangular_for_batches():
+    scores = np.array([[0.1, 0.5, 0.3], [0.2, -np.inf, -np.inf]])
+    
+    indices, values = top_k(scores, 2)
+    
+    assert indices.tolist() == [[1, 2], [0, 1]]
+    assert values[1, 1] == -np.inf
+
+def test_top_k_handles_k_outside_the_item_count():
+    scores = np.array([0.3, 0.1, 0.2])
+    
+    assert top_k(scores, 10)[0].tolist() == [0, 2, 1]
+    assert top_k(scores, 0)[0].shape == (0,)
+    assert top_k(np.ones((2, 3)), 0)[0].shape == (2, 0)
+
+def test_minmax_and_zscore_use_statistics_from_the_mask():
+    scores = np.array([100.0, 1.0, 2.0, 3.0])
+    mask = np.array([False, True, True, True])
+    
+    assert normalize_scores(scores, 'minmax', mask)[1:].tolist() == [0.0, 0.5, 1.0]
+    np.testing.assert_allclose(normalize_scores(scores, 'zscore', mask)[1:], [-1.224745, 0.0, 1.224745], rtol=1e-6)
+    assert normalize_scores(scores, None).tolist() == scores.tolist()
+
+def test_degenerate_ranges_normalize_to_zero():
+    assert normalize_scores(np.full(3, 0.7), 'minmax').tolist() == [0.0, 0.0, 0.0]
+    assert normalize_scores(np.full(3, 0.7), 'zscore').tolist() == [0.0, 0.0, 0.0]
+    assert normalize_scores(np.ones(3), 'minmax', np.zeros(3, dtype=bool)).tolist() == [0.0, 0.0, 0.0]
+
+def test_unknown_normalization_is_rejected():
+    with pytest.raises(ValueError):
+        normalize_scores(np.ones(3), 'rank')
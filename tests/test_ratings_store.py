@@ -0,0 +1,56 @@
+import pytest
+from ratings_store import RatingsRepository
+
+@pytest.fixture
+def repository(tmp_path):
+    # The background writer never fires on its own; tests flush explicitly.
+    repository = RatingsRepository.from_url(f'sqlite:///{tmp_path / "ratings.db"}', flush_interval=3600)
+    yield repository
+    repository.close()
+
+def test_latest_rating_wins_within_and_across_batches(repository):
+    repository.submit(1, 10, 3.0)
+    repository.submit(1, 10, 4.5)
+    repository.flush()
+    assert repository.get_user_ratings(1) == {10: 4.5}
+    
+    repository.submit(1, 10, 2.0)
+    repository.flush()
+    assert repository.get_user_ratings(1) == {10: 2.0}
+    assert len(repository.get_all_ratings()) == 1
+
+def test_get_user_ratings_flushes_pending_writes_for_that_user_only(repository):
+    repository.submit(1, 10, 3.0)
+    repository.submit(1, 11, 5.0)
+    repository.submit(2, 10, 1.0)
+    
+    assert repository.get_user_ratings(1) == {10: 3.0, 11: 5.0}
+    assert repository.get_user_ratings(2) == {10: 1.0}
+    assert repository.get_user_ratings(3) == {}
+
+def test_failed_batch_is_retried_and_newer_ratings_still_win(repository, monkeypatch):
+    upsert = repository._upsert
+    
+    def failing_upsert(batch):
+        raise RuntimeError('database down')
+    
+    repository.submit(1, 10, 3.0)
+    repository.submit(1, 11, 4.0)
+    monkeypatch.setattr(repository, '_upsert', failing_upsert)
+    with pytest.raises(RuntimeError):
+        repository.flush()
+    assert set(repository.failed) == {(1, 10), (1, 11)}
+    
+    monkeypatch.setattr(repository, '_upsert', upsert)
+    repository.submit(1, 10, 1.5)
+    repository.flush()
+    
+    assert repository.failed == {}
+    assert repository.get_user_ratings(1) == {10: 1.5, 11: 4.0}
+
+def test_get_user_id_creates_one_row_per_account(repository):
+    alice = repository.get_user_id('alice', 'alice@example.com', 'hash')
+    bob = repository.get_user_id('bob', 'bob@example.com', 'hash')
+    
+    assert alice != bob
+    assert repository.get_user_id('alice', 'alice@example.com', 'hash') == alice
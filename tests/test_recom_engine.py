@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import generate_catalog
+from ranking import normalize_scores
+from recom_engine import MovieRecommendationEngine
+from trending import TrendingCounter
+
+@pytest.fixture(scope='module')
+def catalog():
+    return generate_catalog(300, seed=0)
+
+@pytest.fixture(scope='module')
+def dense(catalog):
+    return MovieRecommendationEngine(catalog)
+
+@pytest.fixture(scope='module')
+def sparse_engine(catalog):
+    return MovieRecommendationEngine(catalog, n_neighbors=15, block_size=64)
+
+def test_neighbor_index_holds_each_rows_top_k_of_the_dense_matrix(dense, sparse_engine):
+    similarities = np.array(dense.cosine_sim)
+    np.fill_diagonal(similarities, -np.inf)
+    expected = -np.sort(-similarities, axis=1)[:, :15]
+    
+    assert sparse_engine.neighbor_indices.shape == (300, 15)
+    assert not (sparse_engine.neighbor_indices == np.arange(300)[:, None]).any()
+    np.testing.assert_allclose(sparse_engine.neighbor_scores, expected, rtol=1e-6, atol=1e-9)
+
+def test_content_recommendations_agree_between_dense_and_neighbor_index(catalog, dense, sparse_engine):
+    for movie_id in catalog['movie_id'].iloc[[0, 50, 299]]:
+        from_dense = dense.get_content_based_recommendations(movie_id, 10)
+        from_index = sparse_engine.get_content_based_recommendations(movie_id, 10)
+        
+        assert movie_id not in from_index['movie_id'].values
+        np.testing.assert_allclose(from_index['similarity_score'].values, from_dense['similarity_score'].values, rtol=1e-6)
+
+def test_movie_index_maps_ids_to_their_first_row(catalog):
+    duplicated = pd.concat([catalog, catalog.iloc[[3]]], ignore_index=True)
+    engine = MovieRecommendationEngine(duplicated)
+    
+    assert engine.get_movie_index(catalog['movie_id'].iloc[3]) == 3
+    assert engine.get_movie_index(-1) is None
+    assert engine.get_movie_indices([catalog['movie_id'].iloc[7], -1]).tolist() == [7, -1]
+
+def test_user_profile_matches_the_per_movie_sum(catalog, dense):
+    user_ratings = {catalog['movie_id'].iloc[i]: rating for i, rating in [(4, 5.0), (90, 1.0), (200, 3.5)]}
+    user_ratings[-1] = 5.0
+    
+    profile, rated = dense.build_user_profile(user_ratings)
+    
+    expected = np.zeros(dense.tfidf_matrix.shape[1])
+    total_weight = sum(abs(rating - 2.5) / 2.5 for movie_id, rating in user_ratings.items() if movie_id != -1)
+    for movie_id, rating in user_ratings.items():
+        if movie_id != -1:
+            row = dense.tfidf_matrix[dense.get_movie_index(movie_id)].toarray().ravel()
+            expected += row * (rating - 2.5) / 2.5 / total_weight
+    
+    assert rated.tolist() == [4, 90, 200]
+    np.testing.assert_allclose(profile, expected, rtol=1e-6)
+
+def test_recommend_batch_matches_single_user_calls(catalog, dense):
+    movie_ids = catalog['movie_id'].values
+    users = [{movie_ids[1]: 5.0, movie_ids[30]: 2.0}, {}, {movie_ids[120]: 4.5}, {-1: 5.0, movie_ids[250]: 1.0}]
+    
+    batch = dense.recommend_batch(users, 8, chunk_size=2)
+    
+    for user_ratings, frame in zip(users, batch):
+        single = dense.get_collaborative_recommendations(user_ratings, 8)
+        assert frame['movie_id'].tolist() == single['movie_id'].tolist()
+
+def test_similar_batch_matches_single_movie_calls(catalog, sparse_engine):
+    movie_ids = [catalog['movie_id'].iloc[0], -1, catalog['movie_id'].iloc[150]]
+    
+    batch = sparse_engine.similar_batch(movie_ids, 5, chunk_size=1)
+    
+    assert batch[1].empty
+    for movie_id, frame in zip(movie_ids[::2], batch[::2]):
+        single = sparse_engine.get_content_based_recommendations(movie_id, 5)
+        assert frame['movie_id'].tolist() == single['movie_id'].tolist()
+
+def test_sharded_batches_return_results_in_input_order(catalog, dense):
+    movie_ids = catalog['movie_id'].iloc[:6].tolist()
+    
+    sharded = dense.similar_batch(movie_ids, 5, chunk_size=2, n_jobs=2)
+    
+    assert [frame['movie_id'].tolist() for frame in sharded] == [frame['movie_id'].tolist() for frame in dense.similar_batch(movie_ids, 5)]
+
+def test_search_pages_concatenate_to_the_full_result(dense):
+    full = dense.search_movies('kw1', genres=['Drama'])
+    
+    pages, total = [], None
+    for page in range(-(-len(full) // 7) + 1):
+        frame, total = dense.search_page('kw1', page=page, page_size=7, genres=['Drama'])
+        pages.append(frame)
+    
+    assert total == len(full) > 7
+    assert pages[-1].empty
+    assert pd.concat(pages)['movie_id'].tolist() == full['movie_id'].tolist()
+    assert (pd.concat(pages)['genre'].astype(str).str.contains('Drama')).all()
+
+def test_get_page_slices_row_positions(dense):
+    positions = dense.filter(year_range=(1990, 2010))
+    
+    frame, total = dense.get_page(positions, page=1, page_size=5)
+    
+    assert total == len(positions)
+    assert frame['movie_id'].tolist() == dense.movies_df['movie_id'].values[positions[5:10]].tolist()
+
+@pytest.mark.parametrize('normalization', ['minmax', 'zscore', {'content': 'zscore'}])
+def test_hybrid_blends_normalized_signals_over_the_whole_catalog(catalog, dense, normalization):
+    movie_ids = catalog['movie_id'].values
+    user_ratings = {movie_ids[10]: 5.0, movie_ids[60]: 1.5}
+    weights = {'content': 0.25, 'collaborative': 0.75}
+    
+    hybrid = dense.get_hybrid_recommendations(movie_ids[0], user_ratings, 10, weights=weights, normalization=normalization)
+    
+    schemes = normalization if isinstance(normalization, dict) else dict.fromkeys(weights, normalization)
+    content = np.array(dense.cosine_sim[0], dtype=np.float64)
+    collaborative, _ = dense.profile_scores(user_ratings)
+    candidates = np.ones(len(catalog), dtype=bool)
+    candidates[[0, 10, 60]] = False
+    expected = (0.25 * normalize_scores(content, schemes.get('content'), candidates)
+                + 0.75 * normalize_scores(collaborative, schemes.get('collaborative'), candidates))
+    expected[~candidates] = -np.inf
+    order = np.argsort(-expected, kind='stable')[:10]
+    
+    assert hybrid['movie_id'].tolist() == movie_ids[order].tolist()
+    np.testing.assert_allclose(hybrid['hybrid_score'].values, expected[order], rtol=1e-6)
+
+def test_hybrid_with_one_signal_ranks_like_that_signal(catalog, dense):
+    movie_id = catalog['movie_id'].iloc[5]
+    user_ratings = {catalog['movie_id'].iloc[7]: 5.0}
+    
+    content_only = dense.get_hybrid_recommendations(movie_id, user_ratings, 10, weights={'content': 1, 'collaborative': 0})
+    no_ratings = dense.get_hybrid_recommendations(movie_id, {}, 10)
+    
+    expected = dense.get_content_based_recommendations(movie_id, 10)['movie_id'].tolist()
+    assert content_only['movie_id'].tolist() == expected
+    assert no_ratings['movie_id'].tolist() == expected
+
+def test_default_hybrid_weights_are_read_only(dense):
+    with pytest.raises(TypeError):
+        dense.hybrid_weights['content'] = 1.0
+
+def test_int8_scores_with_rerank_return_exact_similarities(catalog, dense):
+    engine = MovieRecommendationEngine(catalog, precision='int8', rerank_factor=4)
+    
+    for movie_id in catalog['movie_id'].iloc[[0, 100, 200]]:
+        quantized = engine.get_content_based_recommendations(movie_id, 5)
+        exact = dense.get_content_based_recommendations(movie_id, 5)
+        
+        np.testing.assert_allclose(quantized['similarity_score'].values, exact['similarity_score'].values, rtol=1e-5)
+
+FILTERS = {'genres': ['Drama'], 'year_range': (1990, 2020), 'rating_range': (6.0, 10.0)}
+
+def assert_eligible_top(frame, engine, scores, exclude, n, score_column):
+    eligible = engine.filter_mask(**FILTERS)
+    eligible[exclude] = False
+    order = np.flatnonzero(eligible)[np.argsort(-scores[eligible], kind='stable')][:n]
+    
+    assert len(frame) == n
+    assert engine.filter_mask(**FILTERS)[engine.get_movie_indices(frame['movie_id'])].all()
+    np.testing.assert_allclose(frame[score_column].values, scores[order], rtol=1e-6)
+
+@pytest.mark.parametrize('engine_name', ['dense', 'sparse_engine'])
+def test_content_filters_apply_before_top_k(request, catalog, engine_name):
+    engine = request.getfixturevalue(engine_name)
+    
+    frame = engine.get_content_based_recommendations(catalog['movie_id'].iloc[0], 20, **FILTERS)
+    
+    assert_eligible_top(frame, engine, engine.content_scores(0), [0], 20, 'similarity_score')
+
+def test_profile_and_hybrid_filters_apply_before_top_k(catalog, dense):
+    user_ratings = {catalog['movie_id'].iloc[2]: 5.0, catalog['movie_id'].iloc[9]: 4.0}
+    profile_scores, rated = dense.profile_scores(user_ratings)
+    
+    collaborative = dense.get_collaborative_recommendations(user_ratings, 15, **FILTERS)
+    hybrid = dense.get_hybrid_recommendations(catalog['movie_id'].iloc[0], user_ratings, 15, **FILTERS)
+    
+    assert_eligible_top(collaborative, dense, profile_scores, rated, 15, 'recommendation_score')
+    assert len(hybrid) == 15
+    assert dense.filter_mask(**FILTERS)[dense.get_movie_indices(hybrid['movie_id'])].all()
+
+def test_top_rated_and_trending_filters_apply_before_top_k(catalog):
+    engine = MovieRecommendationEngine(catalog)
+    trending = TrendingCounter(half_life=3600, landmark=0)
+    for movie_id in catalog['movie_id'].iloc[:100]:
+        trending.record(movie_id, 1.0 + movie_id / 100, timestamp=0)
+    engine.attach_trending(trending)
+    
+    top_rated = engine.get_top_rated_movies(12, **FILTERS)
+    trending_movies = engine.get_trending_movies(12, **FILTERS)
+    
+    eligible = engine.filter_mask(**FILTERS)
+    expected = catalog[eligible].sort_values('rating', ascending=False, kind='stable')['rating'].head(12)
+    assert top_rated['rating'].tolist() == expected.tolist()
+    assert len(trending_movies) == 12
+    assert eligible[engine.get_movie_indices(trending_movies['movie_id'])].all()
@@ -0,0 +1,83 @@
+import pandas as pd
+from result_cache import RecommendationCache
+
+class CountingEngine:
+    catalog_version = 0
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def get_content_based_recommendations(self, movie_id, n_recommendations=10, **filters):
+        self.calls += 1
+        return pd.DataFrame({'movie_id': [movie_id + 1]})
+    
+    def get_collaborative_recommendations(self, user_ratings, n_recommendations=10, **filters):
+        self.calls += 1
+        return pd.DataFrame({'movie_id': sorted(user_ratings)})
+
+def test_repeated_requests_are_served_from_the_cache():
+    engine = CountingEngine()
+    cache = RecommendationCache(engine)
+    
+    first = cache.get_collaborative_recommendations({2: 4.0, 1: 3.0}, 5)
+    first['movie_id'] = 0
+    second = cache.get_collaborative_recommendations({1: 3.0, 2: 4.0}, 5)
+    
+    assert engine.calls == 1
+    assert second['movie_id'].tolist() == [1, 2]
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+def test_filters_counts_and_catalog_version_are_part_of_the_key():
+    engine = CountingEngine()
+    cache = RecommendationCache(engine)
+    
+    cache.get_content_based_recommendations(1, 5)
+    cache.get_content_based_recommendations(1, 5, genres=None)
+    cache.get_content_based_recommendations(1, 5, genres=['Drama'])
+    cache.get_content_based_recommendations(1, 6)
+    engine.catalog_version = 1
+    cache.get_content_based_recommendations(1, 5)
+    
+    assert engine.calls == 4
+
+def test_entries_expire_after_the_ttl():
+    engine = CountingEngine()
+    cache = RecommendationCache(engine, ttl=0)
+    
+    cache.get_content_based_recommendations(1)
+    cache.get_content_based_recommendations(1)
+    
+    assert engine.calls == 2
+
+def test_least_recently_used_entries_are_evicted():
+    engine = CountingEngine()
+    cache = RecommendationCache(engine, max_entries=2)
+    
+    for movie_id in [1, 2, 1, 3, 1]:
+        cache.get_content_based_recommendations(movie_id)
+    
+    assert engine.calls == 3
+    assert len(cache.entries) == 2
+
+def test_invalidate_user_drops_only_that_users_entries():
+    engine = CountingEngine()
+    cache = RecommendationCache(engine)
+    
+    cache.get_collaborative_recommendations({1: 4.0}, user_id='alice')
+    cache.get_collaborative_recommendations({2: 4.0}, user_id='bob')
+    cache.invalidate_user('alice')
+    cache.get_collaborative_recommendations({1: 4.0}, user_id='alice')
+    cache.get_collaborative_recommendations({2: 4.0}, user_id='bob')
+    
+    assert engine.calls == 3
+    assert set(cache.user_keys) == {'alice', 'bob'}
+
+def test_binding_a_new_engine_clears_the_cache():
+    cache = RecommendationCache(CountingEngine())
+    cache.get_content_based_recommendations(1)
+    
+    new_engine = CountingEngine()
+    cache.bind(new_engine)
+    cache.get_content_based_recommendations(1)
+    
+    assert new_engine.calls == 1
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from search_index import SearchIndex
+
+def make_index():
+    movies_df = pd.DataFrame({
+        'title': ['The Matrix', 'John Wick', 'Matilda', 'Speed'],
+        'cast': ['Keanu Reeves', 'Keanu Reeves', 'Mara Wilson', 'Keanu Reeves, Sandra Bullock'],
+        'director': ['Lana Wachowski', 'Chad Stahelski', 'Danny DeVito', 'Jan de Bont'],
+        'genre': ['Action', 'Action', 'Comedy', 'Action'],
+        'keywords': ['hacker simulation', 'assassin', 'matrix books', 'bus bomb'],
+    })
+    return SearchIndex(movies_df, popularity=[10.0, 30.0, 20.0, 5.0])
+
+def test_title_matches_outrank_keyword_matches():
+    rows, scores = make_index().search('matrix')
+    
+    assert rows.tolist() == [0, 2]
+    assert scores.tolist() == [5.0, 1.0]
+
+def test_every_query_token_must_match():
+    index = make_index()
+    
+    assert index.search('keanu action')[0].tolist() == [1, 0, 3]
+    assert index.search('keanu comedy')[0].tolist() == []
+    assert index.search('')[0].tolist() == []
+
+def test_only_the_last_token_is_a_prefix():
+    index = make_index()
+    
+    # Equal scores fall back to popularity.
+    assert index.search('mat')[0].tolist() == [2, 0]
+    assert index.search('keanu spe')[0].tolist() == [3]
+    assert index.search('mat keanu')[0].tolist() == []
+
+def test_search_applies_the_mask_before_ranking():
+    mask = np.array([False, True, True, True])
+    
+    assert make_index().search('keanu', mask=mask)[0].tolist() == [1, 3]
+
+def test_autocomplete_returns_the_most_popular_title_matches():
+    index = make_index()
+    
+    assert index.autocomplete('ma').tolist() == [2, 0]
+    assert index.autocomplete('ma', n=1).tolist() == [2]
+    assert index.autocomplete('john w').tolist() == [1]
+    assert index.autocomplete('keanu').tolist() == []
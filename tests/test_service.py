@@ -0,0 +1,41 @@
+import asyncio
+import json
+import pandas as pd
+from service import RecommendationService
+
+class FakeEngine:
+    trending = None
+    
+    def __init__(self):
+        self.calls = []
+    
+    def recommend_batch(self, user_ratings_list, n_recommendations):
+        self.calls.append(n_recommendations)
+        frame = pd.DataFrame({'movie_id': range(1, 6), 'recommendation_score': [0.5] * 5})
+        return [frame for _ in user_ratings_list]
+
+def post_recommend(engine, payload):
+    async def run():
+        service = RecommendationService(engine)
+        service.recommend_batcher.start()
+        return await service.dispatch('POST', '/recommend', json.dumps(payload).encode())
+    return asyncio.run(run())
+
+def test_recommend_rejects_a_non_numeric_n():
+    engine = FakeEngine()
+    
+    status, response = post_recommend(engine, {'ratings': {'1': 8.0}, 'n': 'x'})
+    assert status == 400
+    assert response['error'].startswith('invalid body')
+    status, response = post_recommend(engine, {'ratings': {'1': 8.0}, 'n': None})
+    assert status == 400
+    assert response['error'].startswith('invalid body')
+    assert engine.calls == []
+
+def test_recommend_clamps_a_negative_n_to_one_result():
+    engine = FakeEngine()
+    
+    status, response = post_recommend(engine, {'ratings': {'1': 8.0}, 'n': -5})
+    assert status == 200
+    assert engine.calls == [1]
+    assert len(response['results']) == 1
@@ -0,0 +1,28 @@
+import threading
+import shared_state
+from benchmarks.synthetic import generate_catalog
+from recom_engine import MovieRecommendationEngine
+from shared_state import SharedEngine, publish
+
+def test_requests_keep_the_current_engine_while_a_new_version_loads(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    publish(MovieRecommendationEngine(generate_catalog(100, seed=0), n_neighbors=5), root)
+    shared = SharedEngine(root, check_interval=0)
+    first = shared.get()
+    
+    version = publish(MovieRecommendationEngine(generate_catalog(120, seed=1), n_neighbors=5), root)
+    release = threading.Event()
+    attach = shared_state.attach
+    
+    def slow_attach(*args, **kwargs):
+        release.wait()
+        return attach(*args, **kwargs)
+    
+    monkeypatch.setattr(shared_state, 'attach', slow_attach)
+    assert shared.get() is first
+    assert shared.get() is first
+    
+    release.set()
+    shared.loader.join()
+    assert shared.get().shared_version == version
+    assert len(shared.get().movies_df) == 120
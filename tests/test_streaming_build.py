@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pytest
+import model_store
+from benchmarks.synthetic import generate_catalog
+from catalog import combined_features, load_catalog
+from hashing_tfidf import HashingTfidf
+from streaming_build import build_engine, stream_build
+
+N_FEATURES = 2 ** 12
+
+@pytest.fixture(scope='module')
+def catalog_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('catalog') / 'movies.csv'
+    generate_catalog(300, seed=2).to_csv(path, index=False)
+    return str(path)
+
+def in_memory_tfidf(catalog_path):
+    documents = combined_features(load_catalog(catalog_path))
+    vectorizer = HashingTfidf(N_FEATURES)
+    counts = vectorizer.term_counts(documents)
+    vectorizer.set_document_frequency(np.bincount(counts.indices, minlength=N_FEATURES), counts.shape[0])
+    return vectorizer.transform(documents)
+
+@pytest.mark.parametrize('precision', ['float32', 'int8'])
+def test_chunked_build_matches_an_in_memory_build(tmp_path, catalog_path, precision):
+    path = stream_build(catalog_path, str(tmp_path / 'model'), n_neighbors=8, precision=precision,
+                        n_features=N_FEATURES, chunk_size=70, block_size=2)
+    arrays = {name: np.load(os.path.join(path, f'{name}.npy')) for name in model_store.read_manifest(path)['arrays']}
+    
+    tfidf_matrix = in_memory_tfidf(catalog_path)
+    similarities = (tfidf_matrix @ tfidf_matrix.T).toarray()
+    np.fill_diagonal(similarities, -np.inf)
+    expected = -np.sort(-similarities, axis=1)[:, :8]
+    
+    np.testing.assert_allclose(arrays['tfidf_data'], tfidf_matrix.data, rtol=1e-5)
+    assert arrays['tfidf_indices'].tolist() == tfidf_matrix.indices.tolist()
+    assert not any(name.endswith('.raw') for name in os.listdir(path))
+    if precision == 'int8':
+        scores = arrays['neighbor_scores_codes'] * arrays['neighbor_scores_scales'][:, None]
+        np.testing.assert_allclose(scores, expected, atol=expected.max() / 127)
+    else:
+        np.testing.assert_allclose(arrays['neighbor_scores'], expected, rtol=1e-5)
+
+def test_build_engine_serves_recommendations_from_the_artifact(tmp_path, catalog_path):
+    artifact_dir = str(tmp_path / 'artifacts')
+    engine = build_engine(catalog_path, artifact_dir=artifact_dir, n_neighbors=8, n_features=N_FEATURES, chunk_size=70)
+    reused = build_engine(catalog_path, artifact_dir=artifact_dir, n_neighbors=8, n_features=N_FEATURES, chunk_size=70)
+    
+    movie_id = engine.movies_df['movie_id'].iloc[3]
+    recommendations = engine.get_content_based_recommendations(movie_id, 5)
+    
+    assert len(os.listdir(artifact_dir)) == 1
+    assert isinstance(engine.tfidf, HashingTfidf)
+    assert len(recommendations) == 5 and movie_id not in recommendations['movie_id'].values
+    assert reused.get_content_based_recommendations(movie_id, 5)['movie_id'].tolist() == recommendations['movie_id'].tolist()
@@ -0,0 +1,33 @@
+import pandas as pd
+from benchmarks.synthetic import GENRES, generate_catalog, generate_ratings, parse_size
+from catalog import compact_catalog
+
+def test_catalog_is_reproducible_from_its_seed():
+    pd.testing.assert_frame_equal(generate_catalog(200, seed=4), generate_catalog(200, seed=4))
+    assert not generate_catalog(200, seed=4)['keywords'].equals(generate_catalog(200, seed=5)['keywords'])
+
+def test_catalog_has_the_app_schema_and_valid_values():
+    catalog = generate_catalog(1000, seed=0)
+    genres = catalog['genre'].str.split(', ')
+    
+    assert catalog['movie_id'].tolist() == list(range(1, 1001))
+    assert genres.apply(lambda names: 1 <= len(names) <= 3 and len(set(names)) == len(names)).all()
+    assert set(genres.explode()) <= set(GENRES)
+    assert catalog['year'].between(1920, 2025).all()
+    assert catalog['rating'].between(1, 10).all()
+    assert len(compact_catalog(catalog)) == 1000
+
+def test_ratings_are_reproducible_and_unique_per_user_and_movie():
+    catalog = generate_catalog(300, seed=0)
+    ratings = generate_ratings(catalog, 50, ratings_per_user=10, seed=2)
+    
+    pd.testing.assert_frame_equal(ratings, generate_ratings(catalog, 50, ratings_per_user=10, seed=2))
+    assert not ratings.duplicated(['user_id', 'movie_id']).any()
+    assert ratings['movie_id'].isin(catalog['movie_id']).all()
+    assert ratings['rating'].between(0.5, 5.0).all()
+    assert ((ratings['rating'] * 2) % 1 == 0).all()
+
+def test_parse_size_accepts_names_and_counts():
+    assert parse_size('10K') == 10000
+    assert parse_size('1m') == 1000000
+    assert parse_size('2500') == 2500
@@ -0,0 +1,68 @@
+import math
+import numpy as np
+import pytest
+import trending
+from trending import CountMinSketch, TrendingCounter
+
+HOUR = 3600
+
+def test_scores_halve_every_half_life():
+    counter = TrendingCounter(half_life=HOUR, landmark=0)
+    counter.record(1, 4.0, timestamp=0)
+    
+    assert counter.score(1, now=0) == pytest.approx(4.0)
+    assert counter.score(1, now=HOUR) == pytest.approx(2.0)
+    assert counter.score(1, now=3 * HOUR) == pytest.approx(0.5)
+    assert counter.score(2, now=HOUR) == 0.0
+
+def test_recent_events_outrank_older_heavier_ones():
+    counter = TrendingCounter(half_life=HOUR, landmark=0)
+    counter.record(1, 3.0, timestamp=0)
+    counter.record(2, 1.0, timestamp=2 * HOUR)
+    counter.record_rating(3, 10.0, timestamp=2 * HOUR)
+    
+    top = counter.top(3, now=2 * HOUR)
+    
+    assert [movie_id for movie_id, _ in top] == [3, 2, 1]
+    assert [score for _, score in top] == pytest.approx([3.0, 1.0, 0.75])
+
+def test_rescaling_keeps_scores_and_ranking(monkeypatch):
+    monkeypatch.setattr(trending, 'RESCALE_EXPONENT', 2.0)
+    counter = TrendingCounter(half_life=HOUR, landmark=0)
+    counter.consume({'movie_id': movie_id, 'weight': weight, 'timestamp': 0} for movie_id, weight in [(1, 8.0), (2, 4.0)])
+    
+    counter.record(3, 1.0, timestamp=10 * HOUR)
+    
+    assert counter.landmark == 10 * HOUR
+    assert counter.score(1, now=10 * HOUR) == pytest.approx(8.0 / 2 ** 10)
+    assert [movie_id for movie_id, _ in counter.top(3, now=10 * HOUR)] == [3, 1, 2]
+
+def test_capacity_keeps_the_highest_scores():
+    counter = TrendingCounter(half_life=HOUR, capacity=3, landmark=0)
+    for movie_id, weight in [(1, 1.0), (2, 5.0), (3, 2.0), (4, 4.0), (1, 0.5), (5, 3.0)]:
+        counter.record(movie_id, weight, timestamp=0)
+    
+    assert len(counter) == 3
+    assert [movie_id for movie_id, _ in counter.top(10, now=0)] == [2, 4, 5]
+
+def test_count_min_sketch_never_undercounts():
+    rng = np.random.default_rng(0)
+    sketch = CountMinSketch(width=64, depth=4)
+    totals = {}
+    for key in rng.zipf(1.5, 5000) % 1000:
+        sketch.add(int(key), 1.0)
+        totals[int(key)] = totals.get(int(key), 0) + 1
+    
+    errors = np.array([sketch.estimate(key) - total for key, total in totals.items()])
+    
+    assert errors.min() >= 0
+    assert sketch.estimate(max(totals, key=totals.get)) == pytest.approx(max(totals.values()), rel=0.05)
+
+def test_sketch_backed_counter_decays_like_exact_counts():
+    counter = TrendingCounter(half_life=HOUR, sketch_width=1 << 12, landmark=0)
+    counter.record(7, 2.0, timestamp=0)
+    counter.record(7, 2.0, timestamp=HOUR)
+    
+    assert counter.score(7, now=HOUR) == pytest.approx(3.0)
+    assert counter.top(1, now=2 * HOUR)[0] == (7, pytest.approx(1.5))
+    assert math.isclose(counter.score(8, now=HOUR), 0.0)
@@ -0,0 +1,177 @@
+import heapq
+import json
+import math
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+from instrumentation import increment
+
+EVENT_WEIGHTS = {'view': 1.0, 'rating': 3.0}
+MAX_RATING = 10.0
+# Stored scores grow as exp(decay * (t - landmark)); past this exponent the
+# landmark moves forward and everything is rescaled to stay inside float32.
+RESCALE_EXPONENT = 30.0
+
+class CountMinSketch:
+    # Fixed-size decayed counts for catalogs too large (or too long-tailed)
+    # to give every movie its own slot. Estimates only ever overcount.
+    def __init__(self, width=1 << 16, depth=4, seed=0):
+        rng = np.random.default_rng(seed)
+        self.width = width
+        self.depth = depth
+        self.rows = np.arange(depth)
+        self.salts = [int(salt) for salt in rng.integers(1, 2 ** 61 - 1, size=depth)]
+        self.table = np.zeros((depth, width), dtype=np.float32)
+    
+    def buckets(self, key):
+        return [hash((salt, key)) % self.width for salt in self.salts]
+    
+    def add(self, key, value):
+        # Conservative update: only the cells at the current minimum grow,
+        # which keeps the overcount from colliding keys much lower.
+        buckets = self.buckets(key)
+        cells = self.table[self.rows, buckets]
+        estimate = cells.min() + value
+        self.table[self.rows, buckets] = np.maximum(cells, estimate)
+        return float(estimate)
+    
+    def estimate(self, key):
+        return float(self.table[self.rows, self.buckets(key)].min())
+    
+    def scale(self, factor):
+        self.table *= factor
+
+class TrendingCounter:
+    def __init__(self, half_life=3 * 86400, capacity=256, sketch_width=None, sketch_depth=4, landmark=None):
+        # Forward decay: an event at time t adds weight * exp(decay * (t - landmark)),
+        # so older scores never have to be touched. Dividing by
+        # exp(decay * (now - landmark)) at read time gives the decayed value,
+        # and that factor is shared by every movie, so rankings can be kept
+        # without it.
+        self.decay = math.log(2) / half_life
+        self.capacity = capacity
+        self.landmark = time.time() if landmark is None else landmark
+        self.lock = threading.Lock()
+        self.sketch = CountMinSketch(sketch_width, sketch_depth) if sketch_width else None
+        self.slots = {}
+        self.scores = np.zeros(1024, dtype=np.float32)
+        self.heap = []
+        self.members = {}
+        self.events = 0
+    
+    def record(self, movie_id, weight=1.0, timestamp=None):
+        if weight <= 0:
+            return
+        movie_id = int(movie_id)
+        seconds = _seconds(timestamp)
+        with self.lock:
+            if self.decay * (seconds - self.landmark) > RESCALE_EXPONENT:
+                self.rescale(seconds)
+            score = self.add(movie_id, weight * math.exp(self.decay * (seconds - self.landmark)))
+            self.offer(movie_id, score)
+            self.events += 1
+        increment('trending_events_total')
+    
+    def record_view(self, movie_id, timestamp=None):
+        self.record(movie_id, EVENT_WEIGHTS['view'], timestamp)
+    
+    def record_rating(self, movie_id, rating, timestamp=None):
+        self.record(movie_id, EVENT_WEIGHTS['rating'] * float(rating) / MAX_RATING, timestamp)
+    
+    def consume(self, events):
+        for event in events:
+            kind = event.get('event', 'view')
+            if kind == 'rating':
+                self.record_rating(event['movie_id'], event['rating'], event.get('timestamp'))
+            else:
+                self.record(event['movie_id'], event.get('weight', EVENT_WEIGHTS.get(kind, 1.0)), event.get('timestamp'))
+    
+    def load_event_log(self, path):
+        # One JSON object per line: {"movie_id": .., "event": "view"|"rating", "timestamp": ..}
+        with open(path) as f:
+            self.consume(json.loads(line) for line in f if line.strip())
+    
+    def load_ratings(self, repository, since=None):
+        for movie_id, rating, created_at in repository.get_rating_events(since):
+            self.record_rating(movie_id, rating, created_at)
+    
+    def add(self, movie_id, value):
+        if self.sketch is not None:
+            return self.sketch.add(movie_id, value)
+        
+        slot = self.slots.get(movie_id)
+        if slot is None:
+            slot = self.slots[movie_id] = len(self.slots)
+            if slot == len(self.scores):
+                self.scores = np.concatenate([self.scores, np.zeros_like(self.scores)])
+        self.scores[slot] += value
+        return float(self.scores[slot])
+    
+    def offer(self, movie_id, score):
+        # Scores only grow, so a movie outside the heap can only enter by
+        # beating the current minimum. Updated members leave their old entry
+        # behind; stale entries are skipped and compacted away.
+        if movie_id in self.members or len(self.members) < self.capacity:
+            self.members[movie_id] = score
+            heapq.heappush(self.heap, (score, movie_id))
+            if len(self.heap) > 2 * self.capacity:
+                self.compact_heap()
+            return
+        
+        while self.members.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        if score > self.heap[0][0]:
+            _, evicted = heapq.heapreplace(self.heap, (score, movie_id))
+            del self.members[evicted]
+            self.members[movie_id] = score
+    
+    def compact_heap(self):
+        self.heap = [(score, movie_id) for movie_id, score in self.members.items()]
+        heapq.heapify(self.heap)
+    
+    def rescale(self, seconds):
+        # Multiplying by one positive factor keeps every ordering, including
+        # the heap's, so this is the only O(N) step and it is rare.
+        factor = math.exp(-self.decay * (seconds - self.landmark))
+        self.scores *= factor
+        if self.sketch is not None:
+            self.sketch.scale(factor)
+        self.members = {movie_id: score * factor for movie_id, score in self.members.items()}
+        self.compact_heap()
+        self.landmark = seconds
+    
+    def score(self, movie_id, now=None):
+        movie_id = int(movie_id)
+        with self.lock:
+            if self.sketch is not None:
+                stored = self.sketch.estimate(movie_id)
+            elif movie_id in self.slots:
+                stored = float(self.scores[self.slots[movie_id]])
+            else:
+                stored = 0.0
+            return stored * self.decay_factor(now)
+    
+    def top(self, n=10, now=None):
+        with self.lock:
+            ranked = heapq.nlargest(n, self.members.items(), key=lambda item: item[1])
+            factor = self.decay_factor(now)
+        return [(movie_id, score * factor) for movie_id, score in ranked]
+    
+    def decay_factor(self, now=None):
+        return math.exp(-self.decay * (_seconds(now) - self.landmark))
+    
+    def __len__(self):
+        return len(self.members)
+
+def _seconds(timestamp):
+    if timestamp is None:
+        return time.time()
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if hasattr(timestamp, 'timestamp'):
+        # The ratings table stores naive UTC datetimes.
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.timestamp()
+    return float(timestamp)